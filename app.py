@@ -1,15 +1,34 @@
 from dash import Dash
 
-from layout import create_app_layout
+from layout import create_app_layout, create_validation_layout
 from callbacks import register_callbacks
+from config import BACKGROUND_REFRESH
+from metrics import instrument_server
+from refresh import start_background_refresh
+from order_api import register_order_api
+from yields_api import register_yields_api
+from routes import register_routes
 from db import init_db
+from startup import start_warm_up
 
 init_db()
 
 app = Dash(__name__)
+# set first, so assigning the layout function doesn't call it (and load the data) to validate it
+app.validation_layout = create_validation_layout()
 app.layout = create_app_layout
 
 register_callbacks(app)
+register_routes(app.server)
+register_order_api(app.server)
+register_yields_api(app.server)
+instrument_server(app.server)
+
+# the server binds without waiting for this, see /healthz
+start_warm_up()
+
+if BACKGROUND_REFRESH:
+    start_background_refresh()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+// Clientside renderer for the historical-curve-slider, see CLIENTSIDE_SLIDER in config.py
+// Mirrors layout.create_historical_curve_graph, using the historical-overview Store
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    historical: {
+        renderCurve: function (sliderIndex, resolution, movingAverage, overview) {
+            // rollups and moving averages are drawn by the server, see layout.is_daily_view
+            if (!overview || resolution !== "daily" || movingAverage !== "off") {
+                return window.dash_clientside.no_update;
+            }
+            const term = overview.terms[sliderIndex];
+            const series = overview.series[term];
+            const msPerDay = 24 * 60 * 60 * 1000;
+            return {
+                data: [
+                    {
+                        type: "scatter",
+                        x: series.days.map((day) => new Date(day * msPerDay).toISOString().slice(0, 10)),
+                        y: series.yields.map((basisPoints) => basisPoints / 100),
+                        mode: "lines",
+                        name: term,
+                        line: {color: "black"},
+                    },
+                ],
+                layout: Object.assign({template: overview.template}, overview.layouts[term]),
+            };
+        },
+    },
+});
@@ -0,0 +1,102 @@
+"""
+- Fills every missing or incomplete year csv between FIRST_YEAR and today
+- Years are synced concurrently over the pooled session from load_csv_data.get_session
+- Usage: python backfill.py [--first-year 1990] [--workers 8]
+"""
+
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from load_csv_data import (
+    FIRST_YEAR,
+    HTTP_POOL_SIZE,
+    csv_downloaded_for_year,
+    ensure_data_dir,
+    get_most_recent_weekday,
+    parse_csv_date,
+    read_newest_csv_date,
+    sync_year_csv,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def last_weekday_of_year(year: int) -> datetime:
+    day = datetime(year, 12, 31)
+    while day.weekday() >= 5:  # Saturday, Sunday
+        day -= timedelta(days=1)
+    return day
+
+
+def is_year_complete(year: int, today: datetime) -> bool:
+    """
+    - A past year is complete once it has its last weekday's row
+    - The current year is complete once it has the most recent weekday's row
+    """
+    if not csv_downloaded_for_year(year):
+        return False
+    newest_date: Optional[str] = read_newest_csv_date(year)
+    if newest_date is None:
+        return False
+    if year < today.year:
+        expected = last_weekday_of_year(year)
+    else:
+        expected = get_most_recent_weekday()
+    return parse_csv_date(newest_date).date() >= expected.date()
+
+
+def find_years_to_backfill(first_year: int = FIRST_YEAR) -> List[int]:
+    ensure_data_dir()
+    today = datetime.now()
+    return [
+        year
+        for year in range(first_year, today.year + 1)
+        if not is_year_complete(year, today)
+    ]
+
+
+def backfill(first_year: int = FIRST_YEAR, workers: int = HTTP_POOL_SIZE) -> Dict[int, int]:
+    """
+    - Syncs every missing or incomplete year, at most `workers` at a time
+    - Returns the number of rows added per year that was synced, years that failed are left out
+    """
+    years = find_years_to_backfill(first_year)
+    if not years:
+        return {}
+    logger.info(f"Backfilling {len(years)} years: {years}")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as pool:
+        rows_added = dict(zip(years, pool.map(try_sync_year_csv, years)))
+    return {year: added for year, added in rows_added.items() if added is not None}
+
+
+def try_sync_year_csv(year: int) -> Optional[int]:
+    """sync_year_csv, but a year that fails is logged and left for the next backfill instead of stopping the others"""
+    try:
+        return sync_year_csv(year)
+    except Exception as e:
+        logger.error(f"Failed to backfill {year}: {e}")
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1].lstrip("- "))
+    parser.add_argument("--first-year", type=int, default=FIRST_YEAR)
+    parser.add_argument("--workers", type=int, default=HTTP_POOL_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    rows_added = backfill(args.first_year, args.workers)
+    for year, added in sorted(rows_added.items()):
+        print(f"{year}: {added} rows added")
+    still_missing = find_years_to_backfill(args.first_year)
+    if still_missing:
+        # e.g. the current year before today's rates are published
+        print(f"Still incomplete: {still_missing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+- Benchmarks of the app's hot paths on synthetic data, see synthetic_data.py
+- Each benchmark records wall time (best of its repeats), peak traced memory and payload bytes
+  (what would be sent to the browser, or held in memory for pure data steps)
+- Results are compared against benchmark_baseline.json, a regression exits non-zero
+- Usage: python benchmark.py --scale 1x 10x [--update-baseline]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import shutil
+import sqlite3
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+from unittest.mock import patch
+
+from plotly.io.json import to_json_plotly
+
+import db
+from callbacks import create_lod_historical_curve_graph, historical_view_figure
+from data_model import Order
+from load_csv_data import FIRST_YEAR
+from layout import create_app_layout, create_historical_curve_graph
+from lod import prepare_lod_pyramids
+from prepare_graph_data import (
+    DataSnapshot,
+    prepare_historical_curves,
+    prepare_yield_history,
+    swap_snapshot,
+)
+from synthetic_data import SCALES, DataScale, generate
+from yield_cache import load_yield_history
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+BASELINE_PATH = Path("./benchmark_baseline.json")
+BENCHMARK_TERM = "10 Yr"
+INSERTED_ORDERS = 50
+
+# allowed growth over the baseline before it counts as a regression
+TIME_TOLERANCE = 1.0  # wall time is noisy, this still catches anything that changes complexity
+TIME_NOISE_FLOOR_SECONDS = 0.005
+MEMORY_TOLERANCE = 0.1
+PAYLOAD_TOLERANCE = 0.01  # payloads are deterministic, any real growth is a change
+
+
+class Measurement(NamedTuple):
+    seconds: float
+    peak_bytes: int
+    payload_bytes: int
+
+
+class Benchmark(NamedTuple):
+    name: str
+    run: Callable[[], int]  # returns the payload size in bytes
+    setup: Optional[Callable[[], None]] = None  # untimed, runs before every repeat
+    repeats: int = 3
+
+
+def measure(benchmark: Benchmark) -> Measurement:
+    """Best wall time of the repeats, then one more run under tracemalloc for the peak memory"""
+    best = float("inf")
+    payload_bytes = 0
+    for _ in range(benchmark.repeats):
+        if benchmark.setup:
+            benchmark.setup()
+        start = time.perf_counter()
+        payload_bytes = benchmark.run()
+        best = min(best, time.perf_counter() - start)
+
+    if benchmark.setup:
+        benchmark.setup()
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return Measurement(round(best, 4), peak_bytes, payload_bytes)
+
+
+@contextlib.contextmanager
+def synthetic_environment(scale: DataScale, paths: Dict[str, Path]) -> Iterator[None]:
+    """Points the data dir, caches, orders db and current snapshot at the synthetic data"""
+    with contextlib.ExitStack() as stack:
+        for target, value in (
+            ("load_csv_data.DATA_DIR", paths["data_dir"]),
+            ("yield_cache.DATA_DIR", paths["data_dir"]),
+            ("yield_cache.CACHE_DIR", paths["cache_dir"]),
+            ("curve_fit.CACHE_DIR", paths["cache_dir"]),
+            ("figure_cache.CACHE_DIR", paths["cache_dir"]),
+            ("db.DB_NAME", str(paths["db_path"])),
+        ):
+            stack.enter_context(patch(target, value))
+        yield_history = load_yield_history(last_year=last_year(scale))
+        stack.enter_context(
+            patch(
+                "prepare_graph_data._snapshot",
+                DataSnapshot(yield_history, yield_history.yield_curve_at(-1)),
+            )
+        )
+        yield
+
+
+def last_year(scale: DataScale) -> int:
+    return FIRST_YEAR + scale.years - 1
+
+
+def json_bytes(value) -> int:
+    return len(to_json_plotly(value).encode())
+
+
+def create_benchmarks(scale: DataScale, paths: Dict[str, Path]) -> List[Benchmark]:
+    scratch_db = paths["db_path"].with_name("insert_scratch.db")
+
+    def clear_yield_cache() -> None:
+        shutil.rmtree(paths["cache_dir"], ignore_errors=True)
+
+    def load_history() -> int:
+        return load_yield_history(last_year=last_year(scale)).nbytes
+
+    def swap_in_new_snapshot() -> int:
+        # the listeners rebuild every derived cache, as after a refresh that found new data
+        yield_history = load_yield_history(last_year=last_year(scale))
+        swap_snapshot(DataSnapshot(yield_history, yield_history.yield_curve_at(-1)))
+        return 0
+
+    def clear_derived_caches() -> None:
+        prepare_lod_pyramids.cache_clear()
+        for path in paths["cache_dir"].glob("curve_fits_*.npz"):
+            path.unlink()
+
+    def historical_curves() -> int:
+        return sum(
+            curve.dates.nbytes + curve.yields.nbytes
+            for curve in prepare_historical_curves().values()
+        )
+
+    def app_layout() -> int:
+        return json_bytes(create_app_layout())
+
+    def full_historical_curve_graph() -> int:
+        curve = prepare_yield_history().historical_curve(BENCHMARK_TERM)
+        return json_bytes(create_historical_curve_graph(BENCHMARK_TERM, curve))
+
+    def lod_historical_curve_graph() -> int:
+        return json_bytes(create_lod_historical_curve_graph(BENCHMARK_TERM, (None, None)))
+
+    def cached_historical_view_figure() -> int:
+        # warm after the first repeat, as after a refresh
+        return json_bytes(historical_view_figure(BENCHMARK_TERM, "daily", "off"))
+
+    def orders_table() -> int:
+        return len(json.dumps([order.to_table_row() for order in db.read_orders()]))
+
+    def orders_page() -> int:
+        return len(json.dumps([order.to_table_row() for order in db.read_orders_page(25).orders]))
+
+    def copy_orders_db() -> None:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{scratch_db}{suffix}").unlink(missing_ok=True)
+        with sqlite3.connect(paths["db_path"]) as source, sqlite3.connect(scratch_db) as target:
+            source.backup(target)
+
+    def insert_orders_one_by_one() -> int:
+        # one fsynced commit per order, the worst case the order writer's batching improves on
+        conn = db.connect_for_writes(str(scratch_db))
+        try:
+            for _ in range(INSERTED_ORDERS):
+                db.insert_order(conn, Order("10 Yr", 100_00, 443, "2025-05-16 12:00:00"))
+        finally:
+            conn.close()
+        return 0
+
+    return [
+        Benchmark("load_yield_history_cold", load_history, clear_yield_cache),
+        Benchmark("load_yield_history_warm", load_history),
+        Benchmark("swap_snapshot", swap_in_new_snapshot, clear_derived_caches, repeats=1),
+        Benchmark("prepare_historical_curves", historical_curves),
+        Benchmark("create_app_layout", app_layout),
+        Benchmark("create_historical_curve_graph", full_historical_curve_graph),
+        Benchmark("create_lod_historical_curve_graph", lod_historical_curve_graph),
+        Benchmark("historical_view_figure_cached", cached_historical_view_figure),
+        Benchmark("read_orders", orders_table),
+        Benchmark("read_orders_page", orders_page),
+        Benchmark(f"insert_order_x{INSERTED_ORDERS}", insert_orders_one_by_one, copy_orders_db),
+    ]
+
+
+def run_scale(root: Path, scale: DataScale, only: Optional[List[str]] = None) -> Dict[str, Measurement]:
+    paths = generate(root, scale)
+    results: Dict[str, Measurement] = {}
+    with synthetic_environment(scale, paths):
+        for benchmark in create_benchmarks(scale, paths):
+            if only and benchmark.name not in only:
+                continue
+            results[benchmark.name] = measure(benchmark)
+            logger.info(f"{scale.name} {benchmark.name}: {results[benchmark.name]}")
+    return results
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Measurement]], baseline: Dict[str, Dict[str, dict]]
+) -> List[str]:
+    """A description of every measurement that grew past its tolerance over the baseline"""
+    regressions = []
+    for scale_name, measurements in results.items():
+        for name, measurement in measurements.items():
+            expected = baseline.get(scale_name, {}).get(name)
+            if expected is None:
+                continue
+            seconds_limit = max(
+                expected["seconds"] * (1 + TIME_TOLERANCE),
+                expected["seconds"] + TIME_NOISE_FLOOR_SECONDS,
+            )
+            limits = (
+                ("seconds", seconds_limit),
+                ("peak_bytes", expected["peak_bytes"] * (1 + MEMORY_TOLERANCE)),
+                ("payload_bytes", expected["payload_bytes"] * (1 + PAYLOAD_TOLERANCE)),
+            )
+            for field, limit in limits:
+                value = getattr(measurement, field)
+                if value > limit:
+                    regressions.append(
+                        f"{scale_name} {name}: {field} {value} > {expected[field]} baseline"
+                    )
+    return regressions
+
+
+def read_baseline(path: Path = BASELINE_PATH) -> Dict[str, Dict[str, dict]]:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_baseline(results: Dict[str, Dict[str, Measurement]], path: Path = BASELINE_PATH) -> None:
+    # scales that weren't run keep their old baseline
+    baseline = read_baseline(path)
+    for scale_name, measurements in results.items():
+        baseline.setdefault(scale_name, {}).update(
+            {name: measurement._asdict() for name, measurement in measurements.items()}
+        )
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def print_results(results: Dict[str, Dict[str, Measurement]], baseline: Dict[str, Dict[str, dict]]) -> None:
+    print(f"{'benchmark':<40}{'seconds':>10}{'baseline':>10}{'peak MB':>10}{'payload KB':>12}")
+    for scale_name, measurements in results.items():
+        for name, measurement in measurements.items():
+            expected = baseline.get(scale_name, {}).get(name, {}).get("seconds")
+            print(
+                f"{scale_name + ' ' + name:<40}{measurement.seconds:>10.4f}"
+                f"{expected if expected is not None else '-':>10}"
+                f"{measurement.peak_bytes / 1e6:>10.1f}{measurement.payload_bytes / 1e3:>12.1f}"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths on synthetic data")
+    parser.add_argument("--root", type=Path, default=Path("./benchmark_data"))
+    parser.add_argument("--scale", choices=list(SCALES), nargs="+", default=["1x", "10x"])
+    parser.add_argument("--only", nargs="+", help="benchmark names to run, default all")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = {name: run_scale(args.root, SCALES[name], args.only) for name in args.scale}
+    baseline = read_baseline()
+    print_results(results, baseline)
+    if args.update_baseline:
+        write_baseline(results)
+        return 0
+    regressions = find_regressions(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    # the synthetic extra terms would otherwise log a warning for every csv
+    logging.getLogger("ingest").setLevel(logging.ERROR)
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+- Builds, ahead of time, everything the app would otherwise compute on its first requests
+- Compiles data/ into the yield cache, fits the yield curves, and renders and saves the default figures, all under cache/
+- Run at docker build time, so a new container only loads files: python build_snapshot.py
+- Doesn't download anything, the running app's background refresh does that
+"""
+
+import logging
+import time
+
+import callbacks  # noqa: F401, registers the figure warm-up along with every other derived cache
+from prepare_graph_data import current_snapshot, notify_snapshot_listeners
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def main() -> None:
+    start = time.perf_counter()
+    snapshot = current_snapshot()
+    notify_snapshot_listeners(snapshot)
+    logger.info(f"Built snapshot of data version {snapshot.version} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    main()
@@ -0,0 +1,206 @@
+"""
+- Bulk import and export of orders
+- Import validates every row, then writes the whole file in one transaction with chunked executemany
+- Export walks the table with a cursor one chunk at a time, so memory use does not grow with the table
+- Formats: csv (term, amount_cents, yield_basis_points, timestamp) and columnar (see columnar.py)
+- Usage:
+- - python bulk_orders.py import orders.csv
+- - python bulk_orders.py export orders.tcol
+"""
+
+import argparse
+import csv
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+import columnar
+import db
+from data_model import MAX_ORDER_CENTS, YieldHistory
+from terms import MATURITY_TERMS
+
+CHUNK_SIZE = 10_000
+COLUMNAR_SUFFIX = ".tcol"
+NULL_YIELD = np.iinfo(np.int32).min  # stands for a NULL yield_basis_points in columnar files
+CSV_FIELDS = ["id", "term", "amount_cents", "yield_basis_points", "timestamp"]
+# the highest yield the app can hold, anything above is a typo, and could overflow orders_summary's sums
+MAX_YIELD_BASIS_POINTS = int(np.iinfo(YieldHistory.YIELD_DTYPE).max)
+
+ORDER_COLUMNS: columnar.Columns = [
+    ("id", "<i8"),
+    ("term", "<i1"),  # index into the "terms" metadata
+    ("cents", "<i8"),
+    ("yield_basis_points", "<i4"),
+    ("created_at", "<i8"),  # epoch seconds
+]
+
+DbRow = Tuple[str, int, Optional[int], int]  # as in db.ORDER_COLUMNS
+
+
+class OrderImportError(ValueError):
+    def __init__(self, row_number: int, message: str):
+        super().__init__(f"Row {row_number}: {message}")
+        self.row_number = row_number
+
+
+def format_for(path: Path, fmt: Optional[str]) -> str:
+    if fmt is not None:
+        return fmt
+    return "columnar" if path.suffix == COLUMNAR_SUFFIX else "csv"
+
+
+def chunked(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk: List[Any] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_db_row(row_number: int, term: str, cents: int, yield_basis_points: Optional[int]) -> None:
+    if term not in MATURITY_TERMS:
+        raise OrderImportError(row_number, f"unknown term {term!r}")
+    # the same cap as the UI and the order API, which keeps orders_summary's sums inside sqlite's int64
+    if not 0 < cents <= MAX_ORDER_CENTS:
+        raise OrderImportError(row_number, f"amount_cents must be from 1 to {MAX_ORDER_CENTS}, got {cents}")
+    if yield_basis_points is not None and not 0 <= yield_basis_points <= MAX_YIELD_BASIS_POINTS:
+        raise OrderImportError(
+            row_number, f"yield_basis_points must be from 0 to {MAX_YIELD_BASIS_POINTS}, got {yield_basis_points}"
+        )
+
+
+def parse_csv_rows(file: TextIO) -> Iterator[DbRow]:
+    reader = csv.DictReader(file)
+    missing = {"term", "amount_cents", "yield_basis_points", "timestamp"} - set(reader.fieldnames or [])
+    if missing:
+        raise OrderImportError(1, f"missing columns {sorted(missing)}")
+    for row_number, row in enumerate(reader, start=2):  # the header is row 1
+        try:
+            cents = int(row["amount_cents"])
+            yield_basis_points = int(row["yield_basis_points"]) if row["yield_basis_points"] else None
+            created_at = db.timestamp_to_epoch(row["timestamp"])
+        except (TypeError, ValueError, OverflowError) as e:
+            raise OrderImportError(row_number, str(e)) from None
+        validate_db_row(row_number, row["term"], cents, yield_basis_points)
+        yield (row["term"], cents, yield_basis_points, created_at)
+
+
+def parse_columnar_rows(file) -> Iterator[DbRow]:
+    columns, metadata = columnar.read_header(file)
+    terms: List[str] = metadata.get("terms", MATURITY_TERMS)
+    row_number = 0
+    for chunk in columnar.read_chunks(file, columns):
+        for term_index, cents, yield_basis_points, created_at in zip(
+            chunk["term"].tolist(),
+            chunk["cents"].tolist(),
+            chunk["yield_basis_points"].tolist(),
+            chunk["created_at"].tolist(),
+        ):
+            row_number += 1
+            if not 0 <= term_index < len(terms):
+                raise OrderImportError(row_number, f"term index {term_index} out of range")
+            yield_or_none = None if yield_basis_points == NULL_YIELD else yield_basis_points
+            validate_db_row(row_number, terms[term_index], cents, yield_or_none)
+            yield (terms[term_index], cents, yield_or_none, created_at)
+
+
+def import_orders(path: Path, fmt: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    - Adds every order in the file, or none of them if any row is invalid
+    - Returns the number of orders imported
+    """
+    fmt = format_for(path, fmt)
+    imported = 0
+    if fmt == "columnar":
+        file = open(path, "rb")
+        rows = parse_columnar_rows(file)
+    else:
+        file = open(path, "r", newline="")
+        rows = parse_csv_rows(file)
+    with file:
+        conn = sqlite3.connect(db.DB_NAME, timeout=30)
+        try:
+            with conn:  # one transaction, rolled back if any chunk fails validation
+                conn.execute("BEGIN IMMEDIATE")
+                with db.bulk_insert_orders_summary(conn):
+                    for chunk in chunked(rows, chunk_size):
+                        conn.executemany(
+                            f"INSERT INTO orders ({db.ORDER_COLUMNS}) VALUES (?, ?, ?, ?)", chunk
+                        )
+                        imported += len(chunk)
+        finally:
+            conn.close()
+    return imported
+
+
+def iter_order_chunks(conn: sqlite3.Connection, chunk_size: int = CHUNK_SIZE) -> Iterator[List[Tuple[Any, ...]]]:
+    """(id, term, cents, yield_basis_points, created_at) rows in id order, chunk_size at a time"""
+    cur = conn.execute(f"SELECT id, {db.ORDER_COLUMNS} FROM orders ORDER BY id")
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def export_orders(path: Path, fmt: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Writes every order to path, returns the number of orders exported"""
+    fmt = format_for(path, fmt)
+    exported = 0
+    term_indices: Dict[str, int] = {term: index for index, term in enumerate(MATURITY_TERMS)}
+    with sqlite3.connect(db.DB_NAME) as conn:
+        if fmt == "columnar":
+            with open(path, "wb") as file:
+                file.write(columnar.encode_header(ORDER_COLUMNS, {"terms": MATURITY_TERMS}))
+                for rows in iter_order_chunks(conn, chunk_size):
+                    ids, terms, cents, yields, created_at = zip(*rows)
+                    chunk = {
+                        "id": np.array(ids, dtype=np.int64),
+                        "term": np.array([term_indices[term] for term in terms], dtype=np.int8),
+                        "cents": np.array(cents, dtype=np.int64),
+                        "yield_basis_points": np.array(
+                            [NULL_YIELD if y is None else y for y in yields], dtype=np.int32
+                        ),
+                        "created_at": np.array(created_at, dtype=np.int64),
+                    }
+                    file.write(columnar.encode_chunk(ORDER_COLUMNS, chunk))
+                    exported += len(rows)
+                file.write(columnar.encode_end())
+        else:
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(CSV_FIELDS)
+                for rows in iter_order_chunks(conn, chunk_size):
+                    writer.writerows(
+                        (id_, term, cents, "" if yield_ is None else yield_, db.epoch_to_timestamp(created_at))
+                        for id_, term, cents, yield_, created_at in rows
+                    )
+                    exported += len(rows)
+    return exported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import and export of orders")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "columnar"], default=None,
+                        help=f"default: columnar for {COLUMNAR_SUFFIX} files, csv otherwise")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.command == "import":
+        count = import_orders(args.path, args.format, args.chunk_size)
+        print(f"Imported {count} orders from {args.path}")
+    else:
+        count = export_orders(args.path, args.format, args.chunk_size)
+        print(f"Exported {count} orders to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,407 @@
-from dash.dependencies import Input, Output, State
+from dash import ctx, no_update
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
 from datetime import datetime
-import sqlite3
-from typing import Dict, List, Any
+from typing import Dict, List, Any, NamedTuple, Optional
+import logging
+import time
 
-from data_model import Order, YieldCurve, HistoricalCurve
-from db import insert_order, DB_NAME
+import numpy as np
+
+from config import CLIENTSIDE_SLIDER, LAZY_HISTORICAL_CURVES, SERVER_SIDE_ORDERS_TABLE
+from curve_fit import can_price_term, price_term
+from data_model import MAX_ORDER_CENTS, Order, YieldCurve, HistoricalCurve
 from terms import MATURITY_TERMS, Term
-from layout import create_historical_curve_graph
+from layout import (
+    DAILY,
+    MOVING_AVERAGE_OFF,
+    MovingAverage,
+    add_compare_date,
+    add_moving_average_trace,
+    cached_historical_overview,
+    cached_spread_figure,
+    cached_yield_curve_figure,
+    create_compare_yield_curve_graph,
+    create_historical_curve_graph,
+    create_historical_rollup_graph,
+    is_daily_view,
+    format_orders_valuation,
+    read_exposure_table_rows,
+    read_orders_table_page,
+)
+from lod import DateRange, prepare_lod_pyramids, relayout_x_range
+from order_writer import ORDER_ACK_TIMEOUT_SECONDS, write_order
+from figure_cache import CachedFigure, cached_figure, load_figures, save_figures
+from prepare_graph_data import DataSnapshot, prepare_yield_history, register_snapshot_listener
+from rollups import prepare_rollups
+from spreads import WATCHED_SPREADS
+from valuation import order_book_summary
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ORDER_PENDING_MESSAGE = (
+    "Your order is taking longer than usual to save. It will still be placed, there is no need to place it again"
+)
+
+
+class PlacedOrder(NamedTuple):
+    order: Order
+    pending: bool  # still queued when the wait for it ran out, it will be written without being placed again
 
 
 def create_new_order(
     yield_curve: Dict[str, Any], selected_term: Term, amount_dollars: float
 ) -> Order:
-    index: int = yield_curve["terms"].index(selected_term)
-    yield_for_selected_term: int = yield_curve["yields"][index]
-
+    """
+    - Priced at the day's quoted yield for the term
+    - Terms not quoted that day are priced on the monotone cubic through the day's quotes
+    """
     order = Order(
         term=selected_term,
         amount_cents=int(round(amount_dollars * 100)),
-        yield_basis_points=yield_for_selected_term,
+        yield_basis_points=price_term(YieldCurve(**yield_curve), selected_term),
         timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     )
     return order
 
 
-def register_callbacks(app):
-    @app.callback(
-        Output("historical-curve-graph", "figure"),
-        Input("historical-curve-slider", "value"),
-        State("historical-curves", "data"),
+def create_lod_historical_curve_graph(term: Term, date_range: DateRange):
+    """The server-side figure for term, downsampled to fit date_range"""
+    pyramid = prepare_lod_pyramids(prepare_yield_history())[term]
+    return create_historical_curve_graph(term, pyramid.view(date_range))
+
+
+def moving_average_at(term: Term, moving_average: str, dates: np.ndarray) -> Optional[MovingAverage]:
+    """The term's materialized rolling mean, sampled at some of its own dates"""
+    if moving_average == MOVING_AVERAGE_OFF:
+        return None
+    curve_dates = prepare_yield_history().historical_curve(term).dates
+    rows = np.searchsorted(curve_dates, dates)
+    means = prepare_rollups().rolling_means[moving_average][term]
+    return moving_average, curve_dates[rows], means[rows]
+
+
+def create_historical_view_graph(
+    term: Term, resolution: str, moving_average: str, date_range: DateRange = (None, None)
+):
+    """
+    - The historical graph for any resolution and moving average, served from rollups.py
+    - Daily views are the LOD line for date_range, rollups show one candle per period
+    """
+    if resolution == DAILY:
+        view = prepare_lod_pyramids(prepare_yield_history())[term].view(date_range)
+        figure = create_historical_curve_graph(term, view)
+        average = moving_average_at(term, moving_average, view.dates)
+        if average is not None:
+            add_moving_average_trace(figure, average)
+        return figure
+
+    ohlc = prepare_rollups().ohlc[resolution][term]
+    curve_dates = prepare_yield_history().historical_curve(term).dates
+    # the average as of each period's last business day, alongside its close
+    period_ends = np.r_[np.searchsorted(curve_dates, ohlc.periods[1:]), len(curve_dates)] - 1
+    return create_historical_rollup_graph(
+        term, resolution, ohlc, moving_average_at(term, moving_average, curve_dates[period_ends])
     )
-    def update_historical_curve_graph(
-        slider_index: int, historical_curves: Dict[str, Dict[str, List[Any]]]
-    ):
-        term = MATURITY_TERMS[slider_index]
-        return create_historical_curve_graph(
-            term, HistoricalCurve.from_dict(historical_curves[term])
+
+
+def historical_view_figure(
+    term: Term, resolution: str, moving_average: str, date_range: DateRange = (None, None)
+):
+    """
+    - create_historical_view_graph, served from the figure cache when fully zoomed out
+    - Zoomed ranges are arbitrary, so those are still built per request
+    """
+    if date_range != (None, None):
+        return create_historical_view_graph(term, resolution, moving_average, date_range)
+    return cached_historical_view(term, resolution, moving_average).figure
+
+
+def cached_historical_view(term: Term, resolution: str, moving_average: str) -> CachedFigure:
+    return cached_figure(
+        ("historical", term, resolution, moving_average),
+        lambda: create_historical_view_graph(term, resolution, moving_average),
+    )
+
+
+def warm_figure_cache(snapshot: DataSnapshot) -> None:
+    """
+    - Every term's default view, the default spread, and what every page load embeds: the current yield curve
+      and the overview
+    - Loaded from the figures saved for this data version if there are any, built and saved otherwise
+    """
+    start = time.perf_counter()
+    loaded = load_figures(snapshot.version)
+    cached_yield_curve_figure(snapshot.yield_curve)
+    if CLIENTSIDE_SLIDER:
+        cached_historical_overview()
+    for term in snapshot.yield_history.terms:
+        historical_view_figure(term, DAILY, MOVING_AVERAGE_OFF)
+    cached_spread_figure(*WATCHED_SPREADS[0], MOVING_AVERAGE_OFF)
+    if not loaded:
+        save_figures(snapshot.version)
+    logger.info(
+        f"Warmed the figure cache in {time.perf_counter() - start:.2f}s, {loaded} figures loaded from disk"
+    )
+
+
+register_snapshot_listener(warm_figure_cache)
+
+
+def register_historical_curve_callback(app):
+    if CLIENTSIDE_SLIDER:
+        # dragging the slider is handled entirely in the browser by assets/historical_curve.js,
+        # unless a rollup or moving average is selected, which update_historical_view draws
+        app.clientside_callback(
+            ClientsideFunction(namespace="historical", function_name="renderCurve"),
+            Output("historical-curve-graph", "figure"),
+            Input("historical-curve-slider", "value"),
+            Input("historical-resolution", "value"),
+            Input("historical-moving-average", "value"),
+            State("historical-overview", "data"),
         )
 
+        @app.callback(
+            Output("historical-curve-graph", "figure", allow_duplicate=True),
+            Input("historical-curve-slider", "value"),
+            Input("historical-resolution", "value"),
+            Input("historical-moving-average", "value"),
+            prevent_initial_call=True,
+        )
+        def update_historical_view(slider_index: int, resolution: str, moving_average: str):
+            if is_daily_view(resolution, moving_average):
+                raise PreventUpdate
+            return historical_view_figure(MATURITY_TERMS[slider_index], resolution, moving_average)
+
+        @app.callback(
+            Output("historical-curve-graph", "figure", allow_duplicate=True),
+            Input("historical-curve-graph", "relayoutData"),
+            State("historical-curve-slider", "value"),
+            State("historical-resolution", "value"),
+            State("historical-moving-average", "value"),
+            prevent_initial_call=True,
+        )
+        def refine_historical_curve_graph(
+            relayout_data: Optional[Dict[str, Any]],
+            slider_index: int,
+            resolution: str,
+            moving_average: str,
+        ):
+            # the shipped overview is coarse, so zooming in still asks the server for finer data
+            # rollups are small enough to have been sent whole
+            date_range = relayout_x_range(relayout_data)
+            if date_range is None or resolution != DAILY:
+                raise PreventUpdate
+            return create_historical_view_graph(
+                MATURITY_TERMS[slider_index], DAILY, moving_average, date_range
+            )
+
+    elif LAZY_HISTORICAL_CURVES:
+
+        @app.callback(
+            Output("historical-curve-graph", "figure"),
+            Input("historical-curve-slider", "value"),
+            Input("historical-curve-graph", "relayoutData"),
+            Input("historical-resolution", "value"),
+            Input("historical-moving-average", "value"),
+        )
+        def update_historical_curve_graph(
+            slider_index: int,
+            relayout_data: Optional[Dict[str, Any]],
+            resolution: str,
+            moving_average: str,
+        ):
+            # only the slider value and zoom range travel over the wire,
+            # the series comes from the server-side store, downsampled to fit the visible range
+            term = MATURITY_TERMS[slider_index]
+            if ctx.triggered_id == "historical-curve-graph":
+                date_range = relayout_x_range(relayout_data)
+                if date_range is None or resolution != DAILY:
+                    raise PreventUpdate
+            else:
+                date_range = (None, None)  # a new term starts fully zoomed out
+            return historical_view_figure(term, resolution, moving_average, date_range)
+
+    else:
+
+        @app.callback(
+            Output("historical-curve-graph", "figure"),
+            Input("historical-curve-slider", "value"),
+            Input("historical-resolution", "value"),
+            Input("historical-moving-average", "value"),
+            State("historical-curves", "data"),
+        )
+        def update_historical_curve_graph(
+            slider_index: int,
+            resolution: str,
+            moving_average: str,
+            historical_curves: Dict[str, Dict[str, List[Any]]],
+        ):
+            term = MATURITY_TERMS[slider_index]
+            if not is_daily_view(resolution, moving_average):
+                return historical_view_figure(term, resolution, moving_average)
+            return create_historical_curve_graph(
+                term, HistoricalCurve.from_dict(historical_curves[term])
+            )
+
+
+def register_compare_dates_callbacks(app):
+    @app.callback(
+        Output("compare-dates", "options"),
+        Output("compare-dates", "value"),
+        Output("compare-date-picker", "date"),
+        Input("compare-date-picker", "date"),
+        State("compare-dates", "value"),
+        prevent_initial_call=True,
+    )
+    def pick_compare_date(picked_date: Optional[str], compare_dates: Optional[List[str]]):
+        if not picked_date:
+            raise PreventUpdate
+        compare_dates = add_compare_date(picked_date, compare_dates or [])
+        options = [
+            {"label": datetime.strptime(date_, "%Y-%m-%d").strftime("%m/%d/%Y"), "value": date_}
+            for date_ in compare_dates
+        ]
+        # clear the picker so the same date can be picked again after being removed
+        return options, compare_dates, None
+
     @app.callback(
-        Output("table", "data"),
-        Input("place-order-button", "n_clicks"),
-        State("term-dropdown", "value"),
-        State("amount-input", "value"),
-        State("table", "data"),
+        Output("graph", "figure"),
+        Input("compare-dates", "value"),
         State("yield-curve", "data"),
+        prevent_initial_call=True,
+    )
+    def update_yield_curve_graph(compare_dates: Optional[List[str]], yield_curve: Dict[str, Any]):
+        return create_compare_yield_curve_graph(YieldCurve(**yield_curve), compare_dates or [])
+
+
+def register_spread_graph_callback(app):
+    @app.callback(
+        Output("spread-graph", "figure"),
+        Input("spread-long-term", "value"),
+        Input("spread-short-term", "value"),
+        Input("spread-moving-average", "value"),
     )
-    def place_order(
-        n_clicks: int,
-        selected_term: Term,
-        amount_dollars: float,
-        table_rows: List[Dict[str, Any]],
-        yield_curve: Dict[str, Any],
+    def update_spread_graph(long_term: Term, short_term: Term, moving_average: str):
+        # also runs on page load, so the spread figure isn't part of the initial layout
+        if long_term == short_term:
+            raise PreventUpdate
+        return cached_spread_figure(long_term, short_term, moving_average)
+
+
+def register_callbacks(app):
+    register_historical_curve_callback(app)
+    register_spread_graph_callback(app)
+
+    register_orders_table_callback(app)
+    register_compare_dates_callbacks(app)
+
+
+def place_order_from_inputs(
+    n_clicks: int,
+    selected_term: Term,
+    amount_dollars: float,
+    yield_curve: Dict[str, Any],
+) -> Optional[PlacedOrder]:
+    """
+    - Creates and durably writes the order described by the inputs, if they describe one
+    - An order the writer hasn't committed within ORDER_ACK_TIMEOUT_SECONDS is reported as pending, not failed:
+      it is still queued, and placing it again would book it twice
+    """
+    # amount_dollars may actually be stored as int or float
+    # this is because Dash will use int if the order is placed with e.g. 55 as the amount
+    # but, it will use a float if it's placed with 55.01
+    # in any case, we are going to immediately multiply by 100, round, and cast to int for the number of cents
+    if (
+        n_clicks > 0
+        and can_price_term(yield_curve["terms"], selected_term)
+        and amount_dollars is not None
+        and round(amount_dollars * 100) <= MAX_ORDER_CENTS
     ):
-        # amount_dollars may actually be stored as int or float
-        # this is because Dash will use int if the order is placed with e.g. 55 as the amount
-        # but, it will use a float if it's placed with 55.01
-        # in any case, we are going to immediately multiply by 100, round, and cast to int for the number of cents
-        if n_clicks > 0 and selected_term in yield_curve["terms"]:
-            order: Order = create_new_order(yield_curve, selected_term, amount_dollars)
-            table_rows.insert(0, order.to_table_row())
-
-            # global conn doesn't work within dash component thread
-            # need to open a new connection within this thread.
-            with sqlite3.connect(DB_NAME) as conn:
-                insert_order(conn, order)
-        return table_rows
+        order: Order = create_new_order(yield_curve, selected_term, amount_dollars)
+        # the order writer thread owns the db connection and batches concurrent orders
+        # into one commit; this waits until ours is durable
+        try:
+            write_order(order)
+        except TimeoutError:
+            logger.warning(f"Order not written within {ORDER_ACK_TIMEOUT_SECONDS}s, reported as pending: {order}")
+            return PlacedOrder(order, pending=True)
+        return PlacedOrder(order, pending=False)
+    return None
+
+
+def register_orders_table_callback(app):
+    if SERVER_SIDE_ORDERS_TABLE:
+
+        @app.callback(
+            Output("table", "data"),
+            Output("table", "page_count"),
+            Output("table", "page_current"),
+            Output("orders-page-cursors", "data"),
+            Output("orders-valuation", "children"),
+            Output("exposure-table", "data"),
+            Input("place-order-button", "n_clicks"),
+            Input("table", "page_current"),
+            Input("table", "sort_by"),
+            State("table", "page_size"),
+            State("term-dropdown", "value"),
+            State("amount-input", "value"),
+            State("yield-curve", "data"),
+            State("orders-page-cursors", "data"),
+            prevent_initial_call=True,  # the layout already holds the first page
+        )
+        def update_orders_table(
+            n_clicks: int,
+            page_current: int,
+            sort_by: List[Dict[str, str]],
+            page_size: int,
+            selected_term: Term,
+            amount_dollars: float,
+            yield_curve: Dict[str, Any],
+            cursors: Dict[str, Any],
+        ):
+            valuation = exposure = no_update
+            if ctx.triggered_id == "place-order-button":
+                placed = place_order_from_inputs(n_clicks, selected_term, amount_dollars, yield_curve)
+                # the new order may land on any page, start over from the first one
+                page_current, cursors = 0, {}
+                if placed is not None and placed.pending:
+                    valuation = ORDER_PENDING_MESSAGE
+                else:
+                    valuation = format_orders_valuation(order_book_summary())
+                exposure = read_exposure_table_rows()
+            elif "table.sort_by" in ctx.triggered_prop_ids:
+                page_current = 0
+            rows, page_count, cursors = read_orders_table_page(
+                page_current, page_size, sort_by, cursors
+            )
+            return rows, page_count, page_current, cursors, valuation, exposure
+
+    else:
+
+        @app.callback(
+            Output("table", "data"),
+            Output("orders-valuation", "children"),
+            Output("exposure-table", "data"),
+            Input("place-order-button", "n_clicks"),
+            State("term-dropdown", "value"),
+            State("amount-input", "value"),
+            State("table", "data"),
+            State("yield-curve", "data"),
+        )
+        def place_order(
+            n_clicks: int,
+            selected_term: Term,
+            amount_dollars: float,
+            table_rows: List[Dict[str, Any]],
+            yield_curve: Dict[str, Any],
+        ):
+            placed = place_order_from_inputs(n_clicks, selected_term, amount_dollars, yield_curve)
+            if placed is None:
+                return table_rows, no_update, no_update
+            if placed.pending:
+                # not in the table until it is written, and a reload shows it then
+                return table_rows, ORDER_PENDING_MESSAGE, no_update
+            table_rows.insert(0, placed.order.to_table_row())
+            return table_rows, format_orders_valuation(order_book_summary()), read_exposure_table_rows()
@@ -0,0 +1,85 @@
+"""
+- A compact, streamable columnar file format
+- One JSON header line: {"format": "treasury-columnar", "version": 1, "columns": [[name, dtype], ...], "metadata": {...}}
+- Then chunks: a little-endian uint32 row count, followed by each column's packed little-endian values
+- A chunk with a row count of 0 ends the stream
+- Writers and readers hold one chunk at a time, so files of any size stream in constant memory
+"""
+
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT_NAME = "treasury-columnar"
+FORMAT_VERSION = 1
+MEDIA_TYPE = "application/vnd.treasury-columnar"
+
+Columns = List[Tuple[str, str]]  # (name, little-endian numpy dtype string e.g. "<i8")
+Chunk = Dict[str, np.ndarray]
+
+_ROW_COUNT = struct.Struct("<I")
+
+
+class ColumnarFormatError(ValueError):
+    pass
+
+
+def encode_header(columns: Columns, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    for name, dtype in columns:
+        if np.dtype(dtype).byteorder == ">":
+            raise ColumnarFormatError(f"Column {name} must be little-endian, got {dtype}")
+    header = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "columns": [list(column) for column in columns],
+        "metadata": metadata or {},
+    }
+    return json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def encode_chunk(columns: Columns, chunk: Chunk) -> bytes:
+    row_counts = {len(chunk[name]) for name, _ in columns}
+    if len(row_counts) != 1:
+        raise ColumnarFormatError(f"Columns have different lengths: {row_counts}")
+    (row_count,) = row_counts
+    if row_count == 0:
+        return b""  # an empty chunk would read as the end of the stream
+    parts = [_ROW_COUNT.pack(row_count)]
+    for name, dtype in columns:
+        parts.append(np.ascontiguousarray(chunk[name], dtype=dtype).tobytes())
+    return b"".join(parts)
+
+
+def encode_end() -> bytes:
+    return _ROW_COUNT.pack(0)
+
+
+def read_exactly(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ColumnarFormatError("Unexpected end of columnar stream")
+    return data
+
+
+def read_header(f: BinaryIO) -> Tuple[Columns, Dict[str, Any]]:
+    try:
+        header = json.loads(f.readline())
+    except ValueError as e:
+        raise ColumnarFormatError(f"Bad columnar header: {e}") from None
+    if header.get("format") != FORMAT_NAME or header.get("version") != FORMAT_VERSION:
+        raise ColumnarFormatError(f"Not a {FORMAT_NAME} v{FORMAT_VERSION} stream")
+    return [tuple(column) for column in header["columns"]], header["metadata"]
+
+
+def read_chunks(f: BinaryIO, columns: Columns) -> Iterator[Chunk]:
+    while True:
+        (row_count,) = _ROW_COUNT.unpack(read_exactly(f, _ROW_COUNT.size))
+        if row_count == 0:
+            return
+        chunk: Chunk = {}
+        for name, dtype in columns:
+            size = row_count * np.dtype(dtype).itemsize
+            chunk[name] = np.frombuffer(read_exactly(f, size), dtype=dtype)
+        yield chunk
@@ -0,0 +1,48 @@
+"""
+- Runtime switches, read from environment variables
+- e.g. LAZY_HISTORICAL_CURVES=0 python3 ./app.py
+"""
+
+import os
+
+
+def env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+# When on, the page does not embed every term's history in the historical-curves Store.
+# The historical graph callback reads the selected term from the server-side YieldHistory instead,
+# and browsers can fetch single terms from /data/historical-curves/<term> with ETag caching
+LAZY_HISTORICAL_CURVES: bool = env_flag("LAZY_HISTORICAL_CURVES", True)
+
+# When on, moving the historical-curve-slider redraws the graph in the browser (assets/historical_curve.js)
+# from a compact overview of every term shipped once with the page. Zooming still refines on the server.
+# Takes precedence over LAZY_HISTORICAL_CURVES for the slider; turn off to fall back to the server callback
+CLIENTSIDE_SLIDER: bool = env_flag("CLIENTSIDE_SLIDER", True)
+
+# Seconds between background checks for new treasury data, see refresh.py
+REFRESH_INTERVAL_SECONDS: float = float(os.environ.get("REFRESH_INTERVAL_SECONDS", 15 * 60))
+
+# Turn off to never download at runtime, e.g. in tests or offline deployments
+BACKGROUND_REFRESH: bool = env_flag("BACKGROUND_REFRESH", True)
+
+# When on, the orders table is paged and sorted on the server with keyset queries (db.read_orders_page)
+# instead of loading every order into the page
+SERVER_SIDE_ORDERS_TABLE: bool = env_flag("SERVER_SIDE_ORDERS_TABLE", True)
+ORDERS_PAGE_SIZE: int = int(os.environ.get("ORDERS_PAGE_SIZE", 25))
+
+# When on, yield data is read from the read-only store published under cache/shared/ (shared_store.py),
+# memory-mapped so every worker process shares one copy, and only one process downloads per refresh.
+# gunicorn.conf.py turns it on for the production server
+SHARED_YIELD_STORE: bool = env_flag("SHARED_YIELD_STORE", False)
+
+# When on, every request runs under cProfile and its stats are written to profiles/, see metrics.py.
+# Slows requests down, only for tracking down a slow path: PROFILE_REQUESTS=1 python3 ./app.py
+PROFILE_REQUESTS: bool = env_flag("PROFILE_REQUESTS", False)
+
+# When on, every worker process writes its metrics to cache/metrics/ and /metrics adds up every worker's,
+# instead of reporting only the worker that answered, see metrics.py. gunicorn.conf.py turns it on
+SHARED_METRICS: bool = env_flag("SHARED_METRICS", False)
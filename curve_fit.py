@@ -0,0 +1,299 @@
+"""
+- Yield curve interpolation, so any maturity can be priced on any date
+- Two models, both fit once for every date in the YieldHistory:
+- - monotone cubic spline (PCHIP): passes through every quoted yield without overshooting
+- - Nelson-Siegel-Svensson (NSS): a smooth 6-parameter curve, fit by least squares
+- Dates are grouped by which terms were quoted, and each group is fit in one vectorized pass
+- Fits are cached next to the yield cache, keyed by the data version
+- Orders are priced and the yield curve graph is drawn off the current version's fits, see fitted_curve
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_model import YieldCurve, YieldHistory
+from metrics import CACHE_REQUESTS, count_cache
+from prepare_graph_data import DataSnapshot, prepare_yield_history, register_snapshot_listener
+from shared_store import register_publish_listener
+from terms import MATURITY_TERMS, Term, term_years
+from yield_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PCHIP = "pchip"
+NSS = "nss"
+CURVE_FIT_METHODS = [PCHIP, NSS]
+
+MIN_NSS_KNOTS = 5  # NSS has 4 linear parameters, fewer quotes than that cannot pin it down
+# the two NSS decay times (years) are chosen from this grid, per date, by least squares
+NSS_DECAY_GRID = np.geomspace(0.25, 30, 16)
+
+
+def pchip_slopes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    - Knot slopes of the monotone cubic interpolant (Fritsch-Carlson, as in scipy's PchipInterpolator)
+    - x: (knots,) increasing, y: (curves, knots); returns (curves, knots)
+    """
+    h = np.diff(x)
+    delta = np.diff(y, axis=1) / h
+    slopes = np.zeros_like(y, dtype=np.float64)
+    if len(x) == 2:
+        slopes[:] = delta
+        return slopes
+
+    # interior: weighted harmonic mean of the neighbouring secants, 0 at local extrema
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = delta[:, :-1] * delta[:, 1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / delta[:, :-1] + w2 / delta[:, 1:])
+    slopes[:, 1:-1] = np.where(same_sign, harmonic, 0.0)
+
+    # ends: shape-preserving three-point estimates
+    slopes[:, 0] = _end_slope(h[0], h[1], delta[:, 0], delta[:, 1])
+    slopes[:, -1] = _end_slope(h[-1], h[-2], delta[:, -1], delta[:, -2])
+    return slopes
+
+
+def _end_slope(h0: float, h1: float, delta0: np.ndarray, delta1: np.ndarray) -> np.ndarray:
+    slope = ((2 * h0 + h1) * delta0 - h0 * delta1) / (h0 + h1)
+    slope = np.where(np.sign(slope) != np.sign(delta0), 0.0, slope)
+    overshoots = (np.sign(delta0) != np.sign(delta1)) & (np.abs(slope) > np.abs(3 * delta0))
+    return np.where(overshoots, 3 * delta0, slope)
+
+
+def hermite_eval(x: np.ndarray, y: np.ndarray, slopes: np.ndarray, xq: np.ndarray) -> np.ndarray:
+    """
+    - Evaluates cubic Hermite curves at xq, clamped to the first/last knot outside the knot range
+    - x: (knots,), y and slopes: (curves, knots), xq: (queries,); returns (curves, queries)
+    """
+    xq = np.clip(xq, x[0], x[-1])
+    k = np.clip(np.searchsorted(x, xq, "right") - 1, 0, len(x) - 2)
+    h = x[k + 1] - x[k]
+    t = (xq - x[k]) / h
+    h00 = (1 + 2 * t) * (1 - t) ** 2
+    h10 = t * (1 - t) ** 2
+    h01 = t**2 * (3 - 2 * t)
+    h11 = t**2 * (t - 1)
+    return (
+        h00 * y[:, k]
+        + h10 * h * slopes[:, k]
+        + h01 * y[:, k + 1]
+        + h11 * h * slopes[:, k + 1]
+    )
+
+
+def nss_basis(maturities: np.ndarray, decay1: float, decay2: float) -> np.ndarray:
+    """(maturities, 4) design matrix of the NSS loadings"""
+
+    def slope_loading(decay: float) -> np.ndarray:
+        scaled = maturities / decay
+        return (1 - np.exp(-scaled)) / scaled
+
+    def curvature_loading(decay: float) -> np.ndarray:
+        return slope_loading(decay) - np.exp(-maturities / decay)
+
+    return np.column_stack(
+        [
+            np.ones_like(maturities),
+            slope_loading(decay1),
+            curvature_loading(decay1),
+            curvature_loading(decay2),
+        ]
+    )
+
+
+def nss_eval(params: np.ndarray, maturities: np.ndarray) -> np.ndarray:
+    """params: (curves, 6) as [b0, b1, b2, b3, decay1, decay2]; returns (curves, maturities)"""
+    out = np.empty((len(params), len(maturities)))
+    for row, (b0, b1, b2, b3, decay1, decay2) in enumerate(params):
+        out[row] = nss_basis(maturities, decay1, decay2) @ np.array([b0, b1, b2, b3])
+    return out
+
+
+def fit_nss(maturities: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    - Least-squares NSS fit of many curves quoted at the same maturities
+    - For a fixed pair of decays the fit is linear, so every pair on NSS_DECAY_GRID is solved for
+      all curves at once and each curve keeps its best pair
+    - Returns (curves, 6)
+    """
+    best_error = np.full(len(y), np.inf)
+    best = np.full((len(y), 6), np.nan)
+    for i, decay1 in enumerate(NSS_DECAY_GRID):
+        for decay2 in NSS_DECAY_GRID[i + 1 :]:
+            basis = nss_basis(maturities, decay1, decay2)
+            betas = np.linalg.lstsq(basis, y.T, rcond=None)[0].T  # (curves, 4)
+            error = ((betas @ basis.T - y) ** 2).sum(axis=1)
+            better = error < best_error
+            best_error[better] = error[better]
+            best[better, :4] = betas[better]
+            best[better, 4:] = decay1, decay2
+    return best
+
+
+class CurveFits:
+    """
+    - Per-date interpolation parameters for a YieldHistory
+    - pchip_slopes: (dates, terms) knot slopes, NaN where the term was not quoted
+    - nss_params: (dates, 6), NaN for dates with too few quotes
+    - Queries only touch one date's row, so they cost O(terms) however long the history is
+    """
+
+    def __init__(self, yield_history: YieldHistory, pchip_slopes: np.ndarray, nss_params: np.ndarray):
+        self.yield_history = yield_history
+        self.maturities = np.array([term_years(term) for term in yield_history.terms])
+        self.pchip_slopes = pchip_slopes
+        self.nss_params = nss_params
+
+    @staticmethod
+    def fit(yield_history: YieldHistory) -> "CurveFits":
+        maturities = np.array([term_years(term) for term in yield_history.terms])
+        order = np.argsort(maturities)
+        if not (order == np.arange(len(order))).all():
+            raise ValueError("YieldHistory terms must be in maturity order")
+
+        slopes = np.full(yield_history.yields.shape, np.nan, dtype=np.float32)
+        nss_params = np.full((len(yield_history), 6), np.nan)
+        patterns, pattern_of_row = np.unique(yield_history.valid, axis=0, return_inverse=True)
+        for pattern_index, pattern in enumerate(patterns):
+            if pattern.sum() < 2:
+                continue
+            rows = np.flatnonzero(pattern_of_row.ravel() == pattern_index)
+            knots = maturities[pattern]
+            y = yield_history.yields[np.ix_(rows, np.flatnonzero(pattern))].astype(np.float64)
+            slopes[np.ix_(rows, np.flatnonzero(pattern))] = pchip_slopes(knots, y)
+            if pattern.sum() >= MIN_NSS_KNOTS:
+                nss_params[rows] = fit_nss(knots, y)
+        return CurveFits(yield_history, slopes, nss_params)
+
+    def _knots(self, row: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        valid = self.yield_history.valid[row]
+        if valid.sum() < 2:
+            raise ValueError(f"Not enough quotes on {self.yield_history.dates[row]} to interpolate")
+        return (
+            self.maturities[valid],
+            self.yield_history.yields[row][valid][None, :].astype(np.float64),
+            self.pchip_slopes[row][valid][None, :].astype(np.float64),
+        )
+
+    def pchip_yields(self, row: int, maturities: np.ndarray) -> np.ndarray:
+        """Basis points on the monotone cubic through the row's quotes"""
+        x, y, slopes = self._knots(row)
+        return hermite_eval(x, y, slopes, np.asarray(maturities, dtype=np.float64))[0]
+
+    def has_nss(self, row: int) -> bool:
+        return not np.isnan(self.nss_params[row]).any()
+
+    def nss_yields(self, row: int, maturities: np.ndarray) -> np.ndarray:
+        """Basis points on the row's NSS curve"""
+        if not self.has_nss(row):
+            raise ValueError(f"Not enough quotes on {self.yield_history.dates[row]} for an NSS fit")
+        return nss_eval(self.nss_params[row][None, :], np.asarray(maturities, dtype=np.float64))[0]
+
+    def yields_at(self, row: int, maturities: np.ndarray, method: str = PCHIP) -> np.ndarray:
+        """Basis points at maturities (years) on the row's curve, by either model"""
+        evaluate = self.pchip_yields if method == PCHIP else self.nss_yields
+        return evaluate(row, maturities)
+
+    def yield_for_term(self, row: int, term: Term, method: str = PCHIP) -> int:
+        """A term's yield in basis points on the row's date, quoted if available, else interpolated"""
+        index = self.yield_history.term_index(term)
+        if self.yield_history.valid[row, index]:
+            return int(self.yield_history.yields[row, index])
+        return int(round(float(self.yields_at(row, np.array([term_years(term)]), method)[0])))
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, pchip_slopes=self.pchip_slopes, nss_params=self.nss_params)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(yield_history: YieldHistory, path: str) -> "CurveFits":
+        with np.load(path) as saved:
+            return CurveFits(yield_history, saved["pchip_slopes"], saved["nss_params"])
+
+
+def curve_fits_path(version: str) -> str:
+    return str(CACHE_DIR / f"curve_fits_{version}.npz")
+
+
+@count_cache("curve_fits")
+@lru_cache(maxsize=1)
+def prepare_curve_fits(yield_history: YieldHistory) -> CurveFits:
+    """
+    - Loaded from the cache if this data version was fit before, fit and saved otherwise
+    - Fits of other data versions are deleted, only the current one is worth keeping
+    """
+    path = curve_fits_path(yield_history.version)
+    if os.path.exists(path):
+        try:
+            curve_fits = CurveFits.load(yield_history, path)
+            CACHE_REQUESTS.inc(cache="curve_fits_file", result="hit")
+            return curve_fits
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Unreadable curve fits {path}, refitting: {e}")
+
+    CACHE_REQUESTS.inc(cache="curve_fits_file", result="miss")
+    logger.info(f"Fitting yield curves for data version {yield_history.version}")
+    curve_fits = CurveFits.fit(yield_history)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    curve_fits.save(path)
+    for old_path in CACHE_DIR.glob("curve_fits_*.npz"):
+        if str(old_path) != path:
+            old_path.unlink(missing_ok=True)
+    return curve_fits
+
+
+def fitted_curve(yield_curve: YieldCurve) -> Tuple[CurveFits, int]:
+    """
+    - The fits holding yield_curve, and its row in them
+    - Curves the app draws or prices are rows of the current history, so these are the current version's fits,
+      and no request fits a curve again
+    - A curve that isn't, e.g. one a browser kept from before a refresh, is fit on its own
+    """
+    yield_history = prepare_yield_history()
+    row: Optional[int] = yield_history.row_of_yield_curve(yield_curve)
+    if row is not None:
+        CACHE_REQUESTS.inc(cache="fitted_curve", result="hit")
+        return prepare_curve_fits(yield_history), row
+    CACHE_REQUESTS.inc(cache="fitted_curve", result="miss")
+    return CurveFits.fit(YieldHistory.from_yield_curve(yield_curve)), 0
+
+
+def can_price_term(terms: Sequence[Term], term: Term) -> bool:
+    """A term is priceable if it was quoted, or if there are at least two quotes to interpolate between"""
+    return term in terms or (term in MATURITY_TERMS and len(terms) >= 2)
+
+
+def price_term(yield_curve: YieldCurve, term: Term) -> int:
+    """
+    - Basis points for an order at term, on one day's curve
+    - The day's quote if there is one, otherwise read off the monotone cubic through the quotes
+    """
+    quoted_yields: Dict[Term, int] = dict(zip(yield_curve.terms, yield_curve.yields))
+    if term in quoted_yields:
+        return quoted_yields[term]
+    fits, row = fitted_curve(yield_curve)
+    return fits.yield_for_term(row, term)
+
+
+def rebuild_curve_fits(snapshot: DataSnapshot) -> None:
+    prepare_curve_fits.cache_clear()
+    prepare_curve_fits(snapshot.yield_history)
+
+
+register_snapshot_listener(rebuild_curve_fits)
+
+
+def fit_before_publish(yield_history: YieldHistory) -> None:
+    # workers attaching to a newly published version load these fits from CACHE_DIR instead of each fitting
+    prepare_curve_fits(yield_history)
+
+
+register_publish_listener(fit_before_publish)
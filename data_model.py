@@ -1,11 +1,18 @@
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Optional, List, Literal
+import hashlib
+from typing import Any, Dict, Optional, List, Literal
 
-from terms import MATURITY_TERMS
+import numpy as np
+
+from terms import MATURITY_TERMS, Term
 from utils import deci_string
 
 
+# $10 billion, keeps per-term sums of cents * basis points (db.ORDERS_SUMMARY_TABLE_SQL) far inside sqlite's int64
+MAX_ORDER_CENTS = 10**12
+
+
 @dataclass
 class Order:
     """Represents an item in the Previous Orders table"""
@@ -14,6 +21,7 @@ class Order:
     amount_cents: int
     yield_basis_points: Optional[int]
     timestamp: str  # ISO-8601 format, EST timezone
+    idempotency_key: Optional[str] = None  # set by API clients, see order_api.py
 
     def to_table_row(self) -> Dict[str, str]:
         return {
@@ -28,6 +36,31 @@ class Order:
         }
 
 
+@dataclass
+class TermExposure:
+    """One term's totals over every order, see db.read_orders_summary"""
+
+    term: str
+    orders: int
+    amount_cents: int
+    priced_cents: int  # amount_cents of the orders with a known yield
+    yield_cents: int  # sum of amount_cents * yield_basis_points over those orders
+
+    @property
+    def average_yield_basis_points(self) -> Optional[float]:
+        """Amount-weighted average yield of the orders with a known yield"""
+        return self.yield_cents / self.priced_cents if self.priced_cents else None
+
+    def to_table_row(self) -> Dict[str, str]:
+        average = self.average_yield_basis_points
+        return {
+            "term": self.term,
+            "orders": f"{self.orders:,}",
+            "amount_cents": f"${deci_string(self.amount_cents)}",
+            "average_yield": f"{average / 100:.2f}%" if average is not None else "N/A",
+        }
+
+
 @dataclass
 class YieldCurve:
     """
@@ -44,19 +77,177 @@ class HistoricalCurve:
     """
     - Yield timeseries, for one maturity term
     - Used for the graph on the right
+    - dates is a datetime64[D] array, yields is an integer array of basis points
     """
 
-    def __init__(self, dates: List[datetime], yields: List[int]):
+    def __init__(self, dates: np.ndarray, yields: np.ndarray):
         self.dates = dates
         self.yields = yields
 
-    def add_data_point(self, date_value: datetime, yield_value: int):
-        self.dates.append(date_value)
-        self.yields.append(yield_value)
-
     def to_dict(self):
-        return {"dates": self.dates, "yields": self.yields}
+        # the dcc.Store is serialized as JSON, so convert at the boundary
+        return {
+            "dates": np.datetime_as_string(self.dates, unit="D").tolist(),
+            "yields": self.yields.tolist(),
+        }
 
     @staticmethod
     def from_dict(d: dict):
-        return HistoricalCurve(dates=d["dates"], yields=d["yields"])
+        # older stores serialized datetimes as "YYYY-MM-DDTHH:MM:SS"
+        dates = np.array([date_[:10] for date_ in d["dates"]], dtype="datetime64[D]")
+        return HistoricalCurve(dates=dates, yields=np.asarray(d["yields"], dtype=np.int32))
+
+
+class YieldHistory:
+    """
+    - Yield timeseries for every maturity term, stored column-wise
+    - dates: sorted datetime64[D] axis, one entry per business day
+    - yields: (date x term) matrix of basis points, 0 wherever valid is False
+    - valid: False where a term has no value that day, e.g. "4 Mo" before 2022
+    - Both matrices are column-major, so each term's column is a contiguous, zero-copy view
+    - version can be passed when already known, e.g. attaching to a published store (shared_store.py)
+    """
+
+    YIELD_DTYPE = np.int16  # yields have never come near 327.67%
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        terms: List[Term],
+        yields: np.ndarray,
+        valid: np.ndarray,
+        version: Optional[str] = None,
+    ):
+        if yields.shape != (len(dates), len(terms)) or valid.shape != yields.shape:
+            raise ValueError(
+                f"Shape mismatch: {len(dates)} dates x {len(terms)} terms, "
+                f"yields {yields.shape}, valid {valid.shape}"
+            )
+        self.dates = dates
+        self.terms = list(terms)
+        self.yields = np.asfortranarray(yields, dtype=self.YIELD_DTYPE)
+        self.valid = np.asfortranarray(valid, dtype=bool)
+        self._term_indices: Dict[Term, int] = {
+            term: index for index, term in enumerate(self.terms)
+        }
+        self._version: Optional[str] = version
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        return self.dates.nbytes + self.yields.nbytes + self.valid.nbytes
+
+    @property
+    def version(self) -> str:
+        """Content hash, changes whenever any date, term or yield changes. Used for ETags and cache keys"""
+        if self._version is None:
+            digest = hashlib.sha1()
+            digest.update(",".join(self.terms).encode())
+            for array in (self.dates, self.yields, self.valid):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._version = digest.hexdigest()[:16]
+        return self._version
+
+    def term_index(self, term: Term) -> int:
+        try:
+            return self._term_indices[term]
+        except KeyError:
+            raise KeyError(f"Unknown maturity term: {term}") from None
+
+    def term_yields(self, term: Term) -> np.ndarray:
+        """View of one term's column of basis points, including invalid slots"""
+        return self.yields[:, self.term_index(term)]
+
+    def term_valid(self, term: Term) -> np.ndarray:
+        """View of one term's column of the validity mask"""
+        return self.valid[:, self.term_index(term)]
+
+    def yield_curve_at(self, row: int) -> YieldCurve:
+        """The yield curve of one date, made of the terms that had a value that day"""
+        valid = self.valid[row]
+        return YieldCurve(
+            date=self.dates[row].astype(object).strftime("%m/%d/%Y"),
+            terms=[term for term, is_valid in zip(self.terms, valid) if is_valid],
+            yields=self.yields[row][valid].tolist(),
+        )
+
+    def rows_for_dates(self, dates: Any) -> np.ndarray:
+        """
+        - Row of the nearest business day with data for each requested date, found by bisecting the date axis
+        - A weekend or holiday resolves to the closer of the days around it, the earlier one on a tie
+        - Dates outside the history resolve to its first or last day
+        """
+        if len(self) == 0:
+            raise ValueError("No yield history to look dates up in")
+        requested = np.asarray(dates, dtype="datetime64[D]")
+        if len(self) == 1:
+            return np.zeros(requested.shape, dtype=np.intp)
+        after = np.clip(np.searchsorted(self.dates, requested, "left"), 1, len(self) - 1)
+        before = after - 1
+        closer_to_after = (self.dates[after] - requested) < (requested - self.dates[before])
+        return np.where(closer_to_after, after, before)
+
+    def rows_between(self, start: Optional[Any] = None, end: Optional[Any] = None) -> slice:
+        """The rows dated from start to end, both inclusive and either open-ended if None, by bisecting the date axis"""
+        first = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, "D"), "left"))
+        stop = len(self) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, "D"), "right"))
+        return slice(first, max(first, stop))
+
+    def row_of_yield_curve(self, yield_curve: YieldCurve) -> Optional[int]:
+        """The row yield_curve was read from, found by bisecting the date axis, None if it isn't one of ours"""
+        try:
+            date = np.datetime64(datetime.strptime(yield_curve.date, "%m/%d/%Y").date(), "D")
+        except ValueError:
+            return None
+        row = int(np.searchsorted(self.dates, date, "left"))
+        if row == len(self) or self.dates[row] != date:
+            return None
+        # same date but other quotes, e.g. a YieldCurve kept in a browser from before a refresh
+        return row if self.yield_curve_at(row) == yield_curve else None
+
+    def yield_curves_on(self, dates: Any) -> List[YieldCurve]:
+        """The yield curve of the nearest business day to each date, see rows_for_dates"""
+        return [self.yield_curve_at(row) for row in self.rows_for_dates(dates)]
+
+    def historical_curve(self, term: Term) -> HistoricalCurve:
+        """The dates on which term has a value, and those values"""
+        valid = self.term_valid(term)
+        return HistoricalCurve(self.dates[valid], self.term_yields(term)[valid])
+
+    @staticmethod
+    def empty(terms: List[Term] = MATURITY_TERMS) -> "YieldHistory":
+        return YieldHistory(
+            dates=np.array([], dtype="datetime64[D]"),
+            terms=terms,
+            yields=np.zeros((0, len(terms)), dtype=YieldHistory.YIELD_DTYPE),
+            valid=np.zeros((0, len(terms)), dtype=bool),
+        )
+
+    @staticmethod
+    def from_yield_curve(yield_curve: YieldCurve, terms: List[Term] = MATURITY_TERMS) -> "YieldHistory":
+        """A one-date history holding yield_curve, for curves that aren't a row of the current history"""
+        quotes = dict(zip(yield_curve.terms, yield_curve.yields))
+        return YieldHistory(
+            dates=np.array([datetime.strptime(yield_curve.date, "%m/%d/%Y").date()], dtype="datetime64[D]"),
+            terms=terms,
+            yields=np.array([[quotes.get(term, 0) for term in terms]]),
+            valid=np.array([[term in quotes for term in terms]]),
+        )
+
+    @staticmethod
+    def concatenate(blocks: List["YieldHistory"]) -> "YieldHistory":
+        """Joins blocks that share a term axis and are already in ascending date order"""
+        if not blocks:
+            return YieldHistory.empty()
+        terms = blocks[0].terms
+        for block in blocks[1:]:
+            if block.terms != terms:
+                raise ValueError("Cannot concatenate blocks with different terms")
+        return YieldHistory(
+            dates=np.concatenate([block.dates for block in blocks]),
+            terms=terms,
+            yields=np.concatenate([block.yields for block in blocks]),
+            valid=np.concatenate([block.valid for block in blocks]),
+        )
@@ -1,36 +1,365 @@
 import dataclasses
+import logging
 import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
 
-from data_model import Order
-from typing import List, Tuple
+from data_model import Order, TermExposure
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
 DB_NAME = "treasury_rates.db"
 
+# bumped by each migration in migrate(), stored in the db file as PRAGMA user_version
+SCHEMA_VERSION = 4
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+ORDERS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term TEXT NOT NULL,
+    cents INTEGER NOT NULL,
+    yield_basis_points INTEGER,
+    created_at INTEGER NOT NULL,
+    idempotency_key TEXT
+)"""
+
+# Orders table column id -> sort key expression
+# NULL yields sort as -1 so keyset comparisons never see a NULL
+SORT_KEYS = {
+    "timestamp": "created_at",
+    "term": "term",
+    "amount_cents": "cents",
+    "yield_basis_points": "IFNULL(yield_basis_points, -1)",
+}
+ORDER_COLUMNS = "term, cents, yield_basis_points, created_at"
+
+# One covering index per sort key: (key, id) to seek, plus every selected column
+# so a page is read from the index alone
+INDEXES_SQL = [
+    f"CREATE INDEX IF NOT EXISTS orders_by_{name} ON orders ({expression}, id, {ORDER_COLUMNS})"
+    for name, expression in SORT_KEYS.items()
+]
+# retried API orders carry the same key, the index makes booking one twice impossible
+IDEMPOTENCY_INDEX_SQL = """CREATE UNIQUE INDEX IF NOT EXISTS orders_by_idempotency_key
+    ON orders (idempotency_key) WHERE idempotency_key IS NOT NULL"""
+
+# Per-term totals of the orders table, kept current by triggers in the same transaction as each write,
+# so exposure is read from one row per term instead of aggregating every order
+# yield_cents is the sum of cents * yield_basis_points over priced_cents, the orders with a known yield
+ORDERS_SUMMARY_TABLE_SQL = """CREATE TABLE IF NOT EXISTS orders_summary (
+    term TEXT PRIMARY KEY,
+    orders INTEGER NOT NULL,
+    cents INTEGER NOT NULL,
+    priced_cents INTEGER NOT NULL,
+    yield_cents INTEGER NOT NULL
+) WITHOUT ROWID"""
+
+
+def summary_delta_sql(row: str, sign: str) -> str:
+    """Adds (sign "+") or removes (sign "-") the orders row NEW or OLD to its term's summary"""
+    return f"""INSERT INTO orders_summary VALUES (
+        {row}.term, {sign}1, {sign}{row}.cents,
+        {sign}IIF({row}.yield_basis_points IS NULL, 0, {row}.cents),
+        {sign}{row}.cents * IFNULL({row}.yield_basis_points, 0)
+    ) ON CONFLICT (term) DO UPDATE SET
+        orders = orders + excluded.orders,
+        cents = cents + excluded.cents,
+        priced_cents = priced_cents + excluded.priced_cents,
+        yield_cents = yield_cents + excluded.yield_cents;"""
+
+
+# orders are only ever inserted, the delete and update triggers keep manual edits from skewing the summary
+ORDERS_SUMMARY_TRIGGERS_SQL = [
+    f"""CREATE TRIGGER IF NOT EXISTS orders_summary_insert AFTER INSERT ON orders BEGIN
+        {summary_delta_sql("NEW", "+")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS orders_summary_delete AFTER DELETE ON orders BEGIN
+        {summary_delta_sql("OLD", "-")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS orders_summary_update
+        AFTER UPDATE OF term, cents, yield_basis_points ON orders BEGIN
+        {summary_delta_sql("OLD", "-")}
+        {summary_delta_sql("NEW", "+")}
+    END""",
+]
+# the same totals aggregated from the orders table, to rebuild or verify the summary
+ORDERS_SUMMARY_SELECT_SQL = """SELECT term, COUNT(*), SUM(cents),
+    SUM(IIF(yield_basis_points IS NULL, 0, cents)), SUM(cents * IFNULL(yield_basis_points, 0))
+    FROM orders {where} GROUP BY term"""
+
+# SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds
+MAX_QUERY_PARAMETERS = 900
+
+
+TIMESTAMP_LENGTH = len("2025-05-16 10:00:00")
+
+
+def timestamp_to_epoch(timestamp: str) -> int:
+    # fromisoformat reads TIMESTAMP_FORMAT several times faster than strptime, which matters for bulk imports,
+    # but it also takes a date alone, fractions of a second and time zones, so the layout is checked first
+    if (
+        len(timestamp) != TIMESTAMP_LENGTH
+        or timestamp[10] not in " T"
+        or (timestamp[4], timestamp[7], timestamp[13], timestamp[16]) != ("-", "-", ":", ":")
+    ):
+        raise ValueError(f"timestamp {timestamp!r} is not formatted YYYY-MM-DD HH:MM:SS")
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+
+def epoch_to_timestamp(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch).strftime(TIMESTAMP_FORMAT)
+
+
+def order_from_db_row(term: str, cents: int, yield_basis_points: Optional[int], created_at: int) -> Order:
+    return Order(term, cents, yield_basis_points, epoch_to_timestamp(created_at))
+
+
+def order_to_db_row(order: Order) -> Tuple[str, int, Optional[int], int]:
+    return (
+        order.term,
+        order.amount_cents,
+        order.yield_basis_points,
+        timestamp_to_epoch(order.timestamp),
+    )
+
+
+# v1 rows that can't fill the NOT NULL columns of later versions, they are set aside in V1_INVALID_TABLE
+V1_ROW_IS_VALID_SQL = "term IS NOT NULL AND cents IS NOT NULL AND strftime('%s', timestamp, 'utc') IS NOT NULL"
+V1_INVALID_TABLE = "orders_v1_invalid"
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """
+    - Brings a db file of any older schema up to SCHEMA_VERSION, in one transaction: on any error,
+      nothing is changed and the error is raised
+    - Version 1: orders(term, cents, yield_basis_points, timestamp TEXT), no primary key
+    - Version 2: auto-increment id, epoch-integer created_at, covering indexes per sort key
+    - Version 3: idempotency_key, unique where set
+    - Version 4: orders_summary, maintained by triggers and built from the existing orders
+    """
+    if conn.execute("PRAGMA user_version").fetchall()[0][0] >= SCHEMA_VERSION:
+        return
+    # sqlite3 only begins a transaction implicitly before DML, without this every DDL statement would commit alone
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        migrate_in_transaction(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def migrate_in_transaction(conn: sqlite3.Connection) -> None:
+    # read again under the write lock, another process may have migrated while this one waited for it
+    # fetchall, so no statement stays open while the old table is dropped
+    if conn.execute("PRAGMA user_version").fetchall()[0][0] >= SCHEMA_VERSION:
+        return
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(orders)").fetchall()]
+    if columns and "id" not in columns:
+        conn.execute("ALTER TABLE orders RENAME TO orders_v1")
+        conn.execute(ORDERS_TABLE_SQL)
+        # timestamps were written in local time, the 'utc' modifier converts them before taking the epoch
+        conn.execute(
+            f"""INSERT INTO orders ({ORDER_COLUMNS})
+            SELECT term, cents, yield_basis_points, CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+            FROM orders_v1 WHERE {V1_ROW_IS_VALID_SQL} ORDER BY timestamp, rowid"""
+        )
+        invalid_sql = f"FROM orders_v1 WHERE NOT ({V1_ROW_IS_VALID_SQL})"
+        invalid = conn.execute(f"SELECT COUNT(*) {invalid_sql}").fetchall()[0][0]
+        if invalid:
+            # kept rather than dropped, so they can be fixed by hand and inserted again
+            conn.execute(f"CREATE TABLE {V1_INVALID_TABLE} AS SELECT * {invalid_sql}")
+            logger.warning(
+                f"{invalid} orders without a term, amount or readable timestamp moved to {V1_INVALID_TABLE}"
+            )
+        conn.execute("DROP TABLE orders_v1")
+    else:
+        conn.execute(ORDERS_TABLE_SQL)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(orders)").fetchall()]
+    if "idempotency_key" not in columns:
+        conn.execute("ALTER TABLE orders ADD COLUMN idempotency_key TEXT")
+    for index_sql in INDEXES_SQL:
+        conn.execute(index_sql)
+    conn.execute(IDEMPOTENCY_INDEX_SQL)
+    conn.execute(ORDERS_SUMMARY_TABLE_SQL)
+    for trigger_sql in ORDERS_SUMMARY_TRIGGERS_SQL:
+        conn.execute(trigger_sql)
+    rebuild_orders_summary(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
 
 def init_db() -> None:
     with sqlite3.connect(DB_NAME) as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """CREATE TABLE IF NOT EXISTS orders (
-                term TEXT,
-                cents INTEGER,
-                yield_basis_points INTEGER,
-                timestamp TEXT
-            )"""
-        )
+        # WAL lets page loads read while the order writer commits, and persists in the db file
+        conn.execute("PRAGMA journal_mode=WAL").fetchall()
+        migrate(conn)
 
 
 def read_orders() -> List[Order]:
     with sqlite3.connect(DB_NAME) as conn:
         cur = conn.cursor()
         res = cur.execute(
-            "SELECT term, cents, yield_basis_points, timestamp FROM orders ORDER BY timestamp DESC"
+            f"SELECT {ORDER_COLUMNS} FROM orders ORDER BY created_at DESC, id DESC"
         )
-        return [Order(*db_row) for db_row in res.fetchall()]
+        return [order_from_db_row(*db_row) for db_row in res.fetchall()]
+
+
+class OrdersPage(NamedTuple):
+    orders: List[Order]
+    # the sort key and id of the last row, pass it as `after` to get the next page
+    cursor: Optional[List[Any]]
+    has_more: bool
+
+
+def read_orders_page(
+    page_size: int,
+    sort_column: str = "timestamp",
+    descending: bool = True,
+    after: Optional[List[Any]] = None,
+    offset: int = 0,
+) -> OrdersPage:
+    """
+    - One page of orders, sorted by an orders table column id (see SORT_KEYS), ties broken by id
+    - Keyset pagination: with `after` (a previous page's cursor) this seeks straight to the page
+      through the covering index, so the cost does not grow with the table
+    - `offset` is only for jumping to a page without a cursor, which scans the skipped rows
+    """
+    sort_key = SORT_KEYS[sort_column]
+    direction = "DESC" if descending else "ASC"
+    comparison = "<" if descending else ">"
+    select = f"SELECT {ORDER_COLUMNS}, {sort_key}, id FROM orders"
+    order_by = f"ORDER BY {sort_key} {direction}, id {direction} LIMIT ?"
+    limit = page_size + 1  # one extra row tells whether there is a next page
+    with sqlite3.connect(DB_NAME) as conn:
+        if after is None:
+            rows = conn.execute(f"{select} {order_by} OFFSET ?", (limit, offset)).fetchall()
+        else:
+            # two seeks instead of one row-value comparison, which sqlite can only seek on
+            # by its first column: rest of the cursor's key (e.g. every "1 Yr" order), then past it
+            after_key, after_id = after
+            rows = conn.execute(
+                f"{select} WHERE {sort_key} = ? AND id {comparison} ? ORDER BY id {direction} LIMIT ?",
+                (after_key, after_id, limit),
+            ).fetchall()
+            if len(rows) < limit:
+                rows += conn.execute(
+                    f"{select} WHERE {sort_key} {comparison} ? {order_by}",
+                    (after_key, limit - len(rows)),
+                ).fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    cursor = list(rows[-1][-2:]) if rows else None
+    return OrdersPage([order_from_db_row(*row[:4]) for row in rows], cursor, has_more)
 
 
 def insert_order(conn: sqlite3.Connection, order: Order) -> None:
-    cur = conn.cursor()
-    insert_query = "INSERT INTO orders VALUES (?, ?, ?, ?)"
-    cur.execute(insert_query, dataclasses.astuple(order))
+    insert_orders(conn, [order])
     conn.commit()
+
+
+def connect_for_writes(db_name: str = DB_NAME) -> sqlite3.Connection:
+    """A long-lived connection for order_writer.OrderWriter, the only writer in its process"""
+    conn = sqlite3.connect(db_name)
+    conn.execute("PRAGMA journal_mode=WAL").fetchall()
+    # keep fsyncing on every commit, group commit is what makes that affordable
+    conn.execute("PRAGMA synchronous=FULL")
+    return conn
+
+
+def insert_orders(conn: sqlite3.Connection, orders: List[Order]) -> List[bool]:
+    """
+    - Inserts without committing, so the caller decides the transaction boundary
+    - Returns whether each order was inserted: False where its idempotency key was already booked
+    """
+    cur = conn.cursor()
+    if all(order.idempotency_key is None for order in orders):
+        insert_query = f"INSERT INTO orders ({ORDER_COLUMNS}) VALUES (?, ?, ?, ?)"
+        cur.executemany(insert_query, [order_to_db_row(order) for order in orders])
+        return [True] * len(orders)
+
+    # one statement per order, executemany can't tell which rows the conflict clause skipped
+    insert_query = f"""INSERT INTO orders ({ORDER_COLUMNS}, idempotency_key) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING"""
+    inserted = []
+    for order in orders:
+        cur.execute(insert_query, (*order_to_db_row(order), order.idempotency_key))
+        inserted.append(cur.rowcount == 1)
+    return inserted
+
+
+def read_orders_by_idempotency_key(keys: Sequence[str]) -> Dict[str, Order]:
+    """The booked order of each key that has one"""
+    orders: Dict[str, Order] = {}
+    unique_keys = list(dict.fromkeys(keys))
+    with sqlite3.connect(DB_NAME) as conn:
+        for start in range(0, len(unique_keys), MAX_QUERY_PARAMETERS):
+            chunk = unique_keys[start : start + MAX_QUERY_PARAMETERS]
+            rows = conn.execute(
+                f"SELECT {ORDER_COLUMNS}, idempotency_key FROM orders"
+                f" WHERE idempotency_key IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for *db_row, key in rows:
+                orders[key] = dataclasses.replace(order_from_db_row(*db_row), idempotency_key=key)
+    return orders
+
+
+def rebuild_orders_summary(conn: sqlite3.Connection) -> None:
+    """Recomputes orders_summary from every order, without committing"""
+    conn.execute("DELETE FROM orders_summary")
+    conn.execute(f"INSERT INTO orders_summary {ORDERS_SUMMARY_SELECT_SQL.format(where='')}")
+
+
+@contextmanager
+def bulk_insert_orders_summary(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    - For bulk inserts in a transaction the caller began with BEGIN IMMEDIATE
+    - Drops the per-row insert trigger for the duration, then adds every order inserted meanwhile to the summary
+      in one grouped pass, about twice as fast as the trigger for a large import
+    - DDL is transactional in sqlite, so other connections never see the trigger missing, and a rollback restores it
+    """
+    last_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM orders").fetchone()[0]
+    conn.execute("DROP TRIGGER orders_summary_insert")
+    yield
+    select_sql = ORDERS_SUMMARY_SELECT_SQL.format(where="WHERE id > ?")
+    conn.execute(
+        # WHERE true lets sqlite parse the upsert after a SELECT
+        f"""INSERT INTO orders_summary SELECT * FROM ({select_sql}) WHERE true
+        ON CONFLICT (term) DO UPDATE SET
+            orders = orders + excluded.orders,
+            cents = cents + excluded.cents,
+            priced_cents = priced_cents + excluded.priced_cents,
+            yield_cents = yield_cents + excluded.yield_cents""",
+        (last_id,),
+    )
+    conn.execute(ORDERS_SUMMARY_TRIGGERS_SQL[0])
+
+
+def exposure_from_db_row(term: str, orders: int, cents: int, priced_cents: int, yield_cents: int) -> TermExposure:
+    return TermExposure(term, orders, cents, priced_cents, yield_cents)
+
+
+def read_orders_summary() -> List[TermExposure]:
+    """Every term's exposure from orders_summary, one row per term however many orders there are"""
+    with sqlite3.connect(DB_NAME) as conn:
+        rows = conn.execute("SELECT * FROM orders_summary WHERE orders > 0").fetchall()
+    return [exposure_from_db_row(*row) for row in rows]
+
+
+def verify_orders_summary() -> List[str]:
+    """Where orders_summary disagrees with aggregating the orders table, as one message per term"""
+    with sqlite3.connect(DB_NAME) as conn:
+        # one read transaction, so a concurrent commit can't show up in only one of the two
+        conn.execute("BEGIN")
+        stored = {row[0]: row for row in conn.execute("SELECT * FROM orders_summary WHERE orders != 0")}
+        expected = {row[0]: row for row in conn.execute(ORDERS_SUMMARY_SELECT_SQL.format(where=""))}
+        conn.rollback()
+    return [
+        f"{term}: summary has {stored.get(term)}, orders add up to {expected.get(term)}"
+        for term in sorted(stored.keys() | expected.keys())
+        if stored.get(term) != expected.get(term)
+    ]
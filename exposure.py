@@ -0,0 +1,57 @@
+"""
+- Checks and repairs the per-term exposure summary, the orders_summary table in db.py
+- Triggers keep it current on every write, these are for after restoring a backup, editing the db by hand,
+  or to confirm nothing drifted
+- Usage:
+- - python exposure.py show
+- - python exposure.py verify (exits 1 if the summary disagrees with the orders)
+- - python exposure.py rebuild
+"""
+
+import argparse
+import sqlite3
+import sys
+
+import db
+from utils import deci_string
+
+
+def show() -> None:
+    for exposure in db.read_orders_summary():
+        average = exposure.average_yield_basis_points
+        print(
+            f"{exposure.term:>6}  {exposure.orders:>9} orders  ${deci_string(exposure.amount_cents):>18}"
+            f"  {'N/A' if average is None else f'{average / 100:.2f}%'}"
+        )
+
+
+def verify() -> int:
+    mismatches = db.verify_orders_summary()
+    for mismatch in mismatches:
+        print(mismatch)
+    print("Summary matches the orders" if not mismatches else f"{len(mismatches)} terms disagree")
+    return 1 if mismatches else 0
+
+
+def rebuild() -> None:
+    with sqlite3.connect(db.DB_NAME) as conn:
+        db.rebuild_orders_summary(conn)
+    print("Rebuilt the summary from the orders")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check and repair the per-term exposure summary")
+    parser.add_argument("command", choices=["show", "verify", "rebuild"])
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.command == "show":
+        show()
+    elif args.command == "verify":
+        sys.exit(verify())
+    else:
+        rebuild()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+- Figures that only change when the data does, serialized once per data version
+- Callbacks return a cached figure's plain-JSON dict, so serving one is a dictionary lookup
+  instead of building and validating a go.Figure
+- Each entry also keeps its JSON bytes, encoded by plotly's orjson engine when orjson is installed,
+  and a gzip of them for the /data/figures/ route
+- Entries are keyed by the data version they were built from, and dropped once a newer version is served.
+  The cache remembers the last few versions it has moved past and doesn't go back to one on a request,
+  e.g. one that read the version just before a refresh swapped it, only when a refresh publishes it again
+  (versions are content hashes, so a rollback publishes an old one)
+- A version's figures are also saved under CACHE_DIR, so a restart (or the docker image, see build_snapshot.py)
+  starts with them instead of building them again
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+import plotly.graph_objs as go
+from plotly.io.json import to_json_plotly
+
+from metrics import CACHE_REQUESTS, Gauge
+from prepare_graph_data import DataSnapshot, prepare_yield_history, register_snapshot_listener
+from yield_cache import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+GZIP_LEVEL = 6
+RETIRED_VERSIONS_KEPT = 8
+
+FIGURE_CACHE_ENTRIES = Gauge(
+    "treasury_figure_cache_entries", "Pre-serialized figures cached for the current data version"
+)
+
+
+class CachedFigure(NamedTuple):
+    figure: Dict[str, Any]  # plain lists and dicts, re-serializing it skips plotly's validation
+    json: bytes
+    gzipped: bytes
+
+    @staticmethod
+    def from_figure(figure: go.Figure) -> "CachedFigure":
+        return CachedFigure.from_json(to_json_plotly(figure).encode())
+
+    @staticmethod
+    def from_json(encoded: bytes) -> "CachedFigure":
+        return CachedFigure(
+            figure=json.loads(encoded),
+            json=encoded,
+            gzipped=gzip.compress(encoded, compresslevel=GZIP_LEVEL),
+        )
+
+
+FigureKey = Tuple[str, ...]
+
+
+class FigureCache:
+    """Figures by key for one data version at a time, safe to share between request threads"""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        # versions served before the current one, one per refresh
+        self._retired: Deque[str] = deque(maxlen=RETIRED_VERSIONS_KEPT)
+        self._figures: Dict[FigureKey, CachedFigure] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._figures)
+
+    def _move_to(self, version: str) -> bool:
+        """Makes version the cached one unless it was retired, returns whether it is the cached one. Needs _lock"""
+        if version == self._version:
+            return True
+        if version in self._retired:
+            return False
+        if self._version is not None:
+            self._retired.append(self._version)
+        self._version = version
+        self._figures = {}
+        return True
+
+    def publish(self, version: str) -> None:
+        """Makes version the cached one even if it was retired, for a refresh that swapped it in"""
+        with self._lock:
+            if version in self._retired:
+                self._retired.remove(version)
+            self._move_to(version)
+            FIGURE_CACHE_ENTRIES.set(len(self._figures))
+
+    def get(self, key: FigureKey, version: str, build: Callable[[], go.Figure]) -> CachedFigure:
+        """
+        - The figure cached under key for version, built and cached first if there isn't one
+        - A retired version's figure is built but not cached, and leaves the current version's figures alone
+        """
+        with self._lock:
+            current = self._move_to(version)
+            cached = self._figures.get(key) if current else None
+        CACHE_REQUESTS.inc(cache="figure", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+        # built outside the lock, two threads missing the same key at once both build it
+        cached = CachedFigure.from_figure(build())
+        with self._lock:
+            if version == self._version:
+                self._figures[key] = cached
+            FIGURE_CACHE_ENTRIES.set(len(self._figures))
+        return cached
+
+    def entries(self, version: str) -> Dict[FigureKey, CachedFigure]:
+        with self._lock:
+            return dict(self._figures) if version == self._version else {}
+
+    def preload(self, version: str, figures: Dict[FigureKey, CachedFigure]) -> None:
+        """Adds figures built earlier for version, e.g. loaded from disk"""
+        with self._lock:
+            if not self._move_to(version):
+                return
+            self._figures.update(figures)
+            FIGURE_CACHE_ENTRIES.set(len(self._figures))
+
+
+_figure_cache = FigureCache()
+
+
+def publish_snapshot(snapshot: DataSnapshot) -> None:
+    _figure_cache.publish(snapshot.version)
+
+
+register_snapshot_listener(publish_snapshot)
+
+
+def figures_path(version: str) -> str:
+    return str(CACHE_DIR / f"figures_{version}.jsonl")
+
+
+def save_figures(version: str) -> None:
+    """
+    - Writes version's cached figures to figures_path, one per line: the key as JSON, a tab, the figure's JSON
+    - Figures of other data versions are deleted, like the curve fits
+    """
+    entries = _figure_cache.entries(version)
+    if not entries:
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = figures_path(version)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for key, cached in entries.items():
+            # serialized JSON never contains a raw tab or newline, so neither needs escaping
+            f.write(json.dumps(list(key)).encode() + b"\t" + cached.json + b"\n")
+    os.replace(tmp_path, path)
+    for old_path in CACHE_DIR.glob("figures_*.jsonl"):
+        if str(old_path) != path:
+            old_path.unlink(missing_ok=True)
+
+
+def load_figures(version: str) -> int:
+    """Preloads version's saved figures into the cache, returns how many there were"""
+    figures: Dict[FigureKey, CachedFigure] = {}
+    try:
+        with open(figures_path(version), "rb") as f:
+            for line in f:
+                key, encoded = line.rstrip(b"\n").split(b"\t", 1)
+                figures[tuple(json.loads(key))] = CachedFigure.from_json(encoded)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable saved figures for {version}, they will be rebuilt: {e}")
+        return 0
+    _figure_cache.preload(version, figures)
+    return len(figures)
+
+
+def cached_figure(key: FigureKey, build: Callable[[], Any]) -> CachedFigure:
+    """build()'s figure for the current data version, build reads the data it needs itself"""
+    return _figure_cache.get(key, prepare_yield_history().version, build)
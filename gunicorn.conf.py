@@ -0,0 +1,37 @@
+"""
+- Production server settings: gunicorn -c gunicorn.conf.py wsgi:server
+- One worker process per core, each with a few threads for callbacks waiting on sqlite
+- The master publishes the shared yield store once before forking (on_starting),
+  so workers only memory-map it, see shared_store.py
+- Workers write their metrics to cache/metrics/, so /metrics adds up every worker whichever one answers
+"""
+
+import multiprocessing
+import os
+
+# read by config.py in the master and, after the fork, in every worker
+os.environ.setdefault("SHARED_YIELD_STORE", "1")
+os.environ.setdefault("SHARED_METRICS", "1")
+
+bind = os.environ.get("BIND", "0.0.0.0:8279")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("WORKER_THREADS", 4))
+timeout = 60
+
+
+def on_starting(server) -> None:
+    # the loader: runs once in the master, before any worker exists. It only reads data/ and cache/,
+    # the image's build_snapshot.py output, so workers start within a second. Downloads are left
+    # to the workers' background refresh, which takes the store lock so only one of them does it
+    import curve_fit  # noqa: F401, registers the curve fits to build before publishing
+    from db import init_db
+    from metrics import clear_worker_metrics
+    from shared_store import publish, store_lock
+    from yield_cache import load_yield_history
+
+    init_db()
+    clear_worker_metrics()
+    # data/ may differ from what an earlier run published
+    with store_lock():
+        publish(load_yield_history())
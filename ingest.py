@@ -0,0 +1,172 @@
+"""
+- Streaming ingestion of the treasury's year csvs into YieldHistory blocks
+- Lines are read lazily and parsed in chunks of CHUNK_ROWS, each chunk converted by numpy in one go
+  and written straight into arrays preallocated for the whole file
+- Each header (file schema) is mapped onto MATURITY_TERMS once, then reused for every file that shares it
+"""
+
+import csv
+import logging
+import re
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_model import YieldHistory
+from terms import MATURITY_TERMS, Term
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CHUNK_ROWS = 4096
+DATE_WIDTH = len("MM/DD/YYYY")
+
+# "1.5 Month", "2 Months", "30 Year" -> "1.5 Mo", "2 Mo", "30 Yr"
+UNIT_ALIASES = [(re.compile(r"\s*Months?$"), " Mo"), (re.compile(r"\s*Years?$"), " Yr")]
+
+
+def normalize_term(header: str) -> Optional[Term]:
+    """The MATURITY_TERMS entry a csv column header refers to, or None"""
+    name = header.strip()
+    for pattern, unit in UNIT_ALIASES:
+        name = pattern.sub(unit, name)
+    return name if name in MATURITY_TERMS else None
+
+
+class ColumnMapping(NamedTuple):
+    value_columns: int  # columns after Date
+    source: np.ndarray  # value column index of each known term
+    target: np.ndarray  # its MATURITY_TERMS index
+    unknown: Tuple[str, ...]
+
+
+@lru_cache(maxsize=64)
+def column_mapping(header: Tuple[str, ...]) -> ColumnMapping:
+    """Maps one csv schema's value columns onto MATURITY_TERMS, unknown columns are skipped"""
+    source, target, unknown = [], [], []
+    for column, name in enumerate(header[1:]):
+        term = normalize_term(name)
+        if term is None:
+            unknown.append(name)
+            continue
+        source.append(column)
+        target.append(MATURITY_TERMS.index(term))
+    if unknown:
+        # once per schema rather than once per file
+        logger.warning(f"Ignoring unknown maturity terms {unknown}")
+    return ColumnMapping(
+        value_columns=len(header) - 1,
+        source=np.array(source, dtype=np.intp),
+        target=np.array(target, dtype=np.intp),
+        unknown=tuple(unknown),
+    )
+
+
+def iter_csv_lines(path: Path) -> Iterator[str]:
+    """A csv's lines without line endings, read lazily"""
+    with open(path, newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def count_data_rows(path: Path) -> int:
+    """Lines after the header, counted in binary without decoding"""
+    rows = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            rows += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        rows += 1  # no trailing newline
+    return max(rows - 1, 0)
+
+
+def iter_chunks(lines: Iterable[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[List[str]]:
+    iterator = iter(lines)
+    while True:
+        chunk = [line for line in islice(iterator, chunk_rows) if line]
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_dates(lines: Sequence[str]) -> np.ndarray:
+    """datetime64[D] of the MM/DD/YYYY date leading each line, converted as ISO strings in one call"""
+    return np.array(
+        [f"{line[6:10]}-{line[0:2]}-{line[3:5]}" for line in lines], dtype="datetime64[D]"
+    )
+
+
+def parse_basis_points(lines: Sequence[str], value_columns: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    - (rows x value_columns) basis points, and where they were present, from the values after each line's date
+    - Every cell is parsed in one np.fromstring call, then rounded to whole basis points.
+      That is exact for the treasury's 2-decimal percentages, and "4.3" is 430, not 43
+    """
+    joined = ",".join([line[DATE_WIDTH + 1 :] for line in lines])
+    # empty cells become nan; twice, since the first pass can't see overlapping ",,,"
+    joined = joined.replace(",,", ",nan,").replace(",,", ",nan,")
+    if joined.startswith(","):
+        joined = "nan" + joined
+    if joined.endswith(","):
+        joined += "nan"
+    percents = np.fromstring(joined, sep=",")
+    if percents.size != len(lines) * value_columns:
+        raise ValueError(
+            f"Expected {value_columns} values on each of {len(lines)} rows, got {percents.size} in total"
+        )
+    percents = percents.reshape(len(lines), value_columns)
+    present = ~np.isnan(percents)
+    basis_points = np.rint(np.where(present, percents, 0) * 100).astype(YieldHistory.YIELD_DTYPE)
+    return basis_points, present
+
+
+def unquote_lines(lines: List[str]) -> List[str]:
+    """Rewrites quoted data lines as plain comma-separated values, the fast path can't read quotes"""
+    if not any('"' in line for line in lines):
+        return lines
+    return [",".join(row) for row in csv.reader(lines)]
+
+
+def ingest_lines(header: Sequence[str], lines: Iterable[str], row_count: int) -> YieldHistory:
+    """
+    - A YieldHistory block from a header and up to row_count data lines, newest first as the treasury writes them
+    - The block is in ascending date order, chunks fill the preallocated arrays from the end
+    """
+    mapping = column_mapping(tuple(header))
+    dates = np.empty(row_count, dtype="datetime64[D]")
+    yields = np.zeros((row_count, len(MATURITY_TERMS)), dtype=YieldHistory.YIELD_DTYPE, order="F")
+    valid = np.zeros(yields.shape, dtype=bool, order="F")
+
+    end = row_count
+    for chunk in iter_chunks(lines, CHUNK_ROWS):
+        chunk = unquote_lines(chunk)
+        start = end - len(chunk)
+        if start < 0:
+            raise ValueError(f"More than the {row_count} expected data rows")
+        basis_points, present = parse_basis_points(chunk, mapping.value_columns)
+        # reversed: the newest row of the chunk goes last
+        dates[start:end] = parse_dates(chunk)[::-1]
+        yields[start:end, mapping.target] = basis_points[::-1][:, mapping.source]
+        valid[start:end, mapping.target] = present[::-1][:, mapping.source]
+        end = start
+
+    # blank lines were skipped, so fewer rows than counted may have been filled
+    return YieldHistory(dates[end:], MATURITY_TERMS, yields[end:], valid[end:])
+
+
+def ingest_year_csv(path: Path) -> YieldHistory:
+    """One year csv as a YieldHistory block on the MATURITY_TERMS axis"""
+    lines = iter_csv_lines(path)
+    header_line = next(lines, "")
+    header = next(csv.reader([header_line]), [])
+    if not header:
+        return YieldHistory.empty()
+    try:
+        return ingest_lines(header, lines, count_data_rows(path))
+    except ValueError as e:
+        raise ValueError(f"Malformed yield csv {path}: {e}") from e
@@ -1,38 +1,141 @@
 from dash import Dash, dash_table, dcc
 from dash.html import Div, Button, Label, Br
 import plotly.graph_objs as go
+from plotly.io.json import to_json_plotly
 from datetime import datetime
-from typing import NamedTuple, Dict, List
+from typing import NamedTuple, Dict, List, Any, Optional, Sequence, Tuple
 import dataclasses
 
-from db import read_orders
+import numpy as np
+
+from config import (
+    CLIENTSIDE_SLIDER,
+    LAZY_HISTORICAL_CURVES,
+    ORDERS_PAGE_SIZE,
+    SERVER_SIDE_ORDERS_TABLE,
+)
+from db import read_orders, read_orders_page, read_orders_summary
 from data_model import Order, YieldCurve, HistoricalCurve
-from terms import MATURITY_TERMS, Term
+from terms import MATURITY_TERMS, Term, term_years
+from curve_fit import fitted_curve
+from utils import deci_string
+from valuation import order_book_summary
 from style import COMMON_STYLE, LABEL_STYLE, SMALL_LABEL_STYLE, BUTTON_STYLE
-from prepare_graph_data import prepare_current_yield_curve, prepare_historical_curves
+from lod import prepare_overview_series
+from figure_cache import cached_figure
+from metrics import Gauge
+from rollups import PERIODS, ROLLING_WINDOWS, Ohlc
+from spreads import WATCHED_SPREADS, SpreadAnalytics, prepare_spread_analytics
+from prepare_graph_data import (
+    prepare_current_yield_curve,
+    prepare_historical_curves,
+    prepare_yield_history,
+)
 
 
-def create_yield_curve_graph(yield_curve: YieldCurve) -> go.Figure:
-    percent_yields = [y / 100 for y in yield_curve.yields]
-    figure = go.Figure(data=[])
+SMOOTH_CURVE_SAMPLES_PER_TERM = 8
+# overlaid past curves, in the order they were picked; the current curve is always black
+OVERLAY_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#9467bd", "#8c564b", "#e377c2", "#17becf"]
+
+
+def smooth_yield_curve_points(
+    yield_curve: YieldCurve, axis_terms: List[Term]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    - The monotone cubic through the quoted yields, sampled between every pair of axis terms it spans
+    - Read off the curve's fit, see curve_fit.fitted_curve
+    - x is in positions on axis_terms (0 for the first term, 1 for the second...) so the terms stay evenly spaced
+    - y is in percent
+    """
+    first = axis_terms.index(yield_curve.terms[0])
+    last = axis_terms.index(yield_curve.terms[-1])
+    positions = np.linspace(first, last, (last - first) * SMOOTH_CURVE_SAMPLES_PER_TERM + 1)
+    axis_maturities = [term_years(term) for term in axis_terms]
+    maturities = np.interp(positions, np.arange(len(axis_maturities)), axis_maturities)
+    fits, row = fitted_curve(yield_curve)
+    smooth_yields = fits.pchip_yields(row, maturities)
+    return positions, smooth_yields / 100
+
+
+def add_yield_curve_traces(
+    figure: go.Figure, yield_curve: YieldCurve, axis_terms: List[Term], color: str
+) -> None:
+    """A smooth line through the curve plus markers at its quoted terms"""
+    if len(yield_curve.terms) >= 2:
+        positions, smooth_yields = smooth_yield_curve_points(yield_curve, axis_terms)
+        figure.add_trace(
+            go.Scatter(
+                x=positions,
+                y=smooth_yields,
+                mode="lines",
+                name=yield_curve.date,
+                legendgroup=yield_curve.date,
+                line=dict(color=color),
+                hoverinfo="skip",
+            )
+        )
     figure.add_trace(
         go.Scatter(
-            x=yield_curve.terms,
-            y=percent_yields,
-            mode="lines",
+            x=[axis_terms.index(term) for term in yield_curve.terms],
+            y=[y / 100 for y in yield_curve.yields],
+            mode="markers",
             name=yield_curve.date,
-            line=dict(color="black"),
+            legendgroup=yield_curve.date,
+            text=yield_curve.terms,
+            hovertemplate=f"{yield_curve.date} %{{text}}: %{{y}}<extra></extra>",
+            marker=dict(color=color, size=5),
+            showlegend=False,
         )
     )
+
+
+def create_yield_curve_graph(
+    yield_curve: YieldCurve, overlays: Sequence[YieldCurve] = ()
+) -> go.Figure:
+    """
+    - The current curve in black, and any past curves picked for comparison in color
+    - The x axis has every term quoted by any of the curves, e.g. 1990 curves have no "1 Mo"
+    """
+    shown_terms = {term for curve in (yield_curve, *overlays) for term in curve.terms}
+    axis_terms = [term for term in MATURITY_TERMS if term in shown_terms]
+    figure = go.Figure(data=[])
+    for index, overlay in enumerate(overlays):
+        add_yield_curve_traces(
+            figure, overlay, axis_terms, OVERLAY_COLORS[index % len(OVERLAY_COLORS)]
+        )
+    add_yield_curve_traces(figure, yield_curve, axis_terms, "black")
+    title = f"Treasury Yield Curve {yield_curve.date}"
+    if overlays:
+        title += f" vs {len(overlays)} past date{'s' if len(overlays) > 1 else ''}"
     figure.update_layout(
         xaxis_title="Maturity Term",
         yaxis_title="Yield",
-        title=f"Treasury Yield Curve {yield_curve.date}",
+        title=title,
+        xaxis={"tickvals": list(range(len(axis_terms))), "ticktext": axis_terms},
         yaxis={"ticksuffix": "%"},
+        showlegend=bool(overlays),
     )
     return figure
 
 
+def cached_yield_curve_figure(yield_curve: YieldCurve) -> Dict[str, Any]:
+    """The yield curve graph without overlays, built once per data version, see figure_cache.py"""
+    return cached_figure(
+        ("yield-curve", yield_curve.date), lambda: create_yield_curve_graph(yield_curve)
+    ).figure
+
+
+def historical_curve_layout(term: Term) -> Dict[str, Any]:
+    """Shared by the server-side figure and the clientside renderer in assets/historical_curve.js"""
+    return dict(
+        xaxis_title="Time",
+        yaxis_title="Yield",
+        title=f"Yield for maturity term of <span style='color:red; font-weight:bold'>{term}</span>, historically",
+        yaxis={"ticksuffix": "%"},
+        uirevision=term,  # keeps the user's zoom while finer data for the same term comes in
+    )
+
+
 def create_historical_curve_graph(
     term: Term, historical_curve: HistoricalCurve
 ) -> go.Figure:
@@ -40,33 +143,255 @@ def create_historical_curve_graph(
     figure.add_trace(
         go.Scatter(
             x=historical_curve.dates,
-            y=[yld / 100 for yld in historical_curve.yields],
+            y=historical_curve.yields / 100,
             mode="lines",
             name=term,
             line=dict(color="black"),
         )
     )
+    figure.update_layout(**historical_curve_layout(term))
+    return figure
+
+
+DAILY = "daily"
+MOVING_AVERAGE_OFF = "off"
+MovingAverage = Tuple[str, np.ndarray, np.ndarray]  # window label, dates, basis points
+
+
+def is_daily_view(resolution: str, moving_average: str) -> bool:
+    """The plain daily line, drawn by the slider callbacks; every other view is drawn from rollups.py"""
+    return resolution == DAILY and moving_average == MOVING_AVERAGE_OFF
+
+
+def add_moving_average_trace(figure: go.Figure, moving_average: MovingAverage) -> None:
+    label, dates, means = moving_average
+    figure.add_trace(
+        go.Scatter(
+            x=dates,
+            y=means / 100,
+            mode="lines",
+            name=f"{label} moving average",
+            line=dict(color="red", width=1.5),
+        )
+    )
+
+
+def create_historical_rollup_graph(
+    term: Term, period: str, ohlc: Ohlc, moving_average: Optional[MovingAverage] = None
+) -> go.Figure:
+    """One candle per week, month or year of the term's history"""
+    figure = go.Figure(data=[])
+    figure.add_trace(
+        go.Candlestick(
+            x=ohlc.periods,
+            open=ohlc.open / 100,
+            high=ohlc.high / 100,
+            low=ohlc.low / 100,
+            close=ohlc.close / 100,
+            name=f"{term} {period}",
+            increasing_line_color="black",
+            decreasing_line_color="red",
+        )
+    )
+    if moving_average is not None:
+        add_moving_average_trace(figure, moving_average)
+    figure.update_layout(**historical_curve_layout(term))
+    figure.update_layout(xaxis_rangeslider_visible=False, showlegend=False)
+    return figure
+
+
+def create_spread_graph(analytics: SpreadAnalytics, moving_average: str) -> go.Figure:
+    """
+    - The spread over its whole history, with every inversion filled in red
+    - With a window picked, its rolling mean and a band of two rolling standard deviations around it
+    """
+    spread = analytics.spread
+    percent = spread.basis_points / 100
+    figure = go.Figure(data=[])
+    figure.add_trace(
+        go.Scatter(x=spread.dates, y=percent, mode="lines", name="Spread", line=dict(color="black", width=1))
+    )
+    figure.add_trace(
+        go.Scatter(
+            x=spread.dates,
+            y=np.minimum(percent, 0),
+            mode="none",
+            fill="tozeroy",
+            fillcolor="rgba(214, 39, 40, 0.35)",
+            name="Inverted",
+        )
+    )
+    if moving_average != MOVING_AVERAGE_OFF:
+        means = analytics.rolling_means[moving_average] / 100
+        band = 2 * analytics.rolling_stds[moving_average] / 100
+        figure.add_trace(
+            go.Scatter(x=spread.dates, y=means + band, mode="lines", line=dict(width=0), showlegend=False)
+        )
+        figure.add_trace(
+            go.Scatter(
+                x=spread.dates,
+                y=means - band,
+                mode="lines",
+                line=dict(width=0),
+                fill="tonexty",
+                fillcolor="rgba(31, 119, 180, 0.15)",
+                name=f"{moving_average} ±2σ",
+            )
+        )
+        add_moving_average_trace(figure, (moving_average, spread.dates, analytics.rolling_means[moving_average]))
+    inversions = analytics.inversions
     figure.update_layout(
         xaxis_title="Time",
-        yaxis_title="Yield",
-        title=f"Yield for maturity term of <span style='color:red; font-weight:bold'>{term}</span>, historically",
-        yaxis={"ticksuffix": "%"},
+        yaxis_title="Spread",
+        yaxis={"ticksuffix": "%", "zeroline": True, "zerolinecolor": "gray"},
+        title=(
+            f"{spread.long_term} − {spread.short_term} spread, {len(inversions)} inversions"
+            + (", inverted now" if inversions.ongoing else "")
+        ),
+        uirevision=f"{spread.long_term}-{spread.short_term}",
     )
     return figure
 
 
+def cached_spread_figure(long_term: Term, short_term: Term, moving_average: str) -> Dict[str, Any]:
+    return cached_figure(
+        ("spread", long_term, short_term, moving_average),
+        lambda: create_spread_graph(prepare_spread_analytics(long_term, short_term), moving_average),
+    ).figure
+
+
+def create_spreads_section() -> Div:
+    """
+    - The spread between any two terms, see spreads.py
+    - Starts empty, callbacks.update_spread_graph fills it right after the page loads
+    """
+    long_term, short_term = WATCHED_SPREADS[0]
+    radio_style = {"display": "inline-block", "marginRight": "12px"}
+    dropdown_style = {"width": "110px", "display": "inline-block", "verticalAlign": "middle"}
+    return Div(
+        [
+            Div(
+                [
+                    Label("Spread:", style=SMALL_LABEL_STYLE),
+                    dcc.Dropdown(
+                        MATURITY_TERMS, long_term, id="spread-long-term", clearable=False, style=dropdown_style
+                    ),
+                    Label(" minus ", style=SMALL_LABEL_STYLE),
+                    dcc.Dropdown(
+                        MATURITY_TERMS, short_term, id="spread-short-term", clearable=False, style=dropdown_style
+                    ),
+                    Label("Rolling window:", style={**SMALL_LABEL_STYLE, "marginLeft": "24px"}),
+                    dcc.RadioItems(
+                        [{"label": "Off", "value": MOVING_AVERAGE_OFF}]
+                        + [{"label": label, "value": label} for label in ROLLING_WINDOWS],
+                        MOVING_AVERAGE_OFF,
+                        id="spread-moving-average",
+                        labelStyle=radio_style,
+                        style={"display": "inline-block"},
+                    ),
+                ],
+                style={"fontSize": "12px"},
+            ),
+            dcc.Graph(id="spread-graph"),
+        ],
+        style={"padding": "10px", "fontFamily": "Verdana"},
+    )
+
+
+def create_historical_view_controls() -> Div:
+    """Resolution and moving average of the historical graph, under its slider"""
+    radio_style = {"display": "inline-block", "marginRight": "12px"}
+    return Div(
+        [
+            Label("Resolution:", style=SMALL_LABEL_STYLE),
+            dcc.RadioItems(
+                [{"label": resolution.capitalize(), "value": resolution} for resolution in [DAILY, *PERIODS]],
+                DAILY,
+                id="historical-resolution",
+                labelStyle=radio_style,
+            ),
+            Label("Moving average:", style=SMALL_LABEL_STYLE),
+            dcc.RadioItems(
+                [{"label": "Off", "value": MOVING_AVERAGE_OFF}]
+                + [{"label": label, "value": label} for label in ROLLING_WINDOWS],
+                MOVING_AVERAGE_OFF,
+                id="historical-moving-average",
+                labelStyle=radio_style,
+            ),
+        ],
+        style={"marginTop": "10px", "fontSize": "12px"},
+    )
+
+
+MAX_COMPARE_DATES = len(OVERLAY_COLORS)
+
+
+def create_compare_dates_section() -> Div:
+    """
+    - A date picker that adds past dates' curves to the graph on the left, and the list of added dates
+    - Picked dates snap to the nearest business day with data, see YieldHistory.rows_for_dates
+    """
+    dates = prepare_yield_history().dates
+    first, last = (str(dates[0]), str(dates[-1])) if len(dates) else (None, None)
+    return Div(
+        [
+            Label("Compare with:", style=SMALL_LABEL_STYLE),
+            Div(
+                [
+                    dcc.DatePickerSingle(
+                        id="compare-date-picker",
+                        min_date_allowed=first,
+                        max_date_allowed=last,
+                        initial_visible_month=last,
+                        placeholder="Add a date",
+                        clearable=True,
+                    ),
+                    dcc.Dropdown(
+                        id="compare-dates",
+                        options=[],
+                        value=[],
+                        multi=True,
+                        placeholder=f"Up to {MAX_COMPARE_DATES} past dates",
+                        style={"flex": "1", "marginLeft": "10px", "fontFamily": "Verdana"},
+                    ),
+                ],
+                style={"display": "flex", "flexDirection": "row", "alignItems": "center"},
+            ),
+        ],
+        style={"fontFamily": "Verdana"},
+    )
+
+
+def add_compare_date(picked_date: str, compare_dates: List[str]) -> List[str]:
+    """compare_dates with picked_date's nearest business day added last, keeping at most MAX_COMPARE_DATES"""
+    yield_history = prepare_yield_history()
+    row = int(yield_history.rows_for_dates([picked_date[:10]])[0])
+    resolved = str(yield_history.dates[row])
+    compare_dates = [date_ for date_ in compare_dates if date_ != resolved] + [resolved]
+    return compare_dates[-MAX_COMPARE_DATES:]
+
+
+def create_compare_yield_curve_graph(yield_curve: YieldCurve, compare_dates: List[str]) -> go.Figure:
+    """The current curve against the curves of compare_dates, looked up in one bisect of the date axis"""
+    overlays = prepare_yield_history().yield_curves_on(compare_dates) if compare_dates else []
+    return create_yield_curve_graph(yield_curve, overlays)
+
+
 def create_graphs_section(yield_curve: YieldCurve) -> Div:
     """
     - This section is the whole top part of the screen
-    - Its structure looks like [graph1, [graph2, slider]]
+    - Its structure looks like [[graph1, compare dates], [graph2, slider, resolution]]
     """
     return Div(
         [
             Div(
-                dcc.Graph(
-                    id="graph",
-                    figure=create_yield_curve_graph(yield_curve),
-                ),
+                [
+                    dcc.Graph(
+                        id="graph",
+                        figure=cached_yield_curve_figure(yield_curve),
+                    ),
+                    create_compare_dates_section(),
+                ],
                 style={"width": "50%", "padding": "10px"},
             ),
             Div(
@@ -83,6 +408,7 @@ def create_graphs_section(yield_curve: YieldCurve) -> Div:
                         updatemode="drag",
                         className="red-slider",
                     ),
+                    create_historical_view_controls(),
                 ],
                 style={
                     "width": "50%",
@@ -157,55 +483,248 @@ def create_place_order_section(terms: List[Term]) -> Div:
     )
 
 
-def create_orders_table_section() -> dash_table.DataTable:
-    return dash_table.DataTable(
-        id="table",
-        columns=[
-            {"name": "Term", "id": "term"},
-            {"name": "Amount", "id": "amount_cents"},
-            {"name": "Yield", "id": "yield_basis_points"},
-            {"name": "Order time", "id": "timestamp"},
-        ],
-        data=[order.to_table_row() for order in read_orders()],
-        style_table={"maxWidth": "60vw", "overflowX": "auto"},
-        style_cell={
-            "textAlign": "left",
-            "fontFamily": "Verdana",
-            "fontSize": 16,
-            "width": "25%",
-            "minWidth": "25%",
-            "maxWidth": "25%",
-        },
-        editable=False,
-        row_deletable=False,
+def read_orders_table_page(
+    page_current: int,
+    page_size: int,
+    sort_by: Optional[List[Dict[str, str]]],
+    cursors: Optional[Dict[str, Any]],
+) -> Tuple[List[Dict[str, str]], int, Dict[str, Any]]:
+    """
+    - Rows and page_count for a server-side paged DataTable, see SERVER_SIDE_ORDERS_TABLE
+    - cursors remembers the keyset cursor at the end of each visited page, for the current sort,
+      so moving to the next or previous page is an index seek instead of an OFFSET scan
+    - Returns the rows, the page_count, and the updated cursors
+    """
+    sort_column, direction = "timestamp", "desc"
+    if sort_by:
+        sort_column, direction = sort_by[0]["column_id"], sort_by[0]["direction"]
+    sort = [sort_column, direction]
+    if not cursors or cursors.get("sort") != sort:
+        cursors = {"sort": sort, "pages": {}}
+
+    after = cursors["pages"].get(str(page_current - 1)) if page_current > 0 else None
+    page = read_orders_page(
+        page_size,
+        sort_column,
+        descending=direction == "desc",
+        after=after,
+        offset=page_current * page_size,
     )
+    if page.cursor is not None:
+        cursors["pages"][str(page_current)] = page.cursor
+    # the total is never counted: there is one more page as long as this one was full
+    page_count = page_current + 2 if page.has_more else page_current + 1
+    return [order.to_table_row() for order in page.orders], page_count, cursors
 
 
-def create_app_layout() -> Div:
-    yield_curve = prepare_current_yield_curve()
-    historical_curves = prepare_historical_curves()
+ORDERS_TABLE_COLUMNS = [
+    {"name": "Term", "id": "term"},
+    {"name": "Amount", "id": "amount_cents"},
+    {"name": "Yield", "id": "yield_basis_points"},
+    {"name": "Order time", "id": "timestamp"},
+]
+
+ORDERS_TABLE_STYLE = dict(
+    style_table={"maxWidth": "60vw", "overflowX": "auto"},
+    style_cell={
+        "textAlign": "left",
+        "fontFamily": "Verdana",
+        "fontSize": 16,
+        "width": "25%",
+        "minWidth": "25%",
+        "maxWidth": "25%",
+    },
+    editable=False,
+    row_deletable=False,
+)
 
+
+def create_orders_table_section() -> Div:
+    if not SERVER_SIDE_ORDERS_TABLE:
+        return Div(
+            dash_table.DataTable(
+                id="table",
+                columns=ORDERS_TABLE_COLUMNS,
+                data=[order.to_table_row() for order in read_orders()],
+                **ORDERS_TABLE_STYLE,
+            )
+        )
+
+    # the first page is rendered with the layout, later pages come from callbacks.update_orders_table
+    rows, page_count, cursors = read_orders_table_page(0, ORDERS_PAGE_SIZE, [], None)
     return Div(
         [
-            dcc.Store(
-                id="yield-curve",
-                data=dataclasses.asdict(yield_curve),
+            dcc.Store(id="orders-page-cursors", data=cursors),
+            dash_table.DataTable(
+                id="table",
+                columns=ORDERS_TABLE_COLUMNS,
+                data=rows,
+                page_action="custom",
+                page_current=0,
+                page_size=ORDERS_PAGE_SIZE,
+                page_count=page_count,
+                sort_action="custom",
+                sort_mode="single",
+                sort_by=[],
+                **ORDERS_TABLE_STYLE,
             ),
+        ]
+    )
+
+
+def format_orders_valuation(summary: Dict[str, int]) -> str:
+    return (
+        f"Principal: ${deci_string(summary['principal_cents'])} | "
+        f"Value today: ${deci_string(summary['value_cents'])} | "
+        f"Total payoff at maturity: ${deci_string(summary['payoff_cents'])}"
+    )
+
+
+def create_orders_valuation_section() -> Div:
+    """Projected value of every order, see valuation.py"""
+    return Div(
+        format_orders_valuation(order_book_summary()),
+        id="orders-valuation",
+        style={**SMALL_LABEL_STYLE, "fontWeight": "normal", "marginBottom": "8px"},
+    )
+
+
+EXPOSURE_TABLE_COLUMNS = [
+    {"name": "Term", "id": "term"},
+    {"name": "Orders", "id": "orders"},
+    {"name": "Exposure", "id": "amount_cents"},
+    {"name": "Avg yield", "id": "average_yield"},
+]
+
+
+def read_exposure_table_rows() -> List[Dict[str, str]]:
+    """One row per term held, in maturity order, read from the orders_summary table"""
+    exposures = sorted(read_orders_summary(), key=lambda exposure: term_years(exposure.term))
+    return [exposure.to_table_row() for exposure in exposures]
+
+
+def create_exposure_section() -> Div:
+    """How much is held per term and at what average yield, see db.ORDERS_SUMMARY_TABLE_SQL"""
+    return Div(
+        dash_table.DataTable(
+            id="exposure-table",
+            columns=EXPOSURE_TABLE_COLUMNS,
+            data=read_exposure_table_rows(),
+            style_cell={"textAlign": "left", "fontFamily": "Verdana", "fontSize": 14},
+            editable=False,
+            row_deletable=False,
+        ),
+        style={"minWidth": "320px"},
+    )
+
+
+def create_historical_overview() -> Dict[str, Any]:
+    """Everything assets/historical_curve.js needs to draw any term without a server round-trip"""
+    return {
+        "terms": MATURITY_TERMS,
+        "series": prepare_overview_series(prepare_yield_history()),
+        "layouts": {
+            # go.Layout expands "xaxis_title" style keys into what plotly.js expects
+            term: go.Layout(**historical_curve_layout(term)).to_plotly_json()
+            for term in MATURITY_TERMS
+        },
+        "template": go.Figure().layout.template.to_plotly_json(),
+    }
+
+
+def cached_historical_overview() -> Dict[str, Any]:
+    # only changes with the data, and building the per-term layouts is most of a page load's plotly work
+    return cached_figure(("historical-overview",), create_historical_overview).figure
+
+
+def create_historical_overview_store() -> dcc.Store:
+    return dcc.Store(id="historical-overview", data=cached_historical_overview())
+
+
+DASH_STORE_BYTES = Gauge(
+    "treasury_dash_store_bytes", "Serialized size of each dcc.Store in the page layout", ["store"]
+)
+_store_sizes_version: Optional[str] = None
+
+
+def record_store_sizes(stores: List[dcc.Store], version: str) -> None:
+    """The stores only change with the data, so they are measured once per data version"""
+    global _store_sizes_version
+    if version == _store_sizes_version:
+        return
+    _store_sizes_version = version
+    for store in stores:
+        DASH_STORE_BYTES.set(len(to_json_plotly(store.data)), store=store.id)
+
+
+def create_validation_layout() -> Div:
+    """
+    - Every component a callback refers to, without any data, for Dash's callback validation
+    - Set as app.validation_layout, otherwise Dash calls create_app_layout when app.layout is assigned,
+      loading the data before the server can bind, and embeds that whole first layout in every index page
+    """
+    return Div(
+        [
+            dcc.Store(id="yield-curve"),
+            dcc.Store(id="historical-overview"),
+            dcc.Store(id="historical-curves"),
+            dcc.Store(id="orders-page-cursors"),
+            dcc.Graph(id="graph"),
+            dcc.DatePickerSingle(id="compare-date-picker"),
+            dcc.Dropdown(id="compare-dates", multi=True),
+            dcc.Graph(id="historical-curve-graph"),
+            dcc.Slider(min=0, max=len(MATURITY_TERMS) - 1, id="historical-curve-slider"),
+            create_historical_view_controls(),
+            create_place_order_section(MATURITY_TERMS),
+            Div(id="orders-valuation"),
+            dash_table.DataTable(id="table"),
+            dash_table.DataTable(id="exposure-table"),
+            create_spreads_section(),
+        ]
+    )
+
+
+def create_app_layout() -> Div:
+    yield_curve = prepare_current_yield_curve()
+
+    stores = [
+        dcc.Store(
+            id="yield-curve",
+            data=dataclasses.asdict(yield_curve),
+        ),
+    ]
+    if CLIENTSIDE_SLIDER:
+        stores.append(create_historical_overview_store())
+    elif not LAZY_HISTORICAL_CURVES:
+        # eager mode: every term's history is embedded in the page and posted back on each slider move
+        stores.append(
             dcc.Store(
                 id="historical-curves",
                 data={
                     term: historical_curve.to_dict()
-                    for term, historical_curve in historical_curves.items()
+                    for term, historical_curve in prepare_historical_curves().items()
                 },
-            ),
+            )
+        )
+
+    record_store_sizes(stores, prepare_yield_history().version)
+
+    return Div(
+        [
+            *stores,
             create_graphs_section(yield_curve),  # both graphs and the slider
+            create_spreads_section(),
             Br(),
             Label("Create order:", style=LABEL_STYLE),
             create_place_order_section(
-                yield_curve.terms
+                MATURITY_TERMS
             ),  # term dropdown, dollar amount input, button
             Br(),
             Label("Previous orders:", style=LABEL_STYLE),
-            create_orders_table_section(),
+            create_orders_valuation_section(),
+            Div(
+                [create_orders_table_section(), create_exposure_section()],
+                style={"display": "flex", "gap": "24px", "alignItems": "flex-start"},
+            ),
         ]
     )
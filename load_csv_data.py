@@ -1,16 +1,34 @@
 import csv
-from typing import List
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
 from pathlib import Path
 import os
 import logging
+import threading
+import time
+
+from metrics import Counter, Histogram, SIZE_BUCKETS
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
 DATA_DIR = Path("./data")
+FIRST_YEAR = 1990  # the first year the treasury publishes par yield curve rates for
+# ETag/Last-Modified validators and the newest date of each year's csv
+# it lives outside data/ because everything in data/ is expected to be a year csv
+SYNC_STATE_PATH = Path("./cache") / "sync_state.json"
+HTTP_POOL_SIZE = 8  # also the most download threads worth running at once
+HTTP_RETRIES = Retry(
+    total=4,
+    backoff_factor=0.5,  # 0.5s, 1s, 2s, 4s between attempts
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET",),
+)
 BASE_URL = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates/daily-treasury-rates.csv"
 
 
@@ -22,6 +40,27 @@ def get_csv_download_url(year: int):
     return f"{BASE_URL}/{year}/all?field_tdr_date_value={year}&type=daily_treasury_yield_curve&page&_format=csv"
 
 
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_sync_state_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """One pooled, retrying session per process, shared by every download thread"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=HTTP_RETRIES,
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
 def get_most_recent_weekday() -> datetime:
     today = datetime.today()
     if today.weekday() == 5:  # Saturday
@@ -31,25 +70,75 @@ def get_most_recent_weekday() -> datetime:
     return today
 
 
+class CsvDownload(NamedTuple):
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+CSV_DOWNLOAD_SECONDS = Histogram(
+    "treasury_csv_download_seconds",
+    "Conditional GETs of year csvs, by outcome: modified, not_modified or error",
+    ["result"],
+)
+CSV_DOWNLOAD_BYTES = Histogram(
+    "treasury_csv_download_bytes",
+    "Sizes of year csvs downloaded in full",
+    buckets=SIZE_BUCKETS,
+)
+CSV_ROWS_ADDED = Counter("treasury_csv_rows_added_total", "Business-day rows merged into year csvs")
+
+
+def fetch_csv(year: int, validators: Optional[Dict[str, Any]] = None) -> Optional[CsvDownload]:
+    """
+    - Conditional GET of a year's csv, using the ETag/Last-Modified saved from the previous download
+    - Returns None if the server says nothing changed (304), raises on errors
+    """
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    start = time.perf_counter()
+    result = "error"
+    try:
+        download = get_session().get(get_csv_download_url(year), headers=headers)
+        if download.status_code == 304:
+            result = "not_modified"
+            return None
+        download.raise_for_status()
+        result = "modified"
+        CSV_DOWNLOAD_BYTES.observe(len(download.content))
+        return CsvDownload(
+            text=download.content.decode("utf-8"),
+            etag=download.headers.get("ETag"),
+            last_modified=download.headers.get("Last-Modified"),
+        )
+    finally:
+        CSV_DOWNLOAD_SECONDS.observe(time.perf_counter() - start, result=result)
+
+
 def download_csv(year: int) -> str:
     ensure_data_dir()
     try:
-        with requests.Session() as s:
-            download = s.get(get_csv_download_url(year))
-            download.raise_for_status()
-            file_text: str = download.content.decode("utf-8")
-            return file_text
+        download = fetch_csv(year)
+        return download.text if download is not None else ""
     except Exception as e:
         logger.error(f"ERROR, failed to download data for {year}: {e}")
         return ""
 
 
 def write_year_csv(csv_file_text: str, year: int):
+    """Writes to a temp file first, so readers never see a half-written csv"""
+    csv_path = DATA_DIR / f"{year}.csv"
+    tmp_path = csv_path.with_suffix(".csv.tmp")
     try:
-        with open(DATA_DIR / f"{year}.csv", "w") as f:
+        with open(tmp_path, "w") as f:
             f.write(csv_file_text)
+        os.replace(tmp_path, csv_path)
     except Exception as e:
-        logger.error("Error:", e)
+        logger.error(f"Error writing {csv_path}: {e}")
 
 
 def read_downloaded_csv(year: int) -> List[List[str]]:
@@ -62,40 +151,130 @@ def get_most_recent_year_with_csv_downloaded() -> int:
     return max(int(filename.removesuffix(".csv")) for filename in os.listdir(DATA_DIR))
 
 
+def read_sync_state() -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(SYNC_STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_sync_state(state: Dict[str, Dict[str, Any]]) -> None:
+    SYNC_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SYNC_STATE_PATH.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, SYNC_STATE_PATH)
+
+
+def read_csv_head(year: int) -> List[List[str]]:
+    """The header and the newest row of a year's csv, without reading the rest of the file"""
+    rows: List[List[str]] = []
+    with open(DATA_DIR / f"{year}.csv", "r") as file:
+        for row in csv.reader(file):
+            rows.append(row)
+            if len(rows) == 2:
+                break
+    return rows
+
+
+def read_newest_csv_date(year: int) -> Optional[str]:
+    """
+    - The newest date in a year's csv, formatted "MM/DD/YYYY"
+    - Served from the sync state while the csv's mtime/size are unchanged, else read from its second line
+    """
+    csv_path = DATA_DIR / f"{year}.csv"
+    entry = read_sync_state().get(str(year), {})
+    stat = csv_path.stat()
+    if entry.get("csv_mtime_ns") == stat.st_mtime_ns and entry.get("csv_size") == stat.st_size:
+        return entry.get("last_date")
+    head = read_csv_head(year)
+    return head[1][0] if len(head) > 1 else None
+
+
 def is_csv_row_present_for_day(day: datetime, current_business_year: int) -> bool:
-    newest_csv: List[List[str]] = read_downloaded_csv(current_business_year)
-    newest_date_in_csv: str = newest_csv[1][0]
-    return newest_date_in_csv == day.strftime("%m/%d/%Y")
+    return read_newest_csv_date(current_business_year) == day.strftime("%m/%d/%Y")
 
 
-def csv_downloaded_for_year(year: int) -> bool:
-    return f"{year}.csv" in os.listdir(DATA_DIR)
+def parse_csv_date(date_: str) -> datetime:
+    return datetime.strptime(date_, "%m/%d/%Y")
 
 
-def refresh_data() -> int:
+def merge_new_rows(year: int, csv_file_text: str) -> int:
     """
-    - Checks current date versus the latest data downloaded
-    - Downloads newest data if needed
-    - Then returns the latest year for which data is downloaded
+    - Adds the rows of a downloaded csv that are newer than the newest stored row
+    - Rows are newest first, so new rows go right after the header
+    - The whole file is replaced only when there is no file yet or the columns changed
+    - Returns the number of rows added
+    """
+    lines = csv_file_text.splitlines()
+    if not lines:
+        return 0
+    csv_path = DATA_DIR / f"{year}.csv"
+    existing_head = read_csv_head(year) if csv_path.exists() else []
+    downloaded_header = next(csv.reader(lines[:1]))
+    if len(existing_head) < 2 or existing_head[0] != downloaded_header:
+        write_year_csv(csv_file_text, year)
+        return len(lines) - 1
+
+    newest_stored = parse_csv_date(existing_head[1][0])
+    new_lines = [
+        line
+        for line in lines[1:]
+        if line and parse_csv_date(line.split(",", 1)[0]) > newest_stored
+    ]
+    if not new_lines:
+        return 0
+
+    tmp_path = csv_path.with_suffix(".csv.tmp")
+    with open(csv_path, "r") as old_file, open(tmp_path, "w") as new_file:
+        new_file.write(old_file.readline())  # header
+        new_file.write("\n".join(new_lines) + "\n")
+        for line in old_file:
+            new_file.write(line)
+    os.replace(tmp_path, csv_path)
+    return len(new_lines)
+
+
+def sync_year_csv(year: int) -> int:
     """
-    current_year = datetime.now().year
-    if csv_downloaded_for_year(current_year):
-        current_business_year = current_year
-    else:
-        try:
-            file_text: str = download_csv(current_year)
-            if file_text:
-                write_year_csv(file_text, current_year)
-                logger.info(f"Downloaded csv for{datetime.now().year}")
-        except Exception as e:
-            logger.error("Error:", e)
-        current_business_year = get_most_recent_year_with_csv_downloaded()
-        # current_business_year is usually the current year
-        # but could be the previous year e.g. if right now it's Saturday Jan 1
-        # TODO handle case where the app sits for a full year unused, leaving a data gap
-        # would prefer to not download more often than needed because it's slow
-    if not is_csv_row_present_for_day(get_most_recent_weekday(), current_business_year):
-        new_csv: str = download_csv(current_business_year)
-        with open(DATA_DIR / f"{current_business_year}.csv", "w") as f:
-            f.write(new_csv)
-    return current_business_year
+    - Incremental refresh of one year's csv
+    - Conditional GET, then only rows newer than what is stored get written
+    - Returns the number of rows added
+    """
+    ensure_data_dir()
+    entry = read_sync_state().get(str(year), {})
+    try:
+        download = fetch_csv(year, entry)
+    except Exception as e:
+        logger.error(f"ERROR, failed to download data for {year}: {e}")
+        return 0
+    if download is None:
+        logger.info(f"Data for {year} not modified")
+        return 0
+
+    added = merge_new_rows(year, download.text)
+    CSV_ROWS_ADDED.inc(added)
+    logger.info(f"Added {added} new rows to {year}.csv")
+    csv_path = DATA_DIR / f"{year}.csv"
+    if not csv_path.exists():
+        # an empty body for a year with nothing stored, no validators are kept so the next sync asks again
+        return added
+    stat = csv_path.stat()
+    head = read_csv_head(year)
+    # years can be synced from several threads, re-read so other years' entries are kept
+    with _sync_state_lock:
+        state = read_sync_state()
+        state[str(year)] = {
+            "etag": download.etag,
+            "last_modified": download.last_modified,
+            "last_date": head[1][0] if len(head) > 1 else None,  # None for a header-only csv
+            "csv_mtime_ns": stat.st_mtime_ns,
+            "csv_size": stat.st_size,
+        }
+        write_sync_state(state)
+    return added
+
+
+def csv_downloaded_for_year(year: int) -> bool:
+    return f"{year}.csv" in os.listdir(DATA_DIR)
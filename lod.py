@@ -0,0 +1,151 @@
+"""
+- Level-of-detail downsampling for the historical yield graph
+- Each term gets a pyramid of min/max envelopes, every level halving the point count
+- A view picks the coarsest level that still has about MAX_POINTS points inside the visible range,
+  so zooming in refines all the way down to daily resolution
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data_model import HistoricalCurve, YieldHistory
+from metrics import count_cache
+from prepare_graph_data import DataSnapshot, register_snapshot_listener
+from terms import Term
+
+MAX_POINTS = 1500  # a few points per horizontal pixel of a half-screen-wide chart
+
+DateRange = Tuple[Optional[np.datetime64], Optional[np.datetime64]]
+
+
+def min_max_envelope(yields: np.ndarray, bucket_size: int) -> np.ndarray:
+    """
+    - Indices of the min and max point of every bucket_size-long bucket, in ascending order
+    - Keeps spikes visible, unlike plain striding or averaging
+    """
+    n = len(yields)
+    full_buckets = n // bucket_size
+    bucketed = yields[: full_buckets * bucket_size].reshape(full_buckets, bucket_size)
+    offsets = np.arange(full_buckets) * bucket_size
+    indices = [offsets + bucketed.argmin(axis=1), offsets + bucketed.argmax(axis=1)]
+    if n % bucket_size:
+        tail = yields[full_buckets * bucket_size :]
+        tail_offset = full_buckets * bucket_size
+        indices.append(np.array([tail_offset + tail.argmin(), tail_offset + tail.argmax()]))
+    return np.unique(np.concatenate(indices))  # sorted, and flat buckets collapse to one point
+
+
+class LodPyramid:
+    """
+    - levels[0] is the full resolution curve
+    - levels[k] is the min/max envelope over buckets of bucket_sizes[k] points
+    """
+
+    def __init__(self, curve: HistoricalCurve, max_points: int = MAX_POINTS):
+        self.max_points = max_points
+        self.levels: List[HistoricalCurve] = [curve]
+        self.bucket_sizes: List[int] = [1]
+        bucket_size = 4  # 2 points per bucket of 2 would not reduce anything
+        while len(self.levels[-1].dates) > max_points:
+            indices = min_max_envelope(curve.yields, bucket_size)
+            self.levels.append(HistoricalCurve(curve.dates[indices], curve.yields[indices]))
+            self.bucket_sizes.append(bucket_size)
+            bucket_size *= 2
+
+    @property
+    def full(self) -> HistoricalCurve:
+        return self.levels[0]
+
+    def level_for(self, point_count: int) -> int:
+        """The finest level that draws point_count raw points with at most max_points points"""
+        for level, bucket_size in enumerate(self.bucket_sizes):
+            points_drawn = point_count if bucket_size == 1 else 2 * point_count / bucket_size
+            if points_drawn <= self.max_points:
+                return level
+        return len(self.levels) - 1
+
+    def view(self, date_range: DateRange = (None, None)) -> HistoricalCurve:
+        """
+        - The curve to draw for the visible date range, (None, None) meaning everything
+        - One point beyond each edge is kept so the line reaches the sides of the chart
+        """
+        start, end = date_range
+        full_dates = self.full.dates
+        first = 0 if start is None else np.searchsorted(full_dates, start, "left")
+        last = len(full_dates) if end is None else np.searchsorted(full_dates, end, "right")
+        level = self.levels[self.level_for(int(last - first))]
+
+        if start is None and end is None:
+            return level
+        first = 0 if start is None else max(np.searchsorted(level.dates, start, "left") - 1, 0)
+        last = (
+            len(level.dates)
+            if end is None
+            else min(np.searchsorted(level.dates, end, "right") + 1, len(level.dates))
+        )
+        return HistoricalCurve(level.dates[first:last], level.yields[first:last])
+
+
+@count_cache("lod_pyramids")
+@lru_cache(maxsize=1)
+def prepare_lod_pyramids(yield_history: YieldHistory) -> Dict[Term, LodPyramid]:
+    """Built once per YieldHistory instance, i.e. once per data load"""
+    return {
+        term: LodPyramid(yield_history.historical_curve(term))
+        for term in yield_history.terms
+    }
+
+
+def parse_plotly_date(value: Any) -> np.datetime64:
+    # plotly sends axis ranges like "2008-03-14 05:12:33.1234"
+    return np.datetime64(str(value)[:10], "D")
+
+
+def relayout_x_range(relayout_data: Optional[Dict[str, Any]]) -> Optional[DateRange]:
+    """
+    - Reads the x-axis range out of a dcc.Graph relayoutData event
+    - None when the event did not touch the x-axis (e.g. a y-axis only zoom)
+    - (None, None) when the x-axis went back to autorange
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return (None, None)
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        return (
+            parse_plotly_date(relayout_data["xaxis.range[0]"]),
+            parse_plotly_date(relayout_data["xaxis.range[1]"]),
+        )
+    if "xaxis.range" in relayout_data:
+        start, end = relayout_data["xaxis.range"]
+        return (parse_plotly_date(start), parse_plotly_date(end))
+    return None
+
+
+@count_cache("overview_series")
+@lru_cache(maxsize=1)
+def prepare_overview_series(yield_history: YieldHistory) -> Dict[Term, Dict[str, List[int]]]:
+    """
+    - The coarsest level of every term, compact enough to ship to the browser once
+    - days are days since 1970-01-01, yields are basis points
+    """
+    overview: Dict[Term, Dict[str, List[int]]] = {}
+    for term, pyramid in prepare_lod_pyramids(yield_history).items():
+        curve = pyramid.levels[-1]
+        overview[term] = {
+            "days": curve.dates.astype(np.int64).tolist(),
+            "yields": curve.yields.tolist(),
+        }
+    return overview
+
+
+def rebuild_lod_caches(snapshot: DataSnapshot) -> None:
+    """Drops the previous data's pyramids and builds the new ones before requests need them"""
+    prepare_lod_pyramids.cache_clear()
+    prepare_overview_series.cache_clear()
+    prepare_overview_series(snapshot.yield_history)
+
+
+register_snapshot_listener(rebuild_lod_caches)
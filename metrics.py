@@ -0,0 +1,411 @@
+"""
+- In-process metrics, rendered in the Prometheus text format by the /metrics route (see routes.py)
+- Counters, gauges and histograms are registered when created, modules define the ones they update
+- instrument_server times every request on the Flask server, which covers every Dash callback
+- With PROFILE_REQUESTS on, every request is also run under cProfile and its stats dumped to PROFILE_DIR
+- With SHARED_METRICS on (gunicorn), each worker writes its series to METRICS_DIR every METRICS_FLUSH_SECONDS,
+  and /metrics adds every worker's counters and histograms up, like the Prometheus client's multiprocess mode.
+  Gauges describe one process, so they get a worker label instead, for the workers still running
+"""
+
+import cProfile
+from abc import ABC, abstractmethod
+import functools
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+from config import PROFILE_REQUESTS, SHARED_METRICS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PROFILE_DIR = Path("./profiles")
+METRICS_DIR = Path("./cache") / "metrics"
+METRICS_FLUSH_SECONDS = 5.0
+WORKER_LABEL = "worker"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = tuple(256 * 4**power for power in range(10))  # 256 B to 64 MB
+
+LabelValues = Tuple[str, ...]
+# every labelled series of one metric, in one process or added up over several
+Series = Dict[LabelValues, Any]
+
+_registry: List["Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: Sequence[Tuple[str, str]] = ()) -> str:
+        # series merged across workers can end with a worker label, see Gauge.merge
+        names = self.label_names if len(values) == len(self.label_names) else (*self.label_names, WORKER_LABEL)
+        pairs = list(zip(names, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (f'{name}="{escape_label_value(value)}"' for name, value in pairs)
+        return "{" + ",".join(escaped) + "}"
+
+    @abstractmethod
+    def series(self) -> Series:
+        """A copy of this process's series, safe to serialize while other threads keep updating"""
+
+    @abstractmethod
+    def combine(self, first: Any, second: Any) -> Any:
+        """One series' state in two processes, added up"""
+
+    def merge(self, by_worker: Dict[str, Series]) -> Series:
+        merged: Series = {}
+        for series in by_worker.values():
+            for key, state in series.items():
+                merged[key] = self.combine(merged[key], state) if key in merged else state
+        return merged
+
+    @abstractmethod
+    def samples(self, series: Optional[Series] = None) -> List[str]:
+        """The metric's sample lines, from this process's series or from series merged across workers"""
+
+    def render(self, series: Optional[Series] = None) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(series),
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def series(self) -> Series:
+        with self._lock:
+            return dict(self._values)
+
+    def combine(self, first: float, second: float) -> float:
+        return first + second
+
+    def samples(self, series: Optional[Series] = None) -> List[str]:
+        values = sorted((self.series() if series is None else series).items())
+        return [f"{self.name}{self._format_labels(key)} {value:g}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, by_worker: Dict[str, Series]) -> Series:
+        """Gauges aren't added up, each running worker's value is kept under its worker label"""
+        return {
+            (*key, worker): value
+            for worker, series in by_worker.items()
+            if is_process_alive(int(worker))
+            for key, value in series.items()
+        }
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: counts per bucket (not cumulative) plus +Inf, then the sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        bucket = next(
+            (index for index, bound in enumerate(self.buckets) if value <= bound), len(self.buckets)
+        )
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bucket] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._label_values(labels), []))
+
+    def series(self) -> Series:
+        with self._lock:
+            return {key: (list(counts), self._sums[key]) for key, counts in self._counts.items()}
+
+    def combine(self, first: Any, second: Any) -> Tuple[List[int], float]:
+        # (bucket counts, sum), a list once it has been through a worker's json file
+        return [a + b for a, b in zip(first[0], second[0])], first[1] + second[1]
+
+    def samples(self, series: Optional[Series] = None) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted((self.series() if series is None else series).items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, float("inf")], counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total:g}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    if not SHARED_METRICS:
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    write_worker_metrics()  # this worker's own series are always current
+    by_worker = read_worker_metrics()
+    lines = []
+    for metric in metrics:
+        series = {worker: dumped.get(metric.name, {}) for worker, dumped in by_worker.items()}
+        lines.extend(metric.render(metric.merge(series)))
+    return "\n".join(lines) + "\n"
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_worker_metrics() -> None:
+    """Every series of this process to METRICS_DIR/<pid>.json, replaced whole so readers never see half of it"""
+    with _registry_lock:
+        metrics = list(_registry)
+    dumped = {metric.name: [[list(key), state] for key, state in metric.series().items()] for metric in metrics}
+    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+    path = METRICS_DIR / f"{os.getpid()}.json"
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(dumped, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_worker_metrics() -> Dict[str, Dict[str, Series]]:
+    """Series by metric name, by worker pid, from every worker that has written, running or not"""
+    by_worker: Dict[str, Dict[str, Series]] = {}
+    for path in METRICS_DIR.glob("*.json"):
+        try:
+            with open(path, "r") as f:
+                dumped = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping unreadable metrics {path}: {e}")
+            continue
+        by_worker[path.stem] = {
+            name: {tuple(key): state for key, state in series} for name, series in dumped.items()
+        }
+    return by_worker
+
+
+def clear_worker_metrics() -> None:
+    """Run once before the workers start (gunicorn's on_starting), so an earlier run's counts aren't added in"""
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+
+def flush_worker_metrics_forever() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            write_worker_metrics()
+        except Exception as e:
+            logger.error(f"Failed to write worker metrics: {e}")
+
+
+CACHE_REQUESTS = Counter(
+    "treasury_cache_requests_total",
+    "Lookups in the app's derived-data caches, by cache and hit/miss",
+    ["cache", "result"],
+)
+
+
+def count_cache(name: str) -> Callable:
+    """
+    - Wraps an lru_cache'd function so every call counts as a hit or miss in CACHE_REQUESTS
+    - Unlike cache_info(), the counts survive cache_clear(), which snapshot swaps call
+    """
+
+    def decorate(cached_function: Callable) -> Callable:
+        @functools.wraps(cached_function)
+        def wrapper(*args, **kwargs):
+            misses = cached_function.cache_info().misses
+            result = cached_function(*args, **kwargs)
+            hit = cached_function.cache_info().misses == misses
+            CACHE_REQUESTS.inc(cache=name, result="hit" if hit else "miss")
+            return result
+
+        wrapper.cache_clear = cached_function.cache_clear  # type: ignore[attr-defined]
+        wrapper.cache_info = cached_function.cache_info  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorate
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "treasury_http_request_seconds",
+    "Time spent handling each request, by Flask route and status",
+    ["route", "status"],
+)
+HTTP_RESPONSE_BYTES = Histogram(
+    "treasury_http_response_bytes",
+    "Response body sizes, by Flask route",
+    ["route"],
+    buckets=SIZE_BUCKETS,
+)
+CALLBACK_SECONDS = Histogram(
+    "treasury_dash_callback_seconds",
+    "Time spent in each server-side Dash callback, by its outputs",
+    ["callback"],
+)
+CALLBACK_RESPONSE_BYTES = Histogram(
+    "treasury_dash_callback_response_bytes",
+    "Serialized size of each Dash callback's response, by its outputs",
+    ["callback"],
+    buckets=SIZE_BUCKETS,
+)
+
+DASH_CALLBACK_PATH = "/_dash-update-component"
+
+
+def request_route() -> str:
+    # the rule, not the path, keeps the label set small (one series per route, not per term)
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def dash_callback_label() -> str:
+    body = request.get_json(silent=True) or {}
+    return str(body.get("output", "unknown"))
+
+
+def profile_path(route: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    return PROFILE_DIR / f"{time.time_ns()}-{slug}.prof"
+
+
+class CountingBody:
+    """Passes a streamed response body through to the server, counting the bytes it sends"""
+
+    def __init__(self, body: Iterable[Any]):
+        self.body = body
+        self.size = 0
+        self.finished = False
+
+    def __iter__(self) -> Iterator[Any]:
+        for chunk in self.body:
+            self.size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+        self.finished = True
+
+    def close(self) -> None:
+        close = getattr(self.body, "close", None)
+        if close is not None:
+            close()
+
+
+def instrument_server(server: Flask) -> None:
+    """Times every request and records response sizes, Dash callbacks get their own series"""
+    if SHARED_METRICS:
+        threading.Thread(target=flush_worker_metrics_forever, name="metrics-flush", daemon=True).start()
+
+    @server.before_request
+    def start_request_timer() -> None:
+        g.request_start = time.perf_counter()
+        if PROFILE_REQUESTS:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @server.after_request
+    def record_request(response: Response) -> Response:
+        started = g.pop("request_start", time.perf_counter())
+        route = request_route()
+        status = str(response.status_code)
+        callback = dash_callback_label() if request.path.endswith(DASH_CALLBACK_PATH) else None
+
+        def record(size: Optional[int]) -> float:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUEST_SECONDS.observe(elapsed, route=route, status=status)
+            if callback is not None:
+                CALLBACK_SECONDS.observe(elapsed, callback=callback)
+            if size is not None:  # left out, not recorded as 0, when the whole body was never sent
+                HTTP_RESPONSE_BYTES.observe(size, route=route)
+                if callback is not None:
+                    CALLBACK_RESPONSE_BYTES.observe(size, callback=callback)
+            return elapsed
+
+        if response.is_streamed:
+            # a streamed body is produced while the server sends it, so it is timed and sized when the server closes it
+            body = CountingBody(response.response)
+            response.response = body
+            response.call_on_close(lambda: record(body.size if body.finished else None))
+            elapsed = time.perf_counter() - started
+        else:
+            elapsed = record(response.calculate_content_length())
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            path = profile_path(route)
+            profiler.dump_stats(path)
+            logger.info(f"Profiled {request.method} {request.path} ({elapsed:.3f}s) to {path}")
+        return response
@@ -0,0 +1,206 @@
+"""
+- JSON order API on the Flask server underneath Dash, for clients that aren't a browser
+- POST /api/orders takes one order, or {"orders": [...]} for a batch of up to MAX_BATCH_ORDERS
+- An order is {"term": "10 Yr", "amount_cents": 100000, "idempotency_key": "..."}, the key is optional
+  (a single order can send it as an Idempotency-Key header instead)
+- Orders are priced against the current YieldCurve, like the UI's, see curve_fit.price_term
+- A key that is already booked answers with the order booked under it instead of booking another,
+  so clients can retry a request until they get an answer. Reusing a key for a different term or amount
+  is a conflict
+- A batch answers with one NDJSON line per order, in request order, streamed as the order writer commits them
+"""
+
+import dataclasses
+import json
+import logging
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Union
+
+from flask import Flask, Response, request
+
+from curve_fit import can_price_term, price_term
+from data_model import MAX_ORDER_CENTS, Order, YieldCurve
+from db import read_orders_by_idempotency_key
+from metrics import Counter
+from order_writer import ORDER_ACK_TIMEOUT_SECONDS, get_order_writer
+from prepare_graph_data import prepare_current_yield_curve
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+ORDERS_API_ROUTE = "/api/orders"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+MAX_BATCH_ORDERS = 10_000
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+CONFLICT = "conflict"
+REJECTED = "rejected"
+FAILED = "failed"
+
+API_ORDERS = Counter(
+    "treasury_api_orders_total", "Orders received by the order API, by outcome", ["status"]
+)
+
+
+class OrderRequestError(ValueError):
+    pass
+
+
+def parse_order(item: Any, yield_curve: YieldCurve, timestamp: str) -> Order:
+    """The priced Order an API request item describes, raises OrderRequestError if it doesn't describe one"""
+    if not isinstance(item, dict):
+        raise OrderRequestError("an order must be a JSON object")
+    term = item.get("term")
+    if not isinstance(term, str) or not can_price_term(yield_curve.terms, term):
+        raise OrderRequestError(f"term {term!r} can't be priced on the {yield_curve.date} curve")
+    cents = item.get("amount_cents")
+    # bool is an int subclass, but true isn't an amount
+    if not isinstance(cents, int) or isinstance(cents, bool) or not 0 < cents <= MAX_ORDER_CENTS:
+        raise OrderRequestError(f"amount_cents must be an integer from 1 to {MAX_ORDER_CENTS}, got {cents!r}")
+    key = item.get("idempotency_key")
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= MAX_IDEMPOTENCY_KEY_LENGTH):
+        raise OrderRequestError(
+            f"idempotency_key must be a string of 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+        )
+    return Order(
+        term=term,
+        amount_cents=cents,
+        yield_basis_points=price_term(yield_curve, term),
+        timestamp=timestamp,
+        idempotency_key=key,
+    )
+
+
+class OrderResult(NamedTuple):
+    index: int
+    status: str
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"index": self.index, "status": self.status}
+        if self.order is not None:
+            result["order"] = dataclasses.asdict(self.order)
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+# an order still being written, or where to find the result of the order it duplicates
+Pending = Union[Future, OrderResult, int]
+
+
+def duplicate_of(index: int, order: Order, booked: Optional[Order]) -> OrderResult:
+    """The result for an order whose key was already booked, as booked, a conflict if it asked for something else"""
+    if booked is not None and (booked.term, booked.amount_cents) != (order.term, order.amount_cents):
+        return OrderResult(
+            index,
+            CONFLICT,
+            booked,
+            error=f"idempotency_key {order.idempotency_key!r} was already used for a different order",
+        )
+    return OrderResult(index, DUPLICATE, booked)
+
+
+def submit_orders(items: List[Any]) -> Iterator[OrderResult]:
+    """
+    - Prices and validates every item, queues the new ones on the order writer, then yields each item's result
+      in order as soon as it is known
+    - Every item is priced on the same curve and stamped with the same time
+    - A key repeated within the batch books once, its later items are duplicates of the first
+    """
+    yield_curve = prepare_current_yield_curve()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    orders: List[Optional[Order]] = []
+    pending: List[Pending] = []
+    for index, item in enumerate(items):
+        try:
+            orders.append(parse_order(item, yield_curve, timestamp))
+        except OrderRequestError as e:
+            orders.append(None)
+            pending.append(OrderResult(index, REJECTED, error=str(e)))
+            continue
+        pending.append(-1)
+
+    # keys booked by earlier requests answer without a write
+    keys = [order.idempotency_key for order in orders if order is not None and order.idempotency_key]
+    booked = read_orders_by_idempotency_key(keys) if keys else {}
+    first_index: Dict[str, int] = {}
+    writer = get_order_writer()
+    for index, order in enumerate(orders):
+        if order is None:
+            continue
+        key = order.idempotency_key
+        if key in booked:
+            pending[index] = duplicate_of(index, order, booked[key])
+        elif key is not None and key in first_index:
+            pending[index] = first_index[key]
+        else:
+            if key is not None:
+                first_index[key] = index
+            pending[index] = writer.submit(order)
+
+    results: List[OrderResult] = []
+    for index, entry in enumerate(pending):
+        if isinstance(entry, int):
+            first = results[entry]
+            if first.status in (CREATED, DUPLICATE):
+                result = duplicate_of(index, orders[index], first.order)
+            else:
+                result = first._replace(index=index)
+        elif isinstance(entry, OrderResult):
+            result = entry
+        else:
+            result = wait_for_write(index, entry, orders[index])
+        API_ORDERS.inc(status=result.status)
+        results.append(result)
+        yield result
+
+
+def wait_for_write(index: int, future: Future, order: Optional[Order]) -> OrderResult:
+    try:
+        inserted = future.result(timeout=ORDER_ACK_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.error(f"Order API write failed: {e}")
+        return OrderResult(index, FAILED, error="the order could not be written, retry with the same key")
+    if inserted:
+        return OrderResult(index, CREATED, order)
+    # a concurrent request booked the same key between the lookup and the write
+    key = order.idempotency_key if order is not None else None
+    if order is None or key is None:
+        return OrderResult(index, DUPLICATE)
+    return duplicate_of(index, order, read_orders_by_idempotency_key([key]).get(key))
+
+
+STATUS_CODES = {CREATED: 201, DUPLICATE: 200, REJECTED: 400, CONFLICT: 409, FAILED: 503}
+
+
+def json_response(body: Dict[str, Any], status: int) -> Response:
+    return Response(json.dumps(body), status=status, mimetype="application/json")
+
+
+def stream_results(results: Iterator[OrderResult]) -> Iterator[str]:
+    for result in results:
+        yield json.dumps(result.to_dict(), separators=(",", ":")) + "\n"
+
+
+def register_order_api(server: Flask) -> None:
+    @server.route(ORDERS_API_ROUTE, methods=["POST"])
+    def post_orders():
+        body = request.get_json(silent=True)
+        if isinstance(body, dict) and "orders" in body:
+            items = body["orders"]
+            if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_ORDERS:
+                return json_response(
+                    {"error": f"orders must be a list of 1 to {MAX_BATCH_ORDERS} orders"}, 400
+                )
+            return Response(stream_results(submit_orders(items)), mimetype=NDJSON_MEDIA_TYPE)
+
+        if isinstance(body, dict) and IDEMPOTENCY_KEY_HEADER in request.headers:
+            body.setdefault("idempotency_key", request.headers[IDEMPOTENCY_KEY_HEADER])
+        (result,) = submit_orders([body])
+        return json_response(result.to_dict(), STATUS_CODES[result.status])
@@ -0,0 +1,163 @@
+"""
+- The write path for orders
+- One thread owns the process's only write connection to the database, in WAL mode.
+  Under the multi-process server each worker has its own, sqlite serializes their commits
+- Orders submitted from any Dash worker thread are queued and written in batches, one commit
+  (one fsync) per batch, so throughput scales with clicks per second rather than fsyncs per second
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from data_model import Order
+from db import DB_NAME, connect_for_writes, insert_orders
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MAX_BATCH_SIZE = 500
+ORDER_ACK_TIMEOUT_SECONDS = 10.0
+
+PendingOrder = Tuple[Order, Future]
+
+SQLITE_COMMITS = Counter(
+    "treasury_sqlite_commits_total", "Order batches committed by the order writer, by result", ["result"]
+)
+SQLITE_COMMIT_SECONDS = Histogram(
+    "treasury_sqlite_commit_seconds", "Time to insert and durably commit one batch of orders"
+)
+ORDER_BATCH_SIZE = Histogram(
+    "treasury_order_batch_size",
+    "Orders per commit, more than 1 means group commit absorbed concurrent orders",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+
+
+class OrderWriter(threading.Thread):
+    def __init__(self, db_name: str = DB_NAME, max_batch_size: int = MAX_BATCH_SIZE):
+        super().__init__(name="order-writer", daemon=True)
+        self.db_name = db_name
+        self.max_batch_size = max_batch_size
+        self.commits = 0
+        self._queue: "queue.Queue[Optional[PendingOrder]]" = queue.Queue()
+
+    def submit(self, order: Order) -> Future:
+        """
+        - The returned Future resolves once the order is committed, or raises if the write failed
+        - It resolves to False instead of True if the order's idempotency key was already booked
+        """
+        future: Future = Future()
+        self._queue.put((order, future))
+        return future
+
+    def stop(self) -> None:
+        """Writes everything already submitted, then stops"""
+        self._queue.put(None)
+        self.join()
+
+    def _next_batch(self) -> Tuple[List[PendingOrder], bool]:
+        """
+        - Blocks for the first order, then takes whatever else queued up meanwhile
+        - Orders that arrive during a commit naturally form the next batch
+        """
+        batch: List[PendingOrder] = []
+        item = self._queue.get()
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.max_batch_size:
+                return batch, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[PendingOrder]) -> None:
+        """
+        - Writes batch in one commit, and resolves each order's future
+        - If that fails, each order is retried in a commit of its own, so one bad order only fails itself
+        """
+        try:
+            self._commit(conn, batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} orders: {e}")
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            for pending_order in batch:
+                self._write_batch(conn, [pending_order])
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[PendingOrder]) -> None:
+        start = time.perf_counter()
+        try:
+            inserted = insert_orders(conn, [order for order, _ in batch])
+            conn.commit()
+        except Exception:
+            SQLITE_COMMITS.inc(result="error")
+            conn.rollback()
+            raise
+        self.commits += 1
+        SQLITE_COMMIT_SECONDS.observe(time.perf_counter() - start)
+        ORDER_BATCH_SIZE.observe(len(batch))
+        SQLITE_COMMITS.inc(result="ok")
+        for (_, future), was_inserted in zip(batch, inserted):
+            future.set_result(was_inserted)
+
+    def run(self) -> None:
+        try:
+            self._write_until_stopped()
+        except Exception as e:
+            # the thread ends here, nothing will write what is still queued, so its callers get the error
+            # instead of a timeout. get_order_writer starts a new writer for the next order
+            logger.error(f"Order writer stopped: {e}")
+            self._fail_queued(e)
+
+    def _write_until_stopped(self) -> None:
+        # sqlite connections belong to the thread that opened them
+        conn = connect_for_writes(self.db_name)
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._write_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _fail_queued(self, error: Exception) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(error)
+
+
+_order_writer: Optional[OrderWriter] = None
+_order_writer_lock = threading.Lock()
+
+
+def get_order_writer() -> OrderWriter:
+    """The process-wide writer, started on first use, restarted if it died, and flushed at exit"""
+    global _order_writer
+    with _order_writer_lock:
+        if _order_writer is None or not _order_writer.is_alive():
+            if _order_writer is not None:
+                logger.warning("Order writer thread died, starting a new one")
+            _order_writer = OrderWriter(DB_NAME)
+            _order_writer.start()
+            atexit.register(_order_writer.stop)
+        return _order_writer
+
+
+def write_order(order: Order) -> bool:
+    """Queues order for the next group commit and waits until it is durable, see OrderWriter.submit"""
+    return get_order_writer().submit(order).result(timeout=ORDER_ACK_TIMEOUT_SECONDS)
@@ -1,63 +1,117 @@
-from functools import lru_cache
-from typing import Dict, List, DefaultDict, Optional
-from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 import logging
-from datetime import datetime
+import threading
 
-from load_csv_data import read_downloaded_csv, csv_downloaded_for_year, refresh_data
-from data_model import YieldCurve, HistoricalCurve
+from data_model import YieldCurve, HistoricalCurve, YieldHistory
 from terms import Term
+from config import SHARED_YIELD_STORE
+from metrics import Histogram
+from shared_store import load_shared_yield_history
+from yield_cache import load_yield_history
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-@lru_cache(maxsize=1)
+@dataclass(frozen=True)
+class DataSnapshot:
+    """
+    - Everything the graphs need, from one consistent load of data/
+    - Never mutated: a refresh builds a new snapshot and swaps it in whole
+    """
+
+    yield_history: YieldHistory
+    yield_curve: YieldCurve
+
+    @property
+    def version(self) -> str:
+        return self.yield_history.version
+
+
+SnapshotListener = Callable[[DataSnapshot], None]
+
+_snapshot: Optional[DataSnapshot] = None
+_snapshot_lock = threading.Lock()
+_snapshot_listeners: List[SnapshotListener] = []
+
+
+SNAPSHOT_LOAD_SECONDS = Histogram(
+    "treasury_snapshot_load_seconds", "Time to build a DataSnapshot from data/ and the yield cache"
+)
+
+
+def load_snapshot() -> DataSnapshot:
+    """
+    - Builds a snapshot from the files already in data/, without touching the network
+    - With SHARED_YIELD_STORE on, attaches to the published store instead
+    """
+    with SNAPSHOT_LOAD_SECONDS.time():
+        yield_history = load_shared_yield_history() if SHARED_YIELD_STORE else load_yield_history()
+    # the newest row of the history is the most recent business day's yield curve
+    return DataSnapshot(yield_history, yield_history.yield_curve_at(-1))
+
+
+def current_snapshot() -> DataSnapshot:
+    """
+    - The snapshot requests should read from
+    - Loaded from disk on first use, afterwards only replaced by swap_snapshot
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = load_snapshot()
+            snapshot = _snapshot
+    return snapshot
+
+
+def swap_snapshot(snapshot: DataSnapshot) -> None:
+    """Atomically replaces the current snapshot, then lets derived caches drop/rebuild"""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = snapshot
+    logger.info(f"Serving data version {snapshot.version}")
+    notify_snapshot_listeners(snapshot)
+
+
+def notify_snapshot_listeners(snapshot: DataSnapshot) -> None:
+    """Rebuilds every derived cache for snapshot, swap_snapshot calls it and so does the startup warm-up"""
+    for listener in _snapshot_listeners:
+        try:
+            listener(snapshot)
+        except Exception as e:
+            logger.error(f"Snapshot listener {listener} failed: {e}")
+
+
+def register_snapshot_listener(listener: SnapshotListener) -> None:
+    """listener(new_snapshot) runs after every swap, on the thread that swapped"""
+    _snapshot_listeners.append(listener)
+
+
 def prepare_current_yield_curve() -> YieldCurve:
     """
     - Prepares the data for the graph on the left
     - This is the most recent business day's yield curve
     """
-    yield_curve_file_rows: List[List[str]] = read_downloaded_csv(refresh_data())
+    return current_snapshot().yield_curve
 
-    first_line: List[str] = yield_curve_file_rows[0]
-    second_line: List[str] = yield_curve_file_rows[1]
 
-    terms: List[Term] = [col.replace("onth", "o") for col in first_line[1:]]
-    date_: str = second_line[0]
-    yields: List[int] = [int(val.replace(".", "")) for val in second_line[1:]]
-
-    return YieldCurve(date_, terms, yields)
+def prepare_yield_history() -> YieldHistory:
+    """
+    - Prepares the data for the graph on the right
+    - Every term's yield timeseries from 1990 to present day, in one columnar structure
+    - Served from the compiled per-year cache, see yield_cache.py
+    """
+    return current_snapshot().yield_history
 
 
-@lru_cache(maxsize=1)
 def prepare_historical_curves() -> Dict[Term, HistoricalCurve]:
     """
-    - Prepares the data for the graph on the right
     - Returns a dict
     - - the keys are terms, e.g. "7 Yr"
     - - the values are yield timeseries from 1990 to present day
     """
-    historical_curves: DefaultDict[Term, HistoricalCurve] = defaultdict(
-        lambda: HistoricalCurve([], [])
-    )
-    current_year = datetime.now().year
-    for year in range(1990, current_year + 1):
-        if not csv_downloaded_for_year(year):
-            logger.warning(f"No data for {year}")
-            continue
-        csv_rows = read_downloaded_csv(year)
-        terms: List[Term] = [term.replace("onth", "o") for term in csv_rows[0][1:]]
-        for row in reversed(
-            csv_rows[1:]
-        ):  # reversed to get them in ascending date order
-            row_date: str = row[0]
-            yield_values: List[Optional[int]] = [
-                (int(x.replace(".", "")) if x else None) for x in row[1:]
-            ]
-            for term, yield_value in zip(terms, yield_values):
-                if yield_value is not None:
-                    historical_curves[term].add_data_point(
-                        datetime.strptime(row_date, "%m/%d/%Y"), yield_value
-                    )
-    return historical_curves
+    yield_history = prepare_yield_history()
+    return {term: yield_history.historical_curve(term) for term in yield_history.terms}
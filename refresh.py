@@ -0,0 +1,80 @@
+"""
+- Background refresh of the treasury data
+- A daemon thread periodically downloads new business-day rows, builds a new DataSnapshot
+  off the request path, and swaps it in. Requests never wait on the network
+- With SHARED_YIELD_STORE on, every worker process runs a refresher but only one downloads per interval,
+  the rest swap in what it published, see shared_store.py
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from config import REFRESH_INTERVAL_SECONDS, SHARED_YIELD_STORE
+from backfill import backfill
+from metrics import Histogram
+from prepare_graph_data import current_snapshot, load_snapshot, swap_snapshot
+from shared_store import refresh_shared_store
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+REFRESH_SECONDS = Histogram(
+    "treasury_refresh_seconds",
+    "Background refreshes, download through snapshot swap, by whether new data was swapped in",
+    ["result"],
+)
+
+
+def refresh_once() -> bool:
+    """
+    - Downloads anything new (including years missed while the app sat unused), then reloads data/ if needed
+    - Returns whether a new snapshot was swapped in
+    """
+    start = time.perf_counter()
+    if SHARED_YIELD_STORE:
+        refresh_shared_store(backfill, REFRESH_INTERVAL_SECONDS)
+    else:
+        try:
+            backfill()
+        except Exception as e:
+            # keep serving what is on disk, the next tick will retry
+            logger.error(f"Error refreshing treasury data: {e}")
+    snapshot = load_snapshot()
+    swapped = snapshot.version != current_snapshot().version
+    if swapped:
+        swap_snapshot(snapshot)
+    REFRESH_SECONDS.observe(time.perf_counter() - start, result="swapped" if swapped else "unchanged")
+    return swapped
+
+
+class DataRefresher(threading.Thread):
+    def __init__(self, interval_seconds: float = REFRESH_INTERVAL_SECONDS):
+        super().__init__(name="data-refresher", daemon=True)
+        self.interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                refresh_once()
+            except Exception as e:
+                logger.error(f"Error building new data snapshot: {e}")
+            self._stopped.wait(self.interval_seconds)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_refresher: Optional[DataRefresher] = None
+
+
+def start_background_refresh() -> DataRefresher:
+    """Starts the refresher thread once per process"""
+    global _refresher
+    if _refresher is None or not _refresher.is_alive():
+        _refresher = DataRefresher()
+        _refresher.start()
+    return _refresher
@@ -0,0 +1,198 @@
+"""
+- Materialized rollups of the yield history, so long-horizon views don't recompute from daily points
+- For every term: weekly, monthly and yearly open/high/low/close, and rolling means over ROLLING_WINDOWS
+- Built when data loads, then extended incrementally: a refresh that only appends business days
+  recomputes just the last period of each rollup and the tail of each rolling mean
+"""
+
+import logging
+import threading
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from data_model import HistoricalCurve, YieldHistory
+from prepare_graph_data import DataSnapshot, prepare_yield_history, register_snapshot_listener
+from terms import Term
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PERIODS = ("weekly", "monthly", "yearly")
+# business days per window
+ROLLING_WINDOWS: Dict[str, int] = {"1M": 21, "3M": 63, "1Y": 252}
+
+MONDAY_1970_01_05 = 4  # days since the epoch, 1970-01-01 was a Thursday
+
+
+def period_starts(dates: np.ndarray, period: str) -> np.ndarray:
+    """The first day of the week (Monday), month or year each date falls in"""
+    if period == "weekly":
+        days = dates.astype("datetime64[D]").astype(np.int64)
+        return (days - (days - MONDAY_1970_01_05) % 7).astype("datetime64[D]")
+    if period == "monthly":
+        return dates.astype("datetime64[M]").astype("datetime64[D]")
+    if period == "yearly":
+        return dates.astype("datetime64[Y]").astype("datetime64[D]")
+    raise ValueError(f"Unknown rollup period {period}")
+
+
+class Ohlc(NamedTuple):
+    """One term's open/high/low/close per period, in basis points"""
+
+    periods: np.ndarray  # datetime64[D] first day of each period
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def to_dict(self):
+        return {
+            "periods": np.datetime_as_string(self.periods, unit="D").tolist(),
+            "open": self.open.tolist(),
+            "high": self.high.tolist(),
+            "low": self.low.tolist(),
+            "close": self.close.tolist(),
+        }
+
+
+def compute_ohlc(curve: HistoricalCurve, period: str) -> Ohlc:
+    """Rolls one term's daily points up into periods, every period in one reduceat per column"""
+    if len(curve.dates) == 0:
+        empty = np.array([], dtype=curve.yields.dtype)
+        return Ohlc(np.array([], dtype="datetime64[D]"), empty, empty, empty, empty)
+    starts = period_starts(curve.dates, period)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:], len(starts)] - 1
+    return Ohlc(
+        periods=starts[first],
+        open=curve.yields[first],
+        high=np.maximum.reduceat(curve.yields, first),
+        low=np.minimum.reduceat(curve.yields, first),
+        close=curve.yields[last],
+    )
+
+
+def concatenate_ohlc(head: Ohlc, tail: Ohlc) -> Ohlc:
+    return Ohlc(*(np.concatenate([a, b]) for a, b in zip(head, tail)))
+
+
+def rolling_mean(yields: np.ndarray, window: int) -> np.ndarray:
+    """Mean basis points of each point and the window - 1 before it, NaN until there are enough points"""
+    means = np.full(len(yields), np.nan, dtype=np.float32)
+    if len(yields) >= window:
+        sums = np.cumsum(yields, dtype=np.int64)
+        sums = np.r_[0, sums]
+        means[window - 1 :] = (sums[window:] - sums[:-window]) / window
+    return means
+
+
+class Rollups:
+    """
+    - ohlc[period][term] and rolling_means[window label][term] for one YieldHistory
+    - Rolling means are aligned with yield_history.historical_curve(term).dates
+    """
+
+    def __init__(
+        self,
+        yield_history: YieldHistory,
+        ohlc: Dict[str, Dict[Term, Ohlc]],
+        rolling_means: Dict[str, Dict[Term, np.ndarray]],
+    ):
+        self.yield_history = yield_history
+        self.ohlc = ohlc
+        self.rolling_means = rolling_means
+
+    @staticmethod
+    def build(yield_history: YieldHistory) -> "Rollups":
+        curves = {term: yield_history.historical_curve(term) for term in yield_history.terms}
+        return Rollups(
+            yield_history,
+            ohlc={
+                period: {term: compute_ohlc(curve, period) for term, curve in curves.items()}
+                for period in PERIODS
+            },
+            rolling_means={
+                label: {term: rolling_mean(curve.yields, window) for term, curve in curves.items()}
+                for label, window in ROLLING_WINDOWS.items()
+            },
+        )
+
+    def is_prefix_of(self, yield_history: YieldHistory) -> bool:
+        """Whether yield_history only adds business days after the ones these rollups were built from"""
+        old = self.yield_history
+        rows = len(old)
+        return (
+            old.terms == yield_history.terms
+            and len(yield_history) >= rows
+            and np.array_equal(old.dates, yield_history.dates[:rows])
+            and np.array_equal(old.yields, yield_history.yields[:rows])
+            and np.array_equal(old.valid, yield_history.valid[:rows])
+        )
+
+    def extend(self, yield_history: YieldHistory) -> "Rollups":
+        """
+        - Rollups for yield_history, reusing these where yield_history only appended days
+        - Per term, only the last stored period and the last window - 1 points are recomputed
+        - Anything else (e.g. a backfilled past year) rebuilds from scratch
+        """
+        if not self.is_prefix_of(yield_history):
+            logger.info("Yield history changed before its last day, rebuilding rollups")
+            return Rollups.build(yield_history)
+        if len(yield_history) == len(self.yield_history):
+            return Rollups(yield_history, self.ohlc, self.rolling_means)
+
+        ohlc: Dict[str, Dict[Term, Ohlc]] = {period: {} for period in PERIODS}
+        rolling_means: Dict[str, Dict[Term, np.ndarray]] = {label: {} for label in ROLLING_WINDOWS}
+        for term in yield_history.terms:
+            curve = yield_history.historical_curve(term)
+            known_points = len(self.rolling_means[next(iter(ROLLING_WINDOWS))][term])
+
+            for period in PERIODS:
+                stored = self.ohlc[period][term]
+                if len(stored) == 0:
+                    ohlc[period][term] = compute_ohlc(curve, period)
+                    continue
+                # the last stored period may still be open, recompute it along with any new ones
+                reopened = stored.periods[-1]
+                first = int(np.searchsorted(curve.dates, reopened, "left"))
+                tail = compute_ohlc(HistoricalCurve(curve.dates[first:], curve.yields[first:]), period)
+                ohlc[period][term] = concatenate_ohlc(Ohlc(*(column[:-1] for column in stored)), tail)
+
+            for label, window in ROLLING_WINDOWS.items():
+                start = max(0, known_points - window + 1)
+                tail_means = rolling_mean(curve.yields[start:], window)[known_points - start :]
+                rolling_means[label][term] = np.concatenate(
+                    [self.rolling_means[label][term], tail_means]
+                )
+        return Rollups(yield_history, ohlc, rolling_means)
+
+
+_rollups: Optional[Rollups] = None
+_rollups_lock = threading.Lock()
+
+
+def prepare_rollups() -> Rollups:
+    """Rollups of the current yield history, extended from the previous ones when the data changed"""
+    global _rollups
+    yield_history = prepare_yield_history()
+    rollups = _rollups
+    if rollups is not None and rollups.yield_history is yield_history:
+        return rollups
+    with _rollups_lock:
+        if _rollups is None:
+            _rollups = Rollups.build(yield_history)
+        elif _rollups.yield_history is not yield_history:
+            _rollups = _rollups.extend(yield_history)
+        return _rollups
+
+
+def rebuild_rollups(snapshot: DataSnapshot) -> None:
+    # materialize as soon as new data is swapped in, rather than on the next request
+    prepare_rollups()
+
+
+register_snapshot_listener(rebuild_rollups)
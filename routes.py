@@ -0,0 +1,235 @@
+"""
+- Plain HTTP routes on the Flask server underneath Dash
+- Dash callbacks cover the UI, these cover data that browsers/scripts fetch directly
+"""
+
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+
+from flask import Flask, Response, abort, request
+
+from callbacks import cached_historical_view
+from curve_fit import CURVE_FIT_METHODS, NSS, prepare_curve_fits
+from layout import DAILY, MOVING_AVERAGE_OFF
+from metrics import CACHE_REQUESTS, render_metrics
+from prepare_graph_data import prepare_yield_history
+from rollups import PERIODS, ROLLING_WINDOWS, prepare_rollups
+from spreads import prepare_spread_analytics
+from startup import STARTED_AT, is_ready, warm_up_error
+from terms import MATURITY_TERMS, Term, term_years
+
+HISTORICAL_CURVE_ROUTE = "/data/historical-curves/"
+ROLLUP_ROUTE = "/data/rollups/"
+ROLLING_MEAN_ROUTE = "/data/rolling-means/"
+SPREAD_ROUTE = "/data/spreads/"
+CURVE_FIT_ROUTE = "/data/curve-fits/"
+HISTORICAL_CURVE_MAX_AGE_SECONDS = 300  # data changes at most once per business day
+HISTORICAL_FIGURE_ROUTE = "/data/figures/historical/"
+METRICS_ROUTE = "/metrics"
+HEALTH_ROUTE = "/healthz"
+PROMETHEUS_TEXT_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def historical_curve_url(term: Term) -> str:
+    return HISTORICAL_CURVE_ROUTE + quote(term)
+
+
+def versioned_json_response(etag: str, cache: str, make_body: Callable[[], Any]) -> Response:
+    """make_body() as JSON, or a 304 when the browser already has etag; cache names the hit/miss counter"""
+    if request.if_none_match.contains(etag):
+        CACHE_REQUESTS.inc(cache=cache, result="hit")
+        response = Response(status=304)
+    else:
+        CACHE_REQUESTS.inc(cache=cache, result="miss")
+        response = Response(
+            json.dumps(make_body(), separators=(",", ":")), mimetype="application/json"
+        )
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = HISTORICAL_CURVE_MAX_AGE_SECONDS
+    return response
+
+
+def nullable(values: np.ndarray) -> List[Optional[float]]:
+    """Floats rounded to 2 places, NaN as null"""
+    return [None if math.isnan(value) else value for value in values.astype(float).round(2).tolist()]
+
+
+def register_routes(server: Flask) -> None:
+    @server.route(HISTORICAL_CURVE_ROUTE + "<path:term>")
+    def historical_curve(term: Term):
+        """One term's yield timeseries as JSON, revalidated with an ETag"""
+        yield_history = prepare_yield_history()
+        if term not in yield_history.terms:
+            abort(404)
+        return versioned_json_response(
+            f"{yield_history.version}-{yield_history.term_index(term)}",
+            "historical_curve_etag",
+            lambda: {"term": term, **yield_history.historical_curve(term).to_dict()},
+        )
+
+    @server.route(ROLLUP_ROUTE + "<period>/<path:term>")
+    def rollup(period: str, term: Term):
+        """One term's open/high/low/close per week, month or year, in basis points"""
+        rollups = prepare_rollups()
+        yield_history = rollups.yield_history
+        if period not in PERIODS or term not in yield_history.terms:
+            abort(404)
+        return versioned_json_response(
+            f"{yield_history.version}-{period}-{yield_history.term_index(term)}",
+            "rollup_etag",
+            lambda: {"term": term, "period": period, **rollups.ohlc[period][term].to_dict()},
+        )
+
+    @server.route(ROLLING_MEAN_ROUTE + "<window>/<path:term>")
+    def rolling_mean(window: str, term: Term):
+        """One term's rolling mean in basis points on each of its dates, null until the window fills"""
+        rollups = prepare_rollups()
+        yield_history = rollups.yield_history
+        if window not in ROLLING_WINDOWS or term not in yield_history.terms:
+            abort(404)
+
+        def body() -> Dict[str, Any]:
+            dates = yield_history.historical_curve(term).dates
+            means = rollups.rolling_means[window][term]
+            return {
+                "term": term,
+                "window": window,
+                "dates": np.datetime_as_string(dates, unit="D").tolist(),
+                "means": nullable(means),
+            }
+
+        return versioned_json_response(
+            f"{yield_history.version}-{window}-{yield_history.term_index(term)}",
+            "rolling_mean_etag",
+            body,
+        )
+
+    @server.route(SPREAD_ROUTE + "<long_term>/<short_term>")
+    def spread(long_term: Term, short_term: Term):
+        """
+        - The long_term - short_term spread in basis points on every date both have a value, and its inversions
+        - ?window=1M|3M|1Y adds the rolling mean and standard deviation over that window, null until it fills
+        """
+        yield_history = prepare_yield_history()
+        window = request.args.get("window")
+        if (
+            long_term not in yield_history.terms
+            or short_term not in yield_history.terms
+            or (window is not None and window not in ROLLING_WINDOWS)
+        ):
+            abort(404)
+
+        def body() -> Dict[str, Any]:
+            analytics = prepare_spread_analytics(long_term, short_term)
+            result = {
+                "long_term": long_term,
+                "short_term": short_term,
+                "dates": np.datetime_as_string(analytics.spread.dates, unit="D").tolist(),
+                "spreads": analytics.spread.basis_points.tolist(),
+                "inversions": analytics.inversions.to_dict(),
+            }
+            if window is not None:
+                result["window"] = window
+                result["means"] = nullable(analytics.rolling_means[window])
+                result["stds"] = nullable(analytics.rolling_stds[window])
+            return result
+
+        indices = f"{yield_history.term_index(long_term)}-{yield_history.term_index(short_term)}"
+        return versioned_json_response(f"{yield_history.version}-{indices}-{window}", "spread_etag", body)
+
+    @server.route(CURVE_FIT_ROUTE + "<method>")
+    def curve_fit(method: str):
+        """
+        - One date's fitted curve at every maturity term, in basis points, read off the current version's fits
+        - method is pchip (through every quote) or nss, which also returns its parameters
+          [b0, b1, b2, b3, decay1, decay2]
+        - ?date=YYYY-MM-DD picks the nearest business day, the most recent one if left out
+        """
+        yield_history = prepare_yield_history()
+        if method not in CURVE_FIT_METHODS or len(yield_history) == 0:
+            abort(404)
+        row = len(yield_history) - 1
+        if "date" in request.args:
+            try:
+                row = int(yield_history.rows_for_dates(request.args["date"]))
+            except ValueError:
+                abort(404)
+        fits = prepare_curve_fits(yield_history)
+        if yield_history.valid[row].sum() < 2 or (method == NSS and not fits.has_nss(row)):
+            abort(404)
+
+        def body() -> Dict[str, Any]:
+            maturities = np.array([term_years(term) for term in MATURITY_TERMS])
+            result = {
+                "date": str(yield_history.dates[row]),
+                "method": method,
+                "terms": MATURITY_TERMS,
+                "yields": nullable(fits.yields_at(row, maturities, method)),
+                "quoted": [term for term, valid in zip(yield_history.terms, yield_history.valid[row]) if valid],
+            }
+            if method == NSS:
+                result["params"] = fits.nss_params[row].round(6).tolist()
+            return result
+
+        return versioned_json_response(f"{yield_history.version}-{method}-{row}", "curve_fit_etag", body)
+
+    @server.route(HISTORICAL_FIGURE_ROUTE + "<path:term>")
+    def historical_figure(term: Term):
+        """
+        - The historical graph's figure JSON, fully zoomed out, straight from the figure cache
+        - ?resolution=weekly|monthly|yearly and ?moving_average=1M|3M|1Y pick the view, like the graph's controls
+        - Sent pre-gzipped to clients that accept it
+        """
+        yield_history = prepare_yield_history()
+        resolution = request.args.get("resolution", DAILY)
+        moving_average = request.args.get("moving_average", MOVING_AVERAGE_OFF)
+        if (
+            term not in yield_history.terms
+            or resolution not in (DAILY, *PERIODS)
+            or moving_average not in (MOVING_AVERAGE_OFF, *ROLLING_WINDOWS)
+        ):
+            abort(404)
+
+        etag = f"{yield_history.version}-{resolution}-{moving_average}-{yield_history.term_index(term)}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            cached = cached_historical_view(term, resolution, moving_average)
+            if "gzip" in request.accept_encodings:
+                response = Response(cached.gzipped, mimetype="application/json")
+                response.content_encoding = "gzip"
+            else:
+                response = Response(cached.json, mimetype="application/json")
+        response.vary.add("Accept-Encoding")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = HISTORICAL_CURVE_MAX_AGE_SECONDS
+        return response
+
+    @server.route(HEALTH_ROUTE)
+    def health():
+        """
+        - 200 once the data and derived caches are warm, 503 while they are still warming, see startup.py
+        - A failed warm-up is retried, until then its error is in the 503's body
+        """
+        body: Dict[str, Any] = {"uptime_seconds": round(time.time() - STARTED_AT, 3)}
+        if not is_ready():
+            error = warm_up_error()
+            if error is not None:
+                body["error"] = error
+            return Response(
+                json.dumps({"status": "warming", **body}), status=503, mimetype="application/json"
+            )
+        body = {"status": "ready", "version": prepare_yield_history().version, **body}
+        return Response(json.dumps(body), mimetype="application/json")
+
+    @server.route(METRICS_ROUTE)
+    def metrics():
+        """Every metric in metrics.py's registry, in the Prometheus text format"""
+        return Response(render_metrics(), content_type=PROMETHEUS_TEXT_MEDIA_TYPE)
@@ -0,0 +1,182 @@
+"""
+- A read-only yield store shared by every worker process of the production server, see gunicorn.conf.py
+- One process publishes a YieldHistory as .npy files under STORE_DIR, then points POINTER_NAME at its version.
+  Workers memory-map the published files, so the OS page cache holds one copy of the data for all of them
+- Refreshes take an exclusive fcntl lock on LOCK_NAME, so exactly one process downloads per interval.
+  The others only notice that the pointer moved and re-attach
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from data_model import YieldHistory
+from yield_cache import ARRAY_NAMES, load_yield_history
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STORE_DIR = Path("./cache/shared")
+POINTER_NAME = "current.json"
+LOCK_NAME = "refresh.lock"
+
+PublishListener = Callable[[YieldHistory], None]
+
+_publish_listeners: List[PublishListener] = []
+
+
+def register_publish_listener(listener: PublishListener) -> None:
+    """
+    - listener(yield_history) runs in the publishing process before the pointer moves to it
+    - For derived data cached on disk per version, so workers find it already built instead of all building it
+    """
+    _publish_listeners.append(listener)
+
+
+@contextmanager
+def store_lock(blocking: bool = True) -> Iterator[bool]:
+    """
+    - Holds the store's exclusive lock across processes, yields whether it was acquired
+    - Non-blocking callers get False straight away while another process holds it
+    """
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STORE_DIR / LOCK_NAME, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def version_path(version: str, name: str) -> Path:
+    return STORE_DIR / f"{version}.{name}.npy"
+
+
+def read_pointer() -> Optional[Dict[str, Any]]:
+    try:
+        with open(STORE_DIR / POINTER_NAME, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_pointer(pointer: Dict[str, Any]) -> None:
+    tmp_path = STORE_DIR / f"{POINTER_NAME}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(pointer, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, STORE_DIR / POINTER_NAME)
+
+
+def remove_old_versions(keep: List[str]) -> None:
+    # attached workers keep their mapping of an unlinked file, removing it only frees the disk space
+    # once they re-attach. The previous version is kept for workers that read the old pointer just now
+    for path in STORE_DIR.glob("*.npy"):
+        if path.name.split(".")[0] not in keep:
+            path.unlink(missing_ok=True)
+
+
+def publish(yield_history: YieldHistory, downloaded_at: Optional[float] = None) -> None:
+    """
+    - Writes yield_history to the store and points workers at it. Callers hold store_lock
+    - downloaded_at is when the download that produced it started, None if nothing was downloaded
+    """
+    version = yield_history.version
+    for listener in _publish_listeners:
+        try:
+            listener(yield_history)
+        except Exception as e:
+            logger.error(f"Publish listener {listener} failed: {e}")
+
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    for name in ARRAY_NAMES:
+        path = version_path(version, name)
+        if path.exists():
+            continue  # an unchanged version is republished when a download found nothing new
+        tmp_path = STORE_DIR / f"{version}.{name}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, getattr(yield_history, name))
+        os.replace(tmp_path, path)
+
+    previous = read_pointer() or {}
+    if downloaded_at is None:
+        downloaded_at = previous.get("downloaded_at")
+    write_pointer(
+        {
+            "version": version,
+            "terms": yield_history.terms,
+            "rows": len(yield_history),
+            "downloaded_at": downloaded_at,
+            "published_at": time.time(),
+        }
+    )
+    remove_old_versions(keep=[version, previous.get("version", version)])
+    logger.info(f"Published data version {version} to {STORE_DIR}")
+
+
+def attach_published() -> Optional[YieldHistory]:
+    """The published YieldHistory, memory-mapped read-only, or None if nothing was published yet"""
+    pointer = read_pointer()
+    if pointer is None:
+        return None
+    version = pointer["version"]
+    try:
+        dates, yields, valid = (
+            np.load(version_path(version, name), mmap_mode="r") for name in ARRAY_NAMES
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable shared yield store version {version}: {e}")
+        return None
+    # the pointer carries the version, so attaching never reads the data through to hash it
+    return YieldHistory(dates, pointer["terms"], yields, valid, version=version)
+
+
+def load_shared_yield_history() -> YieldHistory:
+    """The published yield history, publishing one from data/ first if no process has yet"""
+    yield_history = attach_published()
+    if yield_history is not None:
+        return yield_history
+    with store_lock():
+        # another process may have published while this one waited for the lock
+        yield_history = attach_published()
+        if yield_history is None:
+            publish(load_yield_history())
+            yield_history = attach_published()
+    if yield_history is None:
+        raise OSError(f"Could not attach to the shared yield store in {STORE_DIR}")
+    return yield_history
+
+
+def is_download_due(interval_seconds: float) -> bool:
+    pointer = read_pointer()
+    if pointer is None or pointer.get("downloaded_at") is None:
+        return True
+    return time.time() - pointer["downloaded_at"] >= interval_seconds
+
+
+def refresh_shared_store(download: Callable[[], None], interval_seconds: float) -> bool:
+    """
+    - Downloads and publishes from whichever process takes the lock first, at most once per interval_seconds
+    - Returns whether this process downloaded. Every process then picks up the result with attach_published
+    """
+    with store_lock(blocking=False) as locked:
+        if not locked or not is_download_due(interval_seconds):
+            return False  # another process is downloading now, or already did this interval
+        started_at = time.time()
+        try:
+            download()
+        except Exception as e:
+            # keep serving what is on disk, the next interval will retry
+            logger.error(f"Error refreshing treasury data: {e}")
+        publish(load_yield_history(), downloaded_at=started_at)
+        return True
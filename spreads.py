@@ -0,0 +1,140 @@
+"""
+- Term spreads (e.g. 10 Yr - 2 Yr) over the whole yield history, and the inversions where they go negative
+- A spread is only defined on dates where both terms have a value, the two columns are aligned by masking
+  the shared date axis, so there is nothing to join
+- Every series is computed in a few vectorized passes and cached per data version and term pair
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from data_model import YieldHistory
+from metrics import count_cache
+from prepare_graph_data import DataSnapshot, prepare_yield_history, register_snapshot_listener
+from rollups import ROLLING_WINDOWS, rolling_mean
+from terms import Term
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# (long term, short term), the spreads the dashboard offers first
+WATCHED_SPREADS: List[Tuple[Term, Term]] = [("10 Yr", "2 Yr"), ("10 Yr", "3 Mo")]
+CACHED_SPREADS = 64  # term pairs per data version
+
+
+class Spread(NamedTuple):
+    long_term: Term
+    short_term: Term
+    dates: np.ndarray  # datetime64[D], the dates both terms have a value
+    basis_points: np.ndarray  # int32, long term's yield minus short term's
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+def compute_spread(yield_history: YieldHistory, long_term: Term, short_term: Term) -> Spread:
+    both = yield_history.term_valid(long_term) & yield_history.term_valid(short_term)
+    long_yields = yield_history.term_yields(long_term)[both].astype(np.int32)
+    return Spread(
+        long_term,
+        short_term,
+        yield_history.dates[both],
+        long_yields - yield_history.term_yields(short_term)[both],
+    )
+
+
+class Inversions(NamedTuple):
+    """One entry per run of consecutive dates with a negative spread"""
+
+    starts: np.ndarray  # datetime64[D], first inverted date
+    ends: np.ndarray  # datetime64[D], last inverted date, the current date while ongoing
+    days: np.ndarray  # number of inverted business days
+    deepest: np.ndarray  # most negative spread reached, in basis points
+    ongoing: bool  # whether the last episode runs through the latest date
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def to_dict(self):
+        return {
+            "starts": np.datetime_as_string(self.starts, unit="D").tolist(),
+            "ends": np.datetime_as_string(self.ends, unit="D").tolist(),
+            "days": self.days.tolist(),
+            "deepest": self.deepest.tolist(),
+            "ongoing": self.ongoing,
+        }
+
+
+def find_inversions(spread: Spread) -> Inversions:
+    """Episodes start where the spread turns negative and end where it turns back, from one diff of the sign"""
+    inverted = (spread.basis_points < 0).astype(np.int8)
+    edges = np.diff(np.r_[np.int8(0), inverted, np.int8(0)])
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)  # one past each episode's last date
+    # each reduceat segment also spans the positive dates up to the next start, which can't lower its minimum
+    deepest = (
+        np.minimum.reduceat(spread.basis_points, starts) if len(starts) else np.array([], dtype=np.int32)
+    )
+    return Inversions(
+        starts=spread.dates[starts],
+        ends=spread.dates[stops - 1],
+        days=stops - starts,
+        deepest=deepest,
+        ongoing=bool(len(inverted) and inverted[-1]),
+    )
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Population standard deviation of each point and the window - 1 before it, NaN until there are enough"""
+    stds = np.full(len(values), np.nan, dtype=np.float32)
+    if len(values) >= window:
+        values = values.astype(np.int64)
+        sums = np.r_[0, np.cumsum(values)]
+        squares = np.r_[0, np.cumsum(values * values)]
+        means = (sums[window:] - sums[:-window]) / window
+        variances = (squares[window:] - squares[:-window]) / window - means * means
+        stds[window - 1 :] = np.sqrt(np.maximum(variances, 0))  # rounding can dip just below 0
+    return stds
+
+
+class SpreadAnalytics(NamedTuple):
+    """A spread, its inversions, and its rolling mean and standard deviation over each of ROLLING_WINDOWS"""
+
+    spread: Spread
+    inversions: Inversions
+    rolling_means: Dict[str, np.ndarray]  # window label -> basis points aligned with spread.dates
+    rolling_stds: Dict[str, np.ndarray]
+
+    @staticmethod
+    def compute(yield_history: YieldHistory, long_term: Term, short_term: Term) -> "SpreadAnalytics":
+        spread = compute_spread(yield_history, long_term, short_term)
+        return SpreadAnalytics(
+            spread,
+            find_inversions(spread),
+            {label: rolling_mean(spread.basis_points, window) for label, window in ROLLING_WINDOWS.items()},
+            {label: rolling_std(spread.basis_points, window) for label, window in ROLLING_WINDOWS.items()},
+        )
+
+
+@count_cache("spread_analytics")
+@lru_cache(maxsize=CACHED_SPREADS)
+def spread_analytics(yield_history: YieldHistory, long_term: Term, short_term: Term) -> SpreadAnalytics:
+    return SpreadAnalytics.compute(yield_history, long_term, short_term)
+
+
+def prepare_spread_analytics(long_term: Term, short_term: Term) -> SpreadAnalytics:
+    """Analytics of the long_term - short_term spread on the current data, raises KeyError for an unknown term"""
+    return spread_analytics(prepare_yield_history(), long_term, short_term)
+
+
+def rebuild_spread_analytics(snapshot: DataSnapshot) -> None:
+    spread_analytics.cache_clear()
+    for long_term, short_term in WATCHED_SPREADS:
+        if long_term in snapshot.yield_history.terms and short_term in snapshot.yield_history.terms:
+            spread_analytics(snapshot.yield_history, long_term, short_term)
+
+
+register_snapshot_listener(rebuild_spread_analytics)
@@ -0,0 +1,76 @@
+"""
+- Cold start: the server binds and answers straight away, while a background thread warms the data
+  and every derived cache (curve fits, LOD pyramids, rollups, figures)
+- With the snapshot baked into the image by build_snapshot.py, warming only loads files
+- /healthz (see routes.py) reports 503 until the warm-up has finished, then 200
+- A warm-up that fails, e.g. with no data to load yet, is retried every WARM_UP_RETRY_SECONDS,
+  and /healthz keeps answering 503 with its error until one succeeds
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from metrics import Counter, Gauge
+from prepare_graph_data import current_snapshot, notify_snapshot_listeners
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STARTED_AT = time.time()
+WARM_UP_RETRY_SECONDS = 30.0
+
+WARM_UP_SECONDS = Gauge(
+    "treasury_warm_up_seconds", "Time from process start until the data and derived caches were warm"
+)
+
+WARM_UP_FAILURES = Counter("treasury_warm_up_failures_total", "Warm-up attempts that failed and will be retried")
+
+_ready = threading.Event()
+_warm_up_error: Optional[str] = None
+_warm_up_thread: Optional[threading.Thread] = None
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def warm_up_error() -> Optional[str]:
+    """Why the last warm-up attempt failed, None if none has failed or one has since succeeded"""
+    return _warm_up_error
+
+
+def warm_up() -> bool:
+    """
+    - Loads the current snapshot and builds (or loads) everything derived from it
+    - Returns whether it succeeded, only then is the process ready
+    """
+    global _warm_up_error
+    try:
+        notify_snapshot_listeners(current_snapshot())
+    except Exception as e:
+        logger.error(f"Error warming up, retrying in {WARM_UP_RETRY_SECONDS:g}s: {e}")
+        WARM_UP_FAILURES.inc()
+        _warm_up_error = f"{type(e).__name__}: {e}"
+        return False
+    _warm_up_error = None
+    elapsed = time.time() - STARTED_AT
+    WARM_UP_SECONDS.set(elapsed)
+    logger.info(f"Warm {elapsed:.2f}s after start")
+    _ready.set()
+    return True
+
+
+def warm_up_until_ready() -> None:
+    while not warm_up():
+        time.sleep(WARM_UP_RETRY_SECONDS)
+
+
+def start_warm_up() -> threading.Thread:
+    """Starts the warm-up thread once per process"""
+    global _warm_up_thread
+    if _warm_up_thread is None:
+        _warm_up_thread = threading.Thread(target=warm_up_until_ready, name="warm-up", daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
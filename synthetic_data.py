@@ -0,0 +1,145 @@
+"""
+- Synthetic Treasury-format csv years and order databases, for benchmarks
+- Everything is seeded, so the same scale always produces the same files
+- A DataScale is today's data multiplied: more years of yields, extra term columns, more orders
+"""
+
+import argparse
+import csv
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+import db
+from load_csv_data import FIRST_YEAR
+from terms import MATURITY_TERMS, term_years
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SEED = 20250516
+
+# csv headers as the Treasury writes them, e.g. "1.5 Month"
+TERM_HEADERS = [term.replace("1.5 Mo", "1.5 Month") for term in MATURITY_TERMS]
+# terms the app doesn't chart, they only widen the csv the parser has to read through
+EXTRA_TERM_HEADERS = ["15 Yr", "25 Yr", "40 Yr", "50 Yr"]
+EXTRA_TERM_YEARS = [15, 25, 40, 50]
+BLANK_CELL_RATE = 0.002  # the real files have the odd missing value
+
+
+class DataScale(NamedTuple):
+    name: str
+    years: int  # csv files, starting at FIRST_YEAR; large scales run past the present
+    extra_terms: int  # how many of EXTRA_TERM_HEADERS each csv also has
+    orders: int
+
+
+# today: 1990-2025 on disk, and an order book a user could plausibly have
+SCALES: Dict[str, DataScale] = {
+    scale.name: scale
+    for scale in [
+        DataScale("1x", years=36, extra_terms=0, orders=1_000),
+        DataScale("10x", years=360, extra_terms=2, orders=10_000),
+        DataScale("100x", years=3600, extra_terms=4, orders=100_000),
+    ]
+}
+
+
+def synthetic_year_rows(year: int, extra_terms: int = 0) -> List[List[str]]:
+    """
+    - One year of business days in the Treasury's csv layout, header first, newest day first
+    - Each term follows a mean-reverting random walk around a smooth curve whose level drifts by year
+    """
+    rng = np.random.default_rng([SEED, year])
+    days = np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]")
+    days = days[np.is_busday(days)]
+    maturities = np.array(
+        [term_years(term) for term in MATURITY_TERMS] + EXTRA_TERM_YEARS[:extra_terms]
+    )
+
+    level = 450 + 300 * np.sin(year / 7) + np.cumsum(rng.normal(0, 2, len(days)))
+    slope = -150 + 100 * np.cos(year / 5) + np.cumsum(rng.normal(0, 1, len(days)))
+    shape = 1 - np.exp(-maturities / 2)
+    yields = level[:, None] + slope[:, None] * (shape[None, :] - 0.5)
+    yields += rng.normal(0, 2, yields.shape)
+    cells = np.char.mod("%.2f", np.clip(yields, 1, 2500) / 100)
+    cells[rng.random(cells.shape) < BLANK_CELL_RATE] = ""
+
+    iso_dates = np.datetime_as_string(days)
+    rows = [["Date", *TERM_HEADERS, *EXTRA_TERM_HEADERS[:extra_terms]]]
+    for iso_date, row_cells in zip(iso_dates[::-1], cells[::-1]):
+        rows.append([f"{iso_date[5:7]}/{iso_date[8:10]}/{iso_date[:4]}", *row_cells.tolist()])
+    return rows
+
+
+def write_synthetic_years(data_dir: Path, scale: DataScale) -> None:
+    """Writes {year}.csv for every year of the scale, skipping files that already exist"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for year in range(FIRST_YEAR, FIRST_YEAR + scale.years):
+        path = data_dir / f"{year}.csv"
+        if path.exists():
+            continue
+        with open(path, "w", newline="") as f:
+            csv.writer(f, quoting=csv.QUOTE_MINIMAL).writerows(
+                synthetic_year_rows(year, scale.extra_terms)
+            )
+
+
+def write_synthetic_orders(db_path: Path, orders: int) -> None:
+    """Creates an orders db of the current schema holding `orders` random orders, if it doesn't exist"""
+    if db_path.exists():
+        # one generated before a schema change is migrated, like a user's db would be
+        with sqlite3.connect(db_path) as conn:
+            db.migrate(conn)
+        return
+    rng = np.random.default_rng([SEED, orders])
+    terms = rng.choice(MATURITY_TERMS, orders)
+    cents = rng.integers(100, 10_000_000_00, orders)
+    yields = rng.integers(1, 800, orders)
+    created_at = np.sort(rng.integers(1_600_000_000, 1_750_000_000, orders))
+    db_rows = [
+        (str(term), int(cent), int(yield_), int(epoch))
+        for term, cent, yield_, epoch in zip(terms, cents, yields, created_at)
+    ]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL").fetchall()
+        db.migrate(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        with db.bulk_insert_orders_summary(conn):
+            conn.executemany(
+                f"INSERT INTO orders ({db.ORDER_COLUMNS}) VALUES (?, ?, ?, ?)", db_rows
+            )
+
+
+def scale_paths(root: Path, scale: DataScale) -> Dict[str, Path]:
+    scale_root = root / scale.name
+    return {
+        "data_dir": scale_root / "data",
+        "cache_dir": scale_root / "cache",
+        "db_path": scale_root / "orders.db",
+    }
+
+
+def generate(root: Path, scale: DataScale) -> Dict[str, Path]:
+    paths = scale_paths(root, scale)
+    logger.info(f"Generating {scale} under {root / scale.name}")
+    write_synthetic_years(paths["data_dir"], scale)
+    write_synthetic_orders(paths["db_path"], scale.orders)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic yield csvs and order dbs")
+    parser.add_argument("--root", type=Path, default=Path("./benchmark_data"))
+    parser.add_argument("--scale", choices=list(SCALES), nargs="+", default=["10x"])
+    args = parser.parse_args()
+    for name in args.scale:
+        generate(args.root, SCALES[name])
+
+
+if __name__ == "__main__":
+    logging.basicConfig()
+    main()
@@ -21,3 +21,32 @@ MATURITY_TERMS = [
     "20 Yr",
     "30 Yr",
 ]
+
+# How long each term lasts
+# bills (up to 1 Yr) are issued in weeks, e.g. "1.5 Mo" is the 6-week bill
+TERM_WEEKS = {
+    "1 Mo": 4,
+    "1.5 Mo": 6,
+    "2 Mo": 8,
+    "3 Mo": 13,
+    "4 Mo": 17,
+    "6 Mo": 26,
+    "1 Yr": 52,
+}
+# notes and bonds mature on the same calendar day, this many years later
+TERM_YEARS = {
+    "2 Yr": 2,
+    "3 Yr": 3,
+    "5 Yr": 5,
+    "7 Yr": 7,
+    "10 Yr": 10,
+    "20 Yr": 20,
+    "30 Yr": 30,
+}
+
+
+def term_years(term: Term) -> float:
+    """A term's time to maturity in years, e.g. "6 Mo" -> 0.5, "10 Yr" -> 10.0"""
+    if term in TERM_WEEKS:
+        return TERM_WEEKS[term] / 52
+    return float(TERM_YEARS[term])
@@ -0,0 +1,50 @@
+import unittest
+
+import benchmark
+import synthetic_data
+from yield_cache import parse_year_csv
+
+
+class TestSyntheticData(unittest.TestCase):
+
+    def test_synthetic_year_parses_like_a_treasury_csv(self):
+        rows = synthetic_data.synthetic_year_rows(2024, extra_terms=2)
+        self.assertEqual(rows[0][-2:], ["15 Yr", "25 Yr"])
+        self.assertEqual(rows[1][0], "12/31/2024")
+        block = parse_year_csv(rows)
+        self.assertEqual(len(block), 262)  # weekdays in 2024
+        self.assertGreater(block.valid.mean(), 0.99)
+        self.assertTrue(((block.yields[block.valid] > 0) & (block.yields[block.valid] <= 2500)).all())
+
+    def test_synthetic_year_is_reproducible(self):
+        self.assertEqual(
+            synthetic_data.synthetic_year_rows(1990), synthetic_data.synthetic_year_rows(1990)
+        )
+        self.assertNotEqual(
+            synthetic_data.synthetic_year_rows(1990)[1:], synthetic_data.synthetic_year_rows(1991)[1:]
+        )
+
+
+class TestFindRegressions(unittest.TestCase):
+
+    BASELINE = {"1x": {"read_orders": {"seconds": 0.1, "peak_bytes": 1000, "payload_bytes": 500}}}
+
+    def test_within_tolerance_is_not_a_regression(self):
+        results = {"1x": {"read_orders": benchmark.Measurement(0.19, 1050, 500)}}
+        self.assertEqual(benchmark.find_regressions(results, self.BASELINE), [])
+
+    def test_growth_past_tolerance_is_reported(self):
+        results = {
+            "1x": {
+                "read_orders": benchmark.Measurement(0.25, 1000, 600),
+                "not_in_baseline": benchmark.Measurement(9, 9, 9),
+            }
+        }
+        regressions = benchmark.find_regressions(results, self.BASELINE)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("1x read_orders: seconds"))
+        self.assertIn("payload_bytes", regressions[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import bulk_orders
+import db
+from data_model import Order
+
+ORDERS = [
+    Order("1 Yr", 100_00, 413, "2025-05-16 10:00:00"),
+    Order("30 Yr", 2_500_00, None, "2025-05-16 10:00:01"),
+    Order("1.5 Mo", 1, 436, "2025-05-17 09:00:00"),
+]
+
+
+class TestBulkOrders(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+        patcher = patch("db.DB_NAME", str(self.dir / "orders.db"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        db.init_db()
+
+    def write_csv(self, text):
+        path = self.dir / "import.csv"
+        path.write_text(text)
+        return path
+
+    def test_round_trip(self):
+        with sqlite3.connect(db.DB_NAME) as conn:
+            db.insert_orders(conn, ORDERS)
+        paths = [self.dir / "orders.csv", self.dir / "orders.tcol"]
+        for path in paths:
+            self.assertEqual(bulk_orders.export_orders(path, chunk_size=2), 3)
+        for path in paths:
+            self.assertEqual(bulk_orders.import_orders(path, chunk_size=2), 3)
+        self.assertEqual(sorted(db.read_orders(), key=str), sorted(ORDERS * 3, key=str))
+        self.assertEqual(db.verify_orders_summary(), [])
+        self.assertEqual(sum(exposure.orders for exposure in db.read_orders_summary()), 9)
+
+    def test_csv_export_columns(self):
+        with sqlite3.connect(db.DB_NAME) as conn:
+            db.insert_orders(conn, ORDERS[1:2])
+        path = self.dir / "orders.csv"
+        bulk_orders.export_orders(path)
+        self.assertEqual(
+            path.read_text().splitlines(),
+            ["id,term,amount_cents,yield_basis_points,timestamp", "1,30 Yr,250000,,2025-05-16 10:00:01"],
+        )
+
+    def test_invalid_row_rolls_back_everything(self):
+        rows = ["term,amount_cents,yield_basis_points,timestamp"]
+        rows += ["1 Yr,100,413,2025-05-16 10:00:00"] * 5
+        rows += ["9 Yr,100,413,2025-05-16 10:00:00"]
+        with self.assertRaises(bulk_orders.OrderImportError) as error:
+            bulk_orders.import_orders(self.write_csv("\n".join(rows)), chunk_size=2)
+        self.assertEqual(error.exception.row_number, 7)
+        self.assertEqual(db.read_orders(), [])
+        # the insert trigger dropped for the import is back, and keeps the summary current
+        with sqlite3.connect(db.DB_NAME) as conn:
+            db.insert_orders(conn, ORDERS)
+        self.assertEqual(db.verify_orders_summary(), [])
+        self.assertEqual(len(db.read_orders_summary()), 3)
+
+    def test_bad_values_are_reported(self):
+        for row in (
+            "1 Yr,abc,413,2025-05-16 10:00:00",
+            "1 Yr,100,413,yesterday",
+            "1 Yr,0,413,2025-05-16 10:00:00",
+            "1 Yr,100,413,2025-05-16",
+            "1 Yr,100,413,2025-05-16 10:00:00+05:00",
+            "1 Yr,100,413,2025-05-16 10:00:00.5",
+            "1 Yr,1000000000000000,413,2025-05-16 10:00:00",
+            f"1 Yr,{10**20},413,2025-05-16 10:00:00",
+            f"1 Yr,100,{10**20},2025-05-16 10:00:00",
+        ):
+            with self.assertRaises(bulk_orders.OrderImportError, msg=row) as error:
+                bulk_orders.import_orders(self.write_csv(f"term,amount_cents,yield_basis_points,timestamp\n{row}"))
+            self.assertEqual(error.exception.row_number, 2)
+        self.assertEqual(db.read_orders(), [])
+
+    def test_missing_columns(self):
+        with self.assertRaises(bulk_orders.OrderImportError):
+            bulk_orders.import_orders(self.write_csv("term,amount_cents\n1 Yr,100"))
+
+
+if __name__ == "__main__":
+    unittest.main()
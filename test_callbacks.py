@@ -0,0 +1,116 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from dash import Dash
+from dash.exceptions import PreventUpdate
+
+import layout
+from callbacks import ORDER_PENDING_MESSAGE, register_callbacks
+from layout import DAILY, MOVING_AVERAGE_OFF
+from terms import MATURITY_TERMS
+from yield_cache import parse_year_csv
+
+CSV_ROWS = [["Date", "1 Mo", "10 Yr"]] + [
+    [f"05/{day:02d}/2025", "4.37", f"{4 + day / 100:.2f}"] for day in range(30, 0, -1)
+]
+TEN_YEAR = MATURITY_TERMS.index("10 Yr")
+
+
+def registered_callback(app: Dash, name: str):
+    """The function behind a server-side callback, without Dash's request handling around it"""
+    for callback in app.callback_map.values():
+        if "callback" in callback and callback["callback"].__name__ == name:
+            return callback["callback"].__wrapped__
+    raise KeyError(name)
+
+
+class TestClientsideSlider(unittest.TestCase):
+
+    def setUp(self):
+        history = parse_year_csv(CSV_ROWS)
+        for target in ("callbacks.prepare_yield_history", "layout.prepare_yield_history"):
+            patcher = patch(target, return_value=history)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("callbacks.CLIENTSIDE_SLIDER", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = Dash(__name__)
+        register_callbacks(app)
+        self.refine = registered_callback(app, "refine_historical_curve_graph")
+
+    def test_overview_has_what_render_curve_reads(self):
+        overview = json.loads(json.dumps(layout.create_historical_overview()))
+        self.assertEqual(set(overview), {"terms", "series", "layouts", "template"})
+        self.assertEqual(overview["terms"], MATURITY_TERMS)
+        for term in overview["terms"]:
+            series = overview["series"][term]
+            self.assertEqual(len(series["days"]), len(series["yields"]))
+            self.assertEqual(overview["layouts"][term]["uirevision"], term)
+        self.assertIn("layout", overview["template"])
+        # renderCurve turns days since 1970-01-01 into dates and basis points into percent
+        ten_year = overview["series"]["10 Yr"]
+        self.assertEqual(np.datetime64(ten_year["days"][0], "D"), np.datetime64("2025-05-01"))
+        self.assertEqual(ten_year["yields"][0], 401)
+
+    def test_refine_ignores_events_that_dont_zoom_the_daily_view(self):
+        for relayout_data, resolution in (
+            (None, DAILY),
+            ({"autosize": True}, DAILY),
+            ({"yaxis.range[0]": 4, "yaxis.range[1]": 5}, DAILY),
+            ({"xaxis.range[0]": "2025-05-10", "xaxis.range[1]": "2025-05-20"}, "weekly"),
+        ):
+            with self.assertRaises(PreventUpdate):
+                self.refine(relayout_data, TEN_YEAR, resolution, MOVING_AVERAGE_OFF)
+
+    def test_refine_zooms_into_the_selected_range(self):
+        figure = self.refine(
+            {"xaxis.range[0]": "2025-05-10 06:00:00", "xaxis.range[1]": "2025-05-20"},
+            TEN_YEAR,
+            DAILY,
+            MOVING_AVERAGE_OFF,
+        )
+        dates = np.asarray(figure.data[0].x, dtype="datetime64[D]")
+        # every day in the range, plus one past each edge so the line reaches the axis
+        self.assertEqual(dates[0], np.datetime64("2025-05-09"))
+        self.assertEqual(dates[-1], np.datetime64("2025-05-21"))
+        self.assertEqual(len(dates), 13)
+        self.assertIn("10 Yr", figure.layout.title.text)
+
+        zoomed_out = self.refine({"xaxis.autorange": True}, TEN_YEAR, DAILY, MOVING_AVERAGE_OFF)
+        self.assertEqual(len(zoomed_out.data[0].x), 30)
+
+
+
+class TestPlaceOrder(unittest.TestCase):
+    YIELD_CURVE = {"date": "05/30/2025", "terms": ["1 Mo", "10 Yr"], "yields": [437, 430]}
+
+    def setUp(self):
+        patcher = patch("callbacks.SERVER_SIDE_ORDERS_TABLE", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        app = Dash(__name__)
+        register_callbacks(app)
+        self.place_order = registered_callback(app, "place_order")
+
+    @patch("callbacks.read_exposure_table_rows", return_value=[])
+    @patch("callbacks.order_book_summary", return_value={"principal_cents": 0, "value_cents": 0, "payoff_cents": 0})
+    @patch("callbacks.write_order", return_value=True)
+    def test_written_order_joins_the_table(self, write_order, *_):
+        rows, valuation, _ = self.place_order(1, "10 Yr", 55.01, [], self.YIELD_CURVE)
+        self.assertEqual(write_order.call_args.args[0].amount_cents, 5501)
+        self.assertEqual(len(rows), 1)
+        self.assertIn("Principal", valuation)
+
+    @patch("callbacks.write_order", side_effect=TimeoutError)
+    def test_slow_write_is_reported_as_pending(self, write_order):
+        # the order is still queued and will be written, so it is neither shown as failed nor placed again
+        rows, valuation, _ = self.place_order(1, "10 Yr", 55.01, [], self.YIELD_CURVE)
+        self.assertEqual(write_order.call_count, 1)
+        self.assertEqual(rows, [])
+        self.assertEqual(valuation, ORDER_PENDING_MESSAGE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+import curve_fit as cf
+import yield_cache as yc
+from callbacks import create_new_order
+from data_model import YieldCurve, YieldHistory
+
+CSV_ROWS = [
+    ["Date", "3 Mo", "1 Yr", "2 Yr", "5 Yr", "10 Yr", "30 Yr"],
+    ["05/16/2025", "4.37", "4.13", "3.98", "4.06", "4.43", "4.89"],
+    ["05/15/2025", "4.37", "4.10", "", "4.06", "4.45", "4.90"],
+]
+
+
+class TestCurveFit(unittest.TestCase):
+
+    def test_pchip_passes_through_knots_and_stays_monotone(self):
+        x = np.array([0.25, 1, 2, 5, 10, 30])
+        y = np.array([[100.0, 200, 210, 500, 505, 900]])
+        slopes = cf.pchip_slopes(x, y)
+        self.assertTrue(np.allclose(cf.hermite_eval(x, y, slopes, x), y))
+        dense = cf.hermite_eval(x, y, slopes, np.linspace(0.25, 30, 1000))[0]
+        self.assertTrue((np.diff(dense) >= -1e-9).all())
+
+    def test_nss_recovers_its_own_curve(self):
+        maturities = np.array([0.25, 0.5, 1, 2, 3, 5, 7, 10, 20, 30])
+        params = np.array([[450.0, -100, 80, -50, 1.0, 8.0]])
+        y = cf.nss_eval(params, maturities)
+        fitted = cf.fit_nss(maturities, y)
+        self.assertTrue(np.allclose(cf.nss_eval(fitted, maturities), y, atol=1))
+
+    def test_yield_for_term_quotes_or_interpolates(self):
+        fits = cf.CurveFits.fit(yc.parse_year_csv(CSV_ROWS))
+        self.assertEqual(fits.yield_for_term(1, "2 Yr"), 398)
+        # 2 Yr was not quoted on the first day, it lies between the 1 Yr and 5 Yr quotes
+        self.assertTrue(410 >= fits.yield_for_term(0, "2 Yr") >= 406)
+        self.assertTrue(4.43 * 100 <= fits.yield_for_term(1, "20 Yr") <= 4.89 * 100)
+
+    def test_fits_are_cached_per_data_version(self):
+        history = yc.parse_year_csv(CSV_ROWS)
+        with tempfile.TemporaryDirectory() as tmp, patch("curve_fit.CACHE_DIR", Path(tmp)):
+            cf.prepare_curve_fits.cache_clear()
+            cf.prepare_curve_fits(history)
+            cf.prepare_curve_fits.cache_clear()
+            with patch.object(cf.CurveFits, "fit") as fit:
+                loaded = cf.prepare_curve_fits(history)
+            fit.assert_not_called()
+            cf.prepare_curve_fits.cache_clear()
+        self.assertEqual(loaded.yield_for_term(1, "20 Yr"), cf.CurveFits.fit(history).yield_for_term(1, "20 Yr"))
+
+    def test_new_order_for_unquoted_term_is_interpolated(self):
+        yield_curve = {"date": "05/16/2025", "terms": ["1 Yr", "5 Yr"], "yields": [400, 400]}
+        with patch("curve_fit.prepare_yield_history", return_value=YieldHistory.empty()):
+            self.assertEqual(create_new_order(yield_curve, "2 Yr", 10).yield_basis_points, 400)
+        self.assertEqual(create_new_order(yield_curve, "5 Yr", 10).yield_basis_points, 400)
+
+    def test_curves_of_the_current_history_are_priced_off_its_fits(self):
+        history = yc.parse_year_csv(CSV_ROWS)
+        fits = cf.CurveFits.fit(history)
+        with patch("curve_fit.prepare_yield_history", return_value=history), patch(
+            "curve_fit.prepare_curve_fits", return_value=fits
+        ), patch.object(cf.CurveFits, "fit") as fit:
+            self.assertEqual(cf.fitted_curve(history.yield_curve_at(0)), (fits, 0))
+            self.assertEqual(cf.price_term(history.yield_curve_at(0), "2 Yr"), fits.yield_for_term(0, "2 Yr"))
+        fit.assert_not_called()
+
+    def test_curves_from_another_version_are_fit_on_their_own(self):
+        history = yc.parse_year_csv(CSV_ROWS)
+        stale = YieldCurve("05/16/2025", ["1 Yr", "5 Yr"], [400, 500])
+        self.assertIsNone(history.row_of_yield_curve(stale))
+        with patch("curve_fit.prepare_yield_history", return_value=history):
+            fits, row = cf.fitted_curve(stale)
+        self.assertEqual(fits.yield_for_term(row, "5 Yr"), 500)
+        self.assertTrue(400 < fits.yield_for_term(row, "2 Yr") < 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
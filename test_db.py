@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import db
+from data_model import Order, TermExposure
+
+
+class TestDb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_name = os.path.join(self.tmp.name, "orders.db")
+        patcher = patch("db.DB_NAME", self.db_name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def insert(self, orders):
+        with sqlite3.connect(self.db_name) as conn:
+            db.insert_orders(conn, orders)
+
+    def test_migrates_version_1_tables(self):
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute(
+                "CREATE TABLE orders (term TEXT, cents INTEGER, yield_basis_points INTEGER, timestamp TEXT)"
+            )
+            conn.executemany(
+                "INSERT INTO orders VALUES (?, ?, ?, ?)",
+                [
+                    ("1 Yr", 100, 413, "2025-05-16 10:00:00"),
+                    ("2 Yr", 200, None, "2025-05-15 09:30:00"),
+                ],
+            )
+        db.init_db()
+        self.assertEqual(
+            db.read_orders(),
+            [
+                Order("1 Yr", 100, 413, "2025-05-16 10:00:00"),
+                Order("2 Yr", 200, None, "2025-05-15 09:30:00"),
+            ],
+        )
+        with sqlite3.connect(self.db_name) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], db.SCHEMA_VERSION)
+            self.assertEqual(
+                conn.execute("SELECT id, term FROM orders ORDER BY id").fetchall(),
+                [(1, "2 Yr"), (2, "1 Yr")],
+            )
+        self.assertEqual(db.verify_orders_summary(), [])
+        self.assertEqual(len(db.read_orders_summary()), 2)
+
+    def create_v1_table(self, rows):
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute(
+                "CREATE TABLE orders (term TEXT, cents INTEGER, yield_basis_points INTEGER, timestamp TEXT)"
+            )
+            conn.executemany("INSERT INTO orders VALUES (?, ?, ?, ?)", rows)
+
+    def test_v1_rows_missing_required_values_are_set_aside(self):
+        self.create_v1_table(
+            [
+                ("1 Yr", 100, 413, "2025-05-16 10:00:00"),
+                ("2 Yr", None, 400, "2025-05-16 10:00:01"),
+                ("3 Yr", 300, 400, "not a time"),
+            ]
+        )
+        db.init_db()
+        self.assertEqual(db.read_orders(), [Order("1 Yr", 100, 413, "2025-05-16 10:00:00")])
+        with sqlite3.connect(self.db_name) as conn:
+            invalid = conn.execute(f"SELECT term FROM {db.V1_INVALID_TABLE} ORDER BY term").fetchall()
+        self.assertEqual(invalid, [("2 Yr",), ("3 Yr",)])
+
+    def test_failed_migration_changes_nothing(self):
+        self.create_v1_table([("1 Yr", 100, 413, "2025-05-16 10:00:00")])
+        with patch("db.rebuild_orders_summary", side_effect=sqlite3.OperationalError("disk I/O error")):
+            with self.assertRaises(sqlite3.OperationalError):
+                db.init_db()
+        with sqlite3.connect(self.db_name) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 0)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self.assertEqual(tables, {"orders"})
+            self.assertEqual(
+                conn.execute("SELECT * FROM orders").fetchall(), [("1 Yr", 100, 413, "2025-05-16 10:00:00")]
+            )
+        # and the next start migrates it properly
+        db.init_db()
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_init_db_is_idempotent(self):
+        db.init_db()
+        self.insert([Order("1 Yr", 100, 413, "2025-05-16 10:00:00")])
+        db.init_db()
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_idempotency_key_inserts_once(self):
+        db.init_db()
+        order = Order("1 Yr", 100, 413, "2025-05-16 10:00:00", idempotency_key="k")
+        with sqlite3.connect(self.db_name) as conn:
+            other = Order("2 Yr", 1, 400, "2025-05-16 10:00:01")
+            self.assertEqual(db.insert_orders(conn, [order, other]), [True, True])
+            self.assertEqual(db.insert_orders(conn, [order]), [False])
+        self.assertEqual(len(db.read_orders()), 2)
+        self.assertEqual(db.read_orders_by_idempotency_key(["k", "missing"]), {"k": order})
+
+    def test_orders_summary_follows_every_write(self):
+        db.init_db()
+        self.insert(
+            [
+                Order("1 Yr", 100, 400, "2025-05-16 10:00:00"),
+                Order("1 Yr", 300, 500, "2025-05-16 10:00:01"),
+                Order("2 Yr", 50, None, "2025-05-16 10:00:02", idempotency_key="k"),
+                Order("2 Yr", 50, None, "2025-05-16 10:00:03", idempotency_key="k"),  # not inserted
+            ]
+        )
+        summary = {exposure.term: exposure for exposure in db.read_orders_summary()}
+        self.assertEqual(summary["1 Yr"], TermExposure("1 Yr", 2, 400, 400, 190_000))
+        self.assertEqual(summary["1 Yr"].average_yield_basis_points, 475)
+        self.assertEqual(summary["2 Yr"], TermExposure("2 Yr", 1, 50, 0, 0))
+        self.assertIsNone(summary["2 Yr"].average_yield_basis_points)
+
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("UPDATE orders SET term = '2 Yr' WHERE cents = 100")
+            conn.execute("DELETE FROM orders WHERE cents = 300")
+        self.assertEqual(db.read_orders_summary(), [TermExposure("2 Yr", 2, 150, 100, 40_000)])
+        self.assertEqual(db.verify_orders_summary(), [])
+
+    def test_verify_and_rebuild_orders_summary(self):
+        db.init_db()
+        self.insert([Order("1 Yr", 100, 400, "2025-05-16 10:00:00")])
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("UPDATE orders_summary SET cents = 1")
+        self.assertEqual(len(db.verify_orders_summary()), 1)
+        with sqlite3.connect(self.db_name) as conn:
+            db.rebuild_orders_summary(conn)
+        self.assertEqual(db.verify_orders_summary(), [])
+
+    def test_keyset_pages_match_full_sort(self):
+        db.init_db()
+        # same second for every order, so only the id tells them apart
+        orders = [Order(term, cents, 400 + cents % 3, "2025-05-16 10:00:00")
+                  for cents in range(10) for term in ("1 Yr", "2 Yr")]
+        self.insert(orders)
+        for column, key in (("amount_cents", lambda o: o.amount_cents), ("term", lambda o: o.term)):
+            for descending in (True, False):
+                seen, cursor, has_more = [], None, True
+                while has_more:
+                    page = db.read_orders_page(3, column, descending, after=cursor)
+                    seen.extend(page.orders)
+                    cursor, has_more = page.cursor, page.has_more
+                self.assertEqual(len(seen), len(orders))
+                self.assertEqual([key(o) for o in seen], sorted(map(key, orders), reverse=descending))
+
+    def test_offset_page_without_cursor(self):
+        db.init_db()
+        self.insert([Order("1 Yr", cents, 413, "2025-05-16 10:00:00") for cents in range(5)])
+        page = db.read_orders_page(2, "amount_cents", descending=False, offset=2)
+        self.assertEqual([o.amount_cents for o in page.orders], [2, 3])
+        self.assertTrue(page.has_more)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import gzip
+import json
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+import plotly.graph_objs as go
+
+from figure_cache import RETIRED_VERSIONS_KEPT, CachedFigure, FigureCache
+
+
+def make_figure():
+    dates = np.array(["2025-05-15", "2025-05-16"], dtype="datetime64[D]")
+    return go.Figure(go.Scatter(x=dates, y=np.array([4.45, 4.43])))
+
+
+class TestFigureCache(unittest.TestCase):
+
+    def test_cached_figure_is_plain_json(self):
+        cached = CachedFigure.from_figure(make_figure())
+        self.assertEqual(json.loads(cached.json), cached.figure)
+        self.assertEqual(gzip.decompress(cached.gzipped), cached.json)
+        self.assertEqual(cached.figure["data"][0]["type"], "scatter")
+
+    def test_builds_once_per_key_and_version(self):
+        cache = FigureCache()
+        build = MagicMock(side_effect=make_figure)
+        first = cache.get(("historical", "10 Yr"), "v1", build)
+        self.assertIs(cache.get(("historical", "10 Yr"), "v1", build), first)
+        cache.get(("historical", "30 Yr"), "v1", build)
+        self.assertEqual(build.call_count, 2)
+
+    def test_new_version_drops_old_figures(self):
+        cache = FigureCache()
+        build = MagicMock(side_effect=make_figure)
+        cache.get("yield-curve", "v1", build)
+        cache.get("yield-curve", "v2", build)
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_older_version_never_replaces_the_current_one(self):
+        cache = FigureCache()
+        build = MagicMock(side_effect=make_figure)
+        cache.get("yield-curve", "v1", build)
+        current = cache.get("yield-curve", "v2", build)
+        # e.g. a request that read v1 just before the refresh swapped in v2
+        cache.get("yield-curve", "v1", build)
+        cache.preload("v1", {("historical",): current})
+        self.assertIs(cache.get("yield-curve", "v2", build), current)
+        self.assertEqual(build.call_count, 3)
+        self.assertEqual(cache.entries("v2"), {"yield-curve": current})
+
+
+    def test_republished_version_is_cached_again(self):
+        cache = FigureCache()
+        build = MagicMock(side_effect=make_figure)
+        cache.get("yield-curve", "v1", build)
+        cache.get("yield-curve", "v2", build)
+        # e.g. a rollback to data identical to v1's
+        cache.publish("v1")
+        rolled_back = cache.get("yield-curve", "v1", build)
+        self.assertIs(cache.get("yield-curve", "v1", build), rolled_back)
+        self.assertEqual(build.call_count, 3)
+        self.assertEqual(cache.entries("v1"), {"yield-curve": rolled_back})
+
+    def test_only_the_last_few_versions_stay_retired(self):
+        cache = FigureCache()
+        build = MagicMock(side_effect=make_figure)
+        for version in range(RETIRED_VERSIONS_KEPT + 2):
+            cache.get("yield-curve", f"v{version}", build)
+        cache.get("yield-curve", "v0", build)
+        self.assertEqual(len(cache.entries("v0")), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import ingest
+
+CSV_TEXT = (
+    'Date,"1 Mo","1.5 Month","4 Mo","10 Yr","15 Yr"\r\n'
+    "05/16/2025,4.37,4.36,4.42,4.43,4.6\r\n"
+    "05/15/2025,,4.3,,4.45,\r\n"
+    "05/14/2025,4.38,4.35,4.44,4.47,4.70"
+)
+
+
+class TestIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "2025.csv"
+        self.path.write_text(CSV_TEXT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normalize_term(self):
+        self.assertEqual(ingest.normalize_term("1.5 Month"), "1.5 Mo")
+        self.assertEqual(ingest.normalize_term(" 2 Months "), "2 Mo")
+        self.assertEqual(ingest.normalize_term("30 Year"), "30 Yr")
+        self.assertIsNone(ingest.normalize_term("15 Yr"))
+
+    def test_column_mapping_is_cached_per_schema(self):
+        header = ("Date", "1 Mo", "15 Yr", "10 Yr")
+        mapping = ingest.column_mapping(header)
+        self.assertIs(ingest.column_mapping(header), mapping)
+        self.assertEqual(mapping.source.tolist(), [0, 2])
+        self.assertEqual(mapping.unknown, ("15 Yr",))
+
+    def test_parse_basis_points_is_fixed_point(self):
+        basis_points, present = ingest.parse_basis_points(
+            ["05/15/2025,,4.3,0.07,", "05/14/2025,5,,,4.47"], 4
+        )
+        self.assertEqual(basis_points.tolist(), [[0, 430, 7, 0], [500, 0, 0, 447]])
+        self.assertEqual(present.tolist(), [[False, True, True, False], [True, False, False, True]])
+
+    def test_ingest_year_csv(self):
+        block = ingest.ingest_year_csv(self.path)
+        self.assertEqual([str(date) for date in block.dates], ["2025-05-14", "2025-05-15", "2025-05-16"])
+        self.assertEqual(block.term_yields("1.5 Mo").tolist(), [435, 430, 436])
+        self.assertEqual(block.term_valid("4 Mo").tolist(), [True, False, True])
+        self.assertFalse(block.term_valid("30 Yr").any())
+
+    def test_chunks_fill_the_preallocated_arrays_in_order(self):
+        with patch("ingest.CHUNK_ROWS", 2):
+            block = ingest.ingest_year_csv(self.path)
+        self.assertEqual(block.term_yields("10 Yr").tolist(), [447, 445, 443])
+
+    def test_count_data_rows_without_trailing_newline(self):
+        self.assertEqual(ingest.count_data_rows(self.path), 3)
+
+    def test_malformed_row_is_reported(self):
+        self.path.write_text('Date,"1 Mo","10 Yr"\n05/16/2025,4.37\n')
+        with self.assertRaises(ValueError):
+            ingest.ingest_year_csv(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -66,7 +66,7 @@ class TestLoadCSVData(unittest.TestCase):
     def test_get_most_recent_year_with_csv_downloaded(self, _):
         self.assertEqual(lcd.get_most_recent_year_with_csv_downloaded(), 2025)
 
-    @patch("load_csv_data.read_downloaded_csv", return_value=[["Date"], ["05/16/2025"]])
+    @patch("load_csv_data.read_newest_csv_date", return_value="05/16/2025")
     def test_is_csv_row_present_for_day(self, _):
         self.assertTrue(
             lcd.is_csv_row_present_for_day(datetime(2025, 5, 16), 2025)
@@ -80,33 +80,6 @@ class TestLoadCSVData(unittest.TestCase):
     def test_csv_downloaded_for_year_false(self, _):
         self.assertFalse(lcd.csv_downloaded_for_year(2025))
 
-    @patch("load_csv_data.is_csv_row_present_for_day", return_value=False)
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("load_csv_data.download_csv", return_value="Date,1 Mo\n05/16/2025,4.37")
-    @patch("os.listdir", return_value=["2025.csv"])
-    def test_refresh_data_downloads_if_missing(
-        self, mock_listdir, mock_download, mock_open, _
-    ):
-        with patch("load_csv_data.datetime") as mock_datetime:
-            mock_datetime.now.return_value = datetime(2025, 5, 17)
-            result = lcd.refresh_data()
-            self.assertEqual(result, 2025)
-            mock_open.assert_called_once()
-
-    @patch("load_csv_data.is_csv_row_present_for_day", return_value=False)
-    @patch("builtins.open", new_callable=mock_open)
-    @patch("load_csv_data.download_csv", side_effect=["", "Date,1 Mo\n01/01/2025,4.00"])
-    @patch("os.listdir", return_value=["2025.csv"])
-    def test_refresh_data_falls_back_to_previous_year(self, mock_listdir, mock_download_csv, mock_open,
-                                                      mock_is_row_present):
-        with patch("load_csv_data.datetime") as mock_datetime:
-            mock_datetime.now.return_value = datetime(2026, 1, 1)
-            result = lcd.refresh_data()
-
-            self.assertEqual(result, 2025)
-            self.assertEqual(mock_download_csv.call_args_list[0][0][0], 2026)
-            self.assertEqual(mock_download_csv.call_args_list[1][0][0], 2025)
-
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+import lod
+from data_model import HistoricalCurve
+
+
+def make_curve(n):
+    dates = np.datetime64("1990-01-01") + np.arange(n)
+    yields = (np.sin(np.arange(n) / 50) * 300 + 400).astype(np.int16)
+    return HistoricalCurve(dates, yields)
+
+
+class TestLod(unittest.TestCase):
+
+    def test_min_max_envelope_keeps_extremes(self):
+        yields = np.array([5, 1, 9, 5, 5, 5, 5, 2, 3])
+        indices = lod.min_max_envelope(yields, 4)
+        self.assertEqual(indices.tolist(), [1, 2, 4, 7, 8])
+
+    def test_overview_fits_max_points(self):
+        pyramid = lod.LodPyramid(make_curve(10_000), max_points=500)
+        overview = pyramid.view()
+        self.assertLessEqual(len(overview.dates), 500)
+        self.assertEqual(overview.yields.max(), pyramid.full.yields.max())
+        self.assertEqual(overview.yields.min(), pyramid.full.yields.min())
+
+    def test_zoomed_view_refines_to_full_resolution(self):
+        curve = make_curve(10_000)
+        pyramid = lod.LodPyramid(curve, max_points=500)
+        start, end = curve.dates[1000], curve.dates[1199]
+        view = pyramid.view((start, end))
+        # 200 visible days plus one point past each edge
+        self.assertEqual(len(view.dates), 202)
+        self.assertEqual(view.dates[1], start)
+        self.assertEqual(view.dates[-2], end)
+
+    def test_relayout_x_range(self):
+        self.assertIsNone(lod.relayout_x_range({"autosize": True}))
+        self.assertEqual(lod.relayout_x_range({"xaxis.autorange": True}), (None, None))
+        self.assertEqual(
+            lod.relayout_x_range(
+                {"xaxis.range[0]": "2008-03-14 05:12:33.12", "xaxis.range[1]": "2009-01-02"}
+            ),
+            (np.datetime64("2008-03-14"), np.datetime64("2009-01-02")),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
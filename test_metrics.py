@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from functools import lru_cache
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Flask, Response
+
+import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram("test_seconds", "Test", ["route"], buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, route="/")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{route="/",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{route="/",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="/",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{route="/"} 3', lines)
+
+    def test_metric_needs_its_samples(self):
+        class Unfinished(metrics.Metric):
+            kind = "counter"
+
+        with self.assertRaises(TypeError):
+            Unfinished("test_unfinished_total", "Test")
+        self.assertNotIn("test_unfinished_total", metrics.render_metrics())
+
+    def test_label_values_are_escaped(self):
+        counter = metrics.Counter("test_total", "Test", ["output"])
+        counter.inc(output='a"b')
+        self.assertEqual(counter.samples(), ['test_total{output="a\\"b"} 1'])
+
+    def test_count_cache_counts_hits_and_misses_across_clears(self):
+        @metrics.count_cache("test_cache")
+        @lru_cache(maxsize=1)
+        def square(x):
+            return x * x
+
+        square(2)
+        square(2)
+        square.cache_clear()
+        square(2)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="test_cache", result="hit"), 1)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(cache="test_cache", result="miss"), 2)
+
+    def test_instrumented_server_times_dash_callbacks(self):
+        server = Flask(__name__)
+        metrics.instrument_server(server)
+
+        @server.route(metrics.DASH_CALLBACK_PATH, methods=["POST"])
+        def callback():
+            return "x" * 1000
+
+        server.test_client().post(metrics.DASH_CALLBACK_PATH, json={"output": "table.data"})
+        self.assertEqual(metrics.CALLBACK_SECONDS.count(callback="table.data"), 1)
+        self.assertIn(
+            'treasury_dash_callback_response_bytes_sum{callback="table.data"} 1000',
+            metrics.render_metrics(),
+        )
+
+    def test_streamed_responses_are_sized_and_timed_once_sent(self):
+        server = Flask(__name__)
+        metrics.instrument_server(server)
+
+        @server.route("/test-stream")
+        def stream():
+            def generate():
+                for _ in range(3):
+                    time.sleep(0.05)
+                    yield "x" * 100
+            return Response(generate())
+
+        client = server.test_client()
+        client.get("/test-stream", buffered=True)
+        self.assertEqual(metrics.HTTP_RESPONSE_BYTES.count(route="/test-stream"), 1)
+        lines = metrics.render_metrics().splitlines()
+        self.assertIn('treasury_http_response_bytes_sum{route="/test-stream"} 300', lines)
+        seconds_sum = 'treasury_http_request_seconds_sum{route="/test-stream",status="200"}'
+        seconds = next(line for line in lines if line.startswith(seconds_sum))
+        self.assertGreaterEqual(float(seconds.split()[-1]), 0.15)  # to the last chunk, not just the headers
+
+        # a body the client stopped reading is timed, but has no size to report
+        response = client.get("/test-stream")
+        next(response.response)
+        response.close()
+        self.assertEqual(metrics.HTTP_REQUEST_SECONDS.count(route="/test-stream", status="200"), 2)
+        self.assertEqual(metrics.HTTP_RESPONSE_BYTES.count(route="/test-stream"), 1)
+
+    def test_shared_metrics_add_up_every_worker(self):
+        counter = metrics.Counter("test_workers_total", "Test", ["route"])
+        gauge = metrics.Gauge("test_workers_bytes", "Test")
+        histogram = metrics.Histogram("test_workers_seconds", "Test", buckets=(1,))
+        counter.inc(2, route="/")
+        gauge.set(10)
+        histogram.observe(0.5)
+        other_worker = {
+            "test_workers_total": [[["/"], 3]],
+            "test_workers_bytes": [[[], 20]],
+            "test_workers_seconds": [[[], [[1, 1], 2.5]]],
+        }
+        with tempfile.TemporaryDirectory() as tmp, patch("metrics.SHARED_METRICS", True), patch(
+            "metrics.METRICS_DIR", Path(tmp)
+        ):
+            # the parent process stands in for another running worker, 2**22 + 1 for one that has exited
+            for pid in (os.getppid(), 2**22 + 1):
+                with open(Path(tmp) / f"{pid}.json", "w") as f:
+                    json.dump(other_worker, f)
+            lines = metrics.render_metrics().splitlines()
+        self.assertIn('test_workers_total{route="/"} 8', lines)
+        self.assertIn('test_workers_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('test_workers_seconds_count 5', lines)
+        self.assertIn(f'test_workers_bytes{{worker="{os.getpid()}"}} 10', lines)
+        self.assertIn(f'test_workers_bytes{{worker="{os.getppid()}"}} 20', lines)
+        self.assertEqual(len([line for line in lines if line.startswith("test_workers_bytes{")]), 2)
+
+    def test_profiling_hook_dumps_stats(self):
+        with tempfile.TemporaryDirectory() as tmp, patch("metrics.PROFILE_REQUESTS", True), patch(
+            "metrics.PROFILE_DIR", Path(tmp)
+        ):
+            server = Flask(__name__)
+            metrics.instrument_server(server)
+            server.add_url_rule("/slow", "slow", lambda: "done")
+            server.test_client().get("/slow")
+            self.assertEqual(len(list(Path(tmp).glob("*-slow.prof"))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+import db
+import order_api
+from data_model import YieldCurve, YieldHistory
+from order_writer import OrderWriter
+
+YIELD_CURVE = YieldCurve("05/16/2025", ["1 Yr", "2 Yr", "10 Yr"], [410, 400, 443])
+
+
+class TestOrderApi(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        db_name = os.path.join(self.tmp.name, "orders.db")
+        for patcher in (
+            patch("db.DB_NAME", db_name),
+            patch("order_api.prepare_current_yield_curve", return_value=YIELD_CURVE),
+            patch("curve_fit.prepare_yield_history", return_value=YieldHistory.empty()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        db.init_db()
+        writer = OrderWriter(db_name)
+        writer.start()
+        self.addCleanup(writer.stop)
+        patcher = patch("order_api.get_order_writer", return_value=writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        server = Flask(__name__)
+        order_api.register_order_api(server)
+        self.client = server.test_client()
+
+    def post_batch(self, orders):
+        response = self.client.post(order_api.ORDERS_API_ROUTE, json={"orders": orders})
+        self.assertEqual(response.mimetype, order_api.NDJSON_MEDIA_TYPE)
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_single_order_is_priced_and_created(self):
+        response = self.client.post(
+            order_api.ORDERS_API_ROUTE, json={"term": "10 Yr", "amount_cents": 100000}
+        )
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual(body["status"], "created")
+        self.assertEqual(body["order"]["yield_basis_points"], 443)
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_retry_with_the_same_key_returns_the_booked_order(self):
+        order = {"term": "1 Yr", "amount_cents": 5000}
+        headers = {order_api.IDEMPOTENCY_KEY_HEADER: "retry-1"}
+        first = self.client.post(order_api.ORDERS_API_ROUTE, json=order, headers=headers)
+        retry = self.client.post(order_api.ORDERS_API_ROUTE, json=order, headers=headers)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.get_json()["status"], "duplicate")
+        self.assertEqual(retry.get_json()["order"], first.get_json()["order"])
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_invalid_order_is_rejected(self):
+        response = self.client.post(
+            order_api.ORDERS_API_ROUTE, json={"term": "10 Yr", "amount_cents": True}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["status"], "rejected")
+
+    def test_batch_streams_one_line_per_order_in_order(self):
+        results = self.post_batch(
+            [
+                {"term": "1 Yr", "amount_cents": 100, "idempotency_key": "a"},
+                {"term": "20 Yr", "amount_cents": 100},
+                {"term": "5 Yr", "amount_cents": -200},
+                {"term": "5 Yr", "amount_cents": 200},
+            ]
+        )
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3])
+        self.assertEqual([r["status"] for r in results], ["created", "created", "rejected", "created"])
+        self.assertIn("amount_cents", results[2]["error"])
+        self.assertEqual(len(db.read_orders()), 3)
+
+    def test_key_repeated_in_a_batch_books_once(self):
+        order = {"term": "2 Yr", "amount_cents": 100, "idempotency_key": "same"}
+        results = self.post_batch([order, order, {"term": "nope", "amount_cents": 1}])
+        self.assertEqual([r["status"] for r in results], ["created", "duplicate", "rejected"])
+        self.assertEqual(results[0]["order"], results[1]["order"])
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_oversized_amount_is_rejected_without_failing_the_batch(self):
+        results = self.post_batch(
+            [
+                {"term": "1 Yr", "amount_cents": 10**20},
+                {"term": "1 Yr", "amount_cents": order_api.MAX_ORDER_CENTS},
+            ]
+        )
+        self.assertEqual([r["status"] for r in results], ["rejected", "created"])
+        self.assertEqual(len(db.read_orders()), 1)
+
+    def test_key_reused_for_a_different_order_conflicts(self):
+        headers = {order_api.IDEMPOTENCY_KEY_HEADER: "reused"}
+        self.client.post(order_api.ORDERS_API_ROUTE, json={"term": "1 Yr", "amount_cents": 5000}, headers=headers)
+        response = self.client.post(
+            order_api.ORDERS_API_ROUTE, json={"term": "1 Yr", "amount_cents": 6000}, headers=headers
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["order"]["amount_cents"], 5000)
+        results = self.post_batch(
+            [
+                {"term": "2 Yr", "amount_cents": 1, "idempotency_key": "batch"},
+                {"term": "10 Yr", "amount_cents": 1, "idempotency_key": "batch"},
+            ]
+        )
+        self.assertEqual([r["status"] for r in results], ["created", "conflict"])
+        self.assertEqual(len(db.read_orders()), 2)
+
+    def test_empty_batch_is_refused(self):
+        response = self.client.post(order_api.ORDERS_API_ROUTE, json={"orders": []})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
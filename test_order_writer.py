@@ -0,0 +1,107 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor, wait
+from unittest.mock import patch
+
+import db
+import order_writer
+from data_model import Order
+from order_writer import OrderWriter
+
+
+def make_order(i):
+    return Order("1 Yr", 100 * i, 437, f"2025-05-16 12:00:{i % 60:02d}")
+
+
+class TestOrderWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_name = os.path.join(self.tmp.name, "orders.db")
+        with patch("db.DB_NAME", self.db_name):
+            db.init_db()
+        self.writer = OrderWriter(self.db_name)
+
+    def count_orders(self):
+        with sqlite3.connect(self.db_name) as conn:
+            return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    def test_submitted_orders_are_durable_once_acknowledged(self):
+        self.writer.start()
+        self.writer.submit(make_order(1)).result(timeout=5)
+        self.assertEqual(self.count_orders(), 1)
+        self.writer.stop()
+
+    def test_concurrent_orders_share_commits(self):
+        # queue everything before the writer starts, so it has to batch
+        futures = [self.writer.submit(make_order(i)) for i in range(200)]
+        self.writer.start()
+        wait(futures, timeout=5)
+        self.writer.stop()
+        self.assertEqual(self.count_orders(), 200)
+        self.assertEqual(self.writer.commits, 1)
+
+    def test_orders_from_many_threads(self):
+        def slow_insert(conn, orders):
+            # a commit that takes a while, like an fsync, lets the other threads' orders queue up behind it
+            time.sleep(0.005)
+            return db.insert_orders(conn, orders)
+
+        self.writer.start()
+        with patch("order_writer.insert_orders", side_effect=slow_insert), ThreadPoolExecutor(
+            max_workers=16
+        ) as pool:
+            futures = [pool.submit(lambda i=i: self.writer.submit(make_order(i)).result(5)) for i in range(300)]
+            for future in futures:
+                future.result()
+        self.writer.stop()
+        self.assertEqual(self.count_orders(), 300)
+        self.assertLess(self.writer.commits, 300 // 2)
+
+    def test_dead_writer_is_restarted(self):
+        # the db's directory doesn't exist, so the writer dies opening its connection
+        dead = OrderWriter(os.path.join(self.tmp.name, "missing", "orders.db"))
+        future = dead.submit(make_order(1))
+        dead.start()
+        dead.join(timeout=5)
+        with self.assertRaises(sqlite3.OperationalError):
+            future.result(timeout=5)
+        with patch("order_writer._order_writer", dead), patch("order_writer.DB_NAME", self.db_name):
+            restarted = order_writer.get_order_writer()
+            self.assertIsNot(restarted, dead)
+            self.assertTrue(restarted.submit(make_order(2)).result(timeout=5))
+            restarted.stop()
+
+    def test_failed_batch_raises_for_every_order(self):
+        with sqlite3.connect(self.db_name) as conn:
+            conn.execute("DROP TABLE orders")
+        futures = [self.writer.submit(make_order(i)) for i in range(3)]
+        self.writer.start()
+        for future in futures:
+            with self.assertRaises(sqlite3.OperationalError):
+                future.result(timeout=5)
+        self.writer.stop()
+
+    def test_failed_order_does_not_fail_its_batch(self):
+        # too large for sqlite's int64, so only this order's insert raises
+        too_large = Order("1 Yr", 10**20, 437, "2025-05-16 12:00:00")
+        futures = [self.writer.submit(order) for order in (make_order(1), too_large, make_order(2))]
+        self.writer.start()
+        self.assertTrue(futures[0].result(timeout=5))
+        with self.assertRaises(OverflowError):
+            futures[1].result(timeout=5)
+        self.assertTrue(futures[2].result(timeout=5))
+        self.writer.stop()
+        self.assertEqual(self.count_orders(), 2)
+
+    def test_wal_mode(self):
+        with sqlite3.connect(self.db_name) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+
+if __name__ == "__main__":
+    unittest.main()
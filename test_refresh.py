@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import prepare_graph_data as pgd
+import refresh
+from yield_cache import parse_year_csv
+
+OLD_ROWS = [["Date", "1 Mo", "10 Yr"], ["05/15/2025", "4.37", "4.45"]]
+NEW_ROWS = [["Date", "1 Mo", "10 Yr"], ["05/16/2025", "4.36", "4.43"], *OLD_ROWS[1:]]
+
+
+def make_snapshot(rows):
+    history = parse_year_csv(rows)
+    return pgd.DataSnapshot(history, history.yield_curve_at(-1))
+
+
+class TestRefresh(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch("prepare_graph_data._snapshot", make_snapshot(OLD_ROWS))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.listener = MagicMock()
+        patcher = patch("prepare_graph_data._snapshot_listeners", [self.listener])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("refresh.backfill")
+    def test_refresh_once_swaps_in_new_data(self, _):
+        with patch("refresh.load_snapshot", return_value=make_snapshot(NEW_ROWS)):
+            self.assertTrue(refresh.refresh_once())
+        self.assertEqual(pgd.prepare_current_yield_curve().date, "05/16/2025")
+        self.listener.assert_called_once_with(pgd.current_snapshot())
+
+    @patch("refresh.backfill")
+    def test_refresh_once_keeps_snapshot_when_unchanged(self, _):
+        before = pgd.current_snapshot()
+        with patch("refresh.load_snapshot", return_value=make_snapshot(OLD_ROWS)):
+            self.assertFalse(refresh.refresh_once())
+        self.assertIs(pgd.current_snapshot(), before)
+        self.listener.assert_not_called()
+
+    @patch("refresh.backfill", side_effect=Exception("Network error"))
+    def test_refresh_once_survives_download_errors(self, _):
+        with patch("refresh.load_snapshot", return_value=make_snapshot(NEW_ROWS)):
+            self.assertTrue(refresh.refresh_once())
+
+    def test_yield_curve_at_skips_missing_terms(self):
+        history = parse_year_csv([["Date", "1 Mo", "10 Yr"], ["05/16/2025", "", "4.43"]])
+        curve = history.yield_curve_at(-1)
+        self.assertEqual((curve.date, curve.terms, curve.yields), ("05/16/2025", ["10 Yr"], [443]))
+
+
+if __name__ == "__main__":
+    unittest.main()
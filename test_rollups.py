@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+import rollups
+from data_model import YieldHistory
+from terms import MATURITY_TERMS
+
+
+def make_history(n):
+    dates = np.busday_offset("2023-01-02", np.arange(n), roll="forward")
+    yields = (np.sin(np.arange(n)[:, None] / 30 + np.arange(len(MATURITY_TERMS))) * 200 + 400)
+    yields = np.asfortranarray(yields.astype(YieldHistory.YIELD_DTYPE))
+    valid = np.ones(yields.shape, dtype=bool, order="F")
+    valid[::7, 0] = False  # one term with gaps
+    return YieldHistory(dates, MATURITY_TERMS, yields, valid)
+
+
+class TestRollups(unittest.TestCase):
+
+    def test_weekly_periods_start_on_monday(self):
+        dates = np.array(["2025-05-11", "2025-05-12", "2025-05-16", "2025-05-19"], dtype="datetime64[D]")
+        starts = rollups.period_starts(dates, "weekly")
+        self.assertEqual(
+            np.datetime_as_string(starts).tolist(),
+            ["2025-05-05", "2025-05-12", "2025-05-12", "2025-05-19"],
+        )
+
+    def test_ohlc(self):
+        curve = make_history(30).historical_curve("10 Yr")
+        ohlc = rollups.compute_ohlc(curve, "monthly")
+        january = curve.dates < np.datetime64("2023-02-01")
+        self.assertEqual(ohlc.periods[0], np.datetime64("2023-01-01"))
+        self.assertEqual(ohlc.open[0], curve.yields[0])
+        self.assertEqual(ohlc.high[0], curve.yields[january].max())
+        self.assertEqual(ohlc.low[0], curve.yields[january].min())
+        self.assertEqual(ohlc.close[0], curve.yields[january][-1])
+
+    def test_rolling_mean(self):
+        means = rollups.rolling_mean(np.array([100, 200, 300, 500], dtype=np.int16), 3)
+        self.assertTrue(np.isnan(means[:2]).all())
+        np.testing.assert_allclose(means[2:], [200, 1000 / 3])
+
+    def test_extend_matches_build(self):
+        history = make_history(400)
+        extended = rollups.Rollups.build(make_history(380)).extend(history)
+        built = rollups.Rollups.build(history)
+        for period in rollups.PERIODS:
+            for term in MATURITY_TERMS:
+                for got, expected in zip(extended.ohlc[period][term], built.ohlc[period][term]):
+                    np.testing.assert_array_equal(got, expected)
+        for label in rollups.ROLLING_WINDOWS:
+            for term in MATURITY_TERMS:
+                np.testing.assert_allclose(
+                    extended.rolling_means[label][term], built.rolling_means[label][term]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import gzip
+import unittest
+from unittest.mock import patch
+
+import plotly.graph_objs as go
+from flask import Flask
+
+import routes
+from curve_fit import CurveFits
+from figure_cache import CachedFigure
+from rollups import Rollups
+from yield_cache import parse_year_csv
+
+CSV_ROWS = [
+    ["Date", "1 Mo", "10 Yr"],
+    ["05/16/2025", "4.37", "4.43"],
+    ["05/15/2025", "", "4.45"],
+]
+
+
+class TestRoutes(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch(
+            "routes.prepare_yield_history", return_value=parse_year_csv(CSV_ROWS)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("routes.prepare_rollups", return_value=Rollups.build(parse_year_csv(CSV_ROWS)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server = Flask(__name__)
+        routes.register_routes(server)
+        self.client = server.test_client()
+
+    def test_historical_curve_returns_one_term(self):
+        response = self.client.get(routes.historical_curve_url("1 Mo"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get_json(),
+            {"term": "1 Mo", "dates": ["2025-05-16"], "yields": [437]},
+        )
+        self.assertIn("max-age=", response.headers["Cache-Control"])
+
+    def test_historical_curve_revalidates_with_etag(self):
+        first = self.client.get(routes.historical_curve_url("10 Yr"))
+        second = self.client.get(
+            routes.historical_curve_url("10 Yr"),
+            headers={"If-None-Match": first.headers["ETag"]},
+        )
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b"")
+
+    def test_historical_curve_unknown_term(self):
+        self.assertEqual(self.client.get(routes.historical_curve_url("9 Yr")).status_code, 404)
+
+    def test_rollup_returns_ohlc(self):
+        response = self.client.get(routes.ROLLUP_ROUTE + "weekly/10 Yr")
+        self.assertEqual(
+            response.get_json(),
+            {
+                "term": "10 Yr",
+                "period": "weekly",
+                "periods": ["2025-05-12"],
+                "open": [445],
+                "high": [445],
+                "low": [443],
+                "close": [443],
+            },
+        )
+        self.assertEqual(self.client.get(routes.ROLLUP_ROUTE + "daily/10 Yr").status_code, 404)
+
+    def test_rolling_mean_is_null_until_the_window_fills(self):
+        response = self.client.get(routes.ROLLING_MEAN_ROUTE + "1M/10 Yr")
+        self.assertEqual(response.get_json()["means"], [None, None])
+
+    def test_spread_on_dates_both_terms_have(self):
+        with patch("spreads.prepare_yield_history", return_value=parse_year_csv(CSV_ROWS)):
+            response = self.client.get(routes.SPREAD_ROUTE + "10 Yr/1 Mo?window=1M")
+        body = response.get_json()
+        self.assertEqual(body["dates"], ["2025-05-16"])
+        self.assertEqual(body["spreads"], [6])
+        self.assertEqual(body["inversions"]["starts"], [])
+        self.assertEqual(body["means"], [None])
+        self.assertEqual(self.client.get(routes.SPREAD_ROUTE + "10 Yr/11 Yr").status_code, 404)
+
+    def test_curve_fit_of_the_nearest_date(self):
+        with patch("routes.prepare_curve_fits", side_effect=CurveFits.fit):
+            response = self.client.get(routes.CURVE_FIT_ROUTE + "pchip?date=2025-05-17")
+            # two quotes are too few for an NSS fit
+            self.assertEqual(self.client.get(routes.CURVE_FIT_ROUTE + "nss").status_code, 404)
+        body = response.get_json()
+        self.assertEqual(body["date"], "2025-05-16")
+        self.assertEqual(body["quoted"], ["1 Mo", "10 Yr"])
+        yields = dict(zip(body["terms"], body["yields"]))
+        self.assertEqual((yields["1 Mo"], yields["10 Yr"]), (437, 443))
+        self.assertTrue(437 <= yields["2 Yr"] <= 443)
+        self.assertEqual(self.client.get(routes.CURVE_FIT_ROUTE + "spline").status_code, 404)
+
+    def test_historical_figure_is_sent_gzipped(self):
+        cached = CachedFigure.from_figure(go.Figure(layout={"title": "10 Yr"}))
+        with patch("routes.cached_historical_view", return_value=cached) as cached_historical_view:
+            response = self.client.get(
+                routes.HISTORICAL_FIGURE_ROUTE + "10 Yr?resolution=monthly",
+                headers={"Accept-Encoding": "gzip"},
+            )
+        cached_historical_view.assert_called_once_with("10 Yr", "monthly", "off")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.data), cached.json)
+        self.assertEqual(
+            self.client.get(routes.HISTORICAL_FIGURE_ROUTE + "10 Yr?resolution=hourly").status_code, 404
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
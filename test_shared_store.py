@@ -0,0 +1,75 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import shared_store
+from yield_cache import parse_year_csv
+
+CSV_ROWS = [
+    ["Date", "1 Mo", "10 Yr"],
+    ["05/16/2025", "4.37", "4.43"],
+    ["05/15/2025", "", "4.45"],
+]
+
+
+class TestSharedStore(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        patcher = patch("shared_store.STORE_DIR", Path(tmp_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history = parse_year_csv(CSV_ROWS)
+        patcher = patch("shared_store.load_yield_history", return_value=self.history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_attach_maps_the_published_history(self):
+        self.assertIsNone(shared_store.attach_published())
+        with shared_store.store_lock():
+            shared_store.publish(self.history)
+        attached = shared_store.attach_published()
+        # a read-only view of the mapped file, not a private copy
+        self.assertFalse(attached.yields.flags["OWNDATA"])
+        self.assertFalse(attached.yields.flags["WRITEABLE"])
+        self.assertEqual(attached.version, self.history.version)
+        self.assertEqual(attached.term_yields("10 Yr").tolist(), [445, 443])
+        self.assertTrue(attached.term_yields("10 Yr").flags["C_CONTIGUOUS"])
+
+    def test_lock_excludes_other_holders(self):
+        with shared_store.store_lock() as locked:
+            self.assertTrue(locked)
+            with shared_store.store_lock(blocking=False) as other:
+                self.assertFalse(other)
+        with shared_store.store_lock(blocking=False) as locked:
+            self.assertTrue(locked)
+
+    def test_only_one_download_per_interval(self):
+        download = MagicMock()
+        self.assertTrue(shared_store.refresh_shared_store(download, interval_seconds=60))
+        self.assertFalse(shared_store.refresh_shared_store(download, interval_seconds=60))
+        self.assertEqual(download.call_count, 1)
+        self.assertIsNotNone(shared_store.attach_published())
+
+    def test_no_download_while_another_process_holds_the_lock(self):
+        download = MagicMock()
+        with shared_store.store_lock():
+            self.assertFalse(shared_store.refresh_shared_store(download, interval_seconds=0))
+        download.assert_not_called()
+
+    def test_publishing_keeps_only_current_and_previous_versions(self):
+        versions = []
+        for day in ("14", "13", "12"):
+            history = parse_year_csv(CSV_ROWS + [[f"05/{day}/2025", "4.30", "4.40"]])
+            versions.append(history.version)
+            with shared_store.store_lock():
+                shared_store.publish(history, downloaded_at=time.time())
+        stored = {path.name.split(".")[0] for path in shared_store.STORE_DIR.glob("*.npy")}
+        self.assertEqual(stored, set(versions[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
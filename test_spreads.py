@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+import spreads
+from data_model import YieldHistory
+
+DATES = np.arange("2025-05-01", "2025-05-09", dtype="datetime64[D]")
+
+
+def make_history(long_yields, short_yields, short_valid=None):
+    valid = np.ones((len(long_yields), 2), dtype=bool)
+    if short_valid is not None:
+        valid[:, 1] = short_valid
+    yields = np.column_stack([long_yields, short_yields])
+    return YieldHistory(DATES[: len(long_yields)], ["10 Yr", "2 Yr"], np.where(valid, yields, 0), valid)
+
+
+class TestSpreads(unittest.TestCase):
+
+    def test_spread_only_on_dates_both_terms_have(self):
+        history = make_history([450, 440, 430], [400, 0, 420], short_valid=[True, False, True])
+        spread = spreads.compute_spread(history, "10 Yr", "2 Yr")
+        np.testing.assert_array_equal(spread.dates, DATES[[0, 2]])
+        self.assertEqual(spread.basis_points.tolist(), [50, 10])
+
+    def test_inversion_episodes(self):
+        history = make_history([400, 390, 380, 410, 420, 395, 390], [400] * 7)
+        inversions = spreads.find_inversions(spreads.compute_spread(history, "10 Yr", "2 Yr"))
+        np.testing.assert_array_equal(inversions.starts, DATES[[1, 5]])
+        np.testing.assert_array_equal(inversions.ends, DATES[[2, 6]])
+        self.assertEqual(inversions.days.tolist(), [2, 2])
+        self.assertEqual(inversions.deepest.tolist(), [-20, -10])
+        self.assertTrue(inversions.ongoing)
+
+    def test_no_inversions(self):
+        history = make_history([450, 460], [400, 400])
+        inversions = spreads.find_inversions(spreads.compute_spread(history, "10 Yr", "2 Yr"))
+        self.assertEqual(len(inversions), 0)
+        self.assertFalse(inversions.ongoing)
+
+    def test_rolling_std_matches_numpy(self):
+        values = np.array([5, -3, 8, 1, 0, -7, 4], dtype=np.int32)
+        stds = spreads.rolling_std(values, 3)
+        self.assertTrue(np.isnan(stds[:2]).all())
+        expected = [np.std(values[i - 2 : i + 1]) for i in range(2, len(values))]
+        np.testing.assert_allclose(stds[2:], expected, rtol=1e-6)
+
+    def test_analytics_cached_per_data_version(self):
+        history = make_history([450, 440], [400, 420])
+        first = spreads.spread_analytics(history, "10 Yr", "2 Yr")
+        self.assertIs(spreads.spread_analytics(history, "10 Yr", "2 Yr"), first)
+        other = make_history([450, 440], [400, 420])
+        self.assertIsNot(spreads.spread_analytics(other, "10 Yr", "2 Yr"), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
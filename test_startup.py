@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dash import Dash
+from flask import Flask
+
+import routes
+import startup
+from callbacks import register_callbacks
+from layout import create_validation_layout
+
+
+def layout_ids(component):
+    ids = set()
+    if getattr(component, "id", None):
+        ids.add(component.id)
+    children = getattr(component, "children", None)
+    for child in children if isinstance(children, list) else [children]:
+        if hasattr(child, "to_plotly_json"):
+            ids |= layout_ids(child)
+    return ids
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_validation_layout_has_every_callback_component(self):
+        app = Dash(__name__)
+        register_callbacks(app)
+        callback_ids = set()
+        for callback in app._callback_list:
+            outputs = callback["output"].strip(".").split("...")
+            callback_ids |= {output.rsplit(".", 1)[0] for output in outputs}
+            callback_ids |= {dependency["id"] for dependency in callback["inputs"] + callback["state"]}
+        self.assertLessEqual(callback_ids, layout_ids(create_validation_layout()))
+
+    def test_health_reports_warming_then_ready(self):
+        server = Flask(__name__)
+        routes.register_routes(server)
+        client = server.test_client()
+        with patch("routes.is_ready", return_value=False):
+            response = client.get(routes.HEALTH_ROUTE)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()["status"], "warming")
+
+        with patch("routes.is_ready", return_value=True), patch(
+            "routes.prepare_yield_history"
+        ) as prepare_yield_history:
+            prepare_yield_history.return_value.version = "v1"
+            response = client.get(routes.HEALTH_ROUTE)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["version"], "v1")
+
+    def test_failed_warm_up_is_not_ready_and_retries(self):
+        server = Flask(__name__)
+        routes.register_routes(server)
+        client = server.test_client()
+        with patch("startup._ready", startup.threading.Event()), patch(
+            "startup.current_snapshot", side_effect=[OSError("no data"), OSError("no data"), MagicMock()]
+        ), patch("startup.notify_snapshot_listeners"), patch("startup.time.sleep") as sleep:
+            self.assertFalse(startup.warm_up())
+            self.assertFalse(startup.is_ready())
+            response = client.get(routes.HEALTH_ROUTE)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.get_json()["error"], "OSError: no data")
+
+            startup.warm_up_until_ready()
+            sleep.assert_called_once_with(startup.WARM_UP_RETRY_SECONDS)
+            self.assertTrue(startup.is_ready())
+            self.assertIsNone(startup.warm_up_error())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import backfill
+import load_csv_data as lcd
+
+HEADER = 'Date,"1 Mo","10 Yr"'
+STORED_CSV = f"{HEADER}\n05/15/2025,4.37,4.45\n05/14/2025,4.36,4.53"
+
+
+class TreasuryStandIn(BaseHTTPRequestHandler):
+    """Serves one csv with an ETag, like the treasury site"""
+
+    body = ""
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        TreasuryStandIn.requests_seen.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        payload = self.body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", "Fri, 16 May 2025 20:00:00 GMT")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSyncYearCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), TreasuryStandIn)
+        threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        ).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        TreasuryStandIn.requests_seen = []
+        TreasuryStandIn.body = f"{HEADER}\n05/16/2025,4.36,4.43\n05/15/2025,4.37,4.45\n05/14/2025,4.36,4.53"
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.data_dir = Path(self.tmp.name) / "data"
+        self.data_dir.mkdir()
+        url = f"http://127.0.0.1:{self.server.server_port}/csv"
+        for target, value in (
+            ("load_csv_data.DATA_DIR", self.data_dir),
+            ("load_csv_data.SYNC_STATE_PATH", Path(self.tmp.name) / "sync_state.json"),
+            ("load_csv_data.get_csv_download_url", lambda year: f"{url}/{year}"),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_stored_csv(self, text=STORED_CSV):
+        with open(self.data_dir / "2025.csv", "w") as f:
+            f.write(text)
+
+    def read_stored_csv(self):
+        with open(self.data_dir / "2025.csv", "r") as f:
+            return f.read()
+
+    def test_only_new_rows_are_added(self):
+        self.write_stored_csv()
+        self.assertEqual(lcd.sync_year_csv(2025), 1)
+        self.assertEqual(
+            self.read_stored_csv().splitlines(),
+            [HEADER, "05/16/2025,4.36,4.43", "05/15/2025,4.37,4.45", "05/14/2025,4.36,4.53"],
+        )
+
+    def test_second_sync_is_a_conditional_get(self):
+        self.write_stored_csv()
+        lcd.sync_year_csv(2025)
+        self.assertEqual(lcd.sync_year_csv(2025), 0)
+        self.assertEqual(TreasuryStandIn.requests_seen[-1].get("If-None-Match"), '"v1"')
+        self.assertEqual(lcd.read_newest_csv_date(2025), "05/16/2025")
+
+    def test_missing_file_is_written_whole(self):
+        self.assertEqual(lcd.sync_year_csv(2025), 3)
+        self.assertEqual(self.read_stored_csv(), TreasuryStandIn.body)
+
+    def test_header_only_csv_has_no_newest_date(self):
+        TreasuryStandIn.body = HEADER
+        self.assertEqual(lcd.sync_year_csv(2025), 0)
+        self.assertEqual(self.read_stored_csv(), HEADER)
+        self.assertEqual(lcd.read_sync_state()["2025"]["last_date"], None)
+        self.assertIsNone(lcd.read_newest_csv_date(2025))
+
+    def test_empty_body_with_nothing_stored_writes_nothing(self):
+        TreasuryStandIn.body = ""
+        self.assertEqual(lcd.sync_year_csv(2025), 0)
+        self.assertFalse((self.data_dir / "2025.csv").exists())
+        self.assertEqual(lcd.read_sync_state(), {})
+
+    def test_changed_columns_rewrite_the_file(self):
+        self.write_stored_csv('Date,"10 Yr"\n05/15/2025,4.45')
+        lcd.sync_year_csv(2025)
+        self.assertEqual(self.read_stored_csv(), TreasuryStandIn.body)
+
+    def test_newest_date_index_avoids_reading_the_file(self):
+        self.write_stored_csv()
+        lcd.sync_year_csv(2025)
+        with patch("load_csv_data.read_csv_head") as read_csv_head:
+            self.assertEqual(lcd.read_newest_csv_date(2025), "05/16/2025")
+        read_csv_head.assert_not_called()
+
+    def test_backfill_fills_every_missing_year(self):
+        this_year = datetime.now().year
+        self.assertEqual(
+            backfill.backfill(first_year=this_year - 1, workers=2),
+            {this_year - 1: 3, this_year: 3},
+        )
+        self.assertEqual(
+            sorted(p.name for p in self.data_dir.iterdir()),
+            [f"{this_year - 1}.csv", f"{this_year}.csv"],
+        )
+
+    def test_backfill_continues_past_a_failed_year(self):
+        this_year = datetime.now().year
+
+        def sync_year_csv(year):
+            if year == this_year - 1:
+                raise OSError("disk full")
+            return lcd.sync_year_csv(year)
+
+        with patch("backfill.sync_year_csv", side_effect=sync_year_csv):
+            rows_added = backfill.backfill(first_year=this_year - 2, workers=2)
+        self.assertEqual(rows_added, {this_year - 2: 3, this_year: 3})
+        self.assertFalse((self.data_dir / f"{this_year - 1}.csv").exists())
+
+    def test_last_weekday_of_year(self):
+        self.assertEqual(backfill.last_weekday_of_year(2023).day, 29)  # Dec 31 2023 is a Sunday
+        self.assertEqual(backfill.last_weekday_of_year(2024).day, 31)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import db
+import valuation
+from data_model import Order
+
+
+class TestValuation(unittest.TestCase):
+
+    def test_maturity_dates(self):
+        book = valuation.OrderBook()
+        book.append(
+            [
+                Order("1 Mo", 100_00, 400, "2025-05-16 10:00:00"),
+                Order("1.5 Mo", 100_00, 400, "2025-05-16 10:00:00"),
+                Order("10 Yr", 100_00, 400, "2025-05-16 10:00:00"),
+                Order("1 Yr", 100_00, 400, "2024-02-29 10:00:00"),
+                Order("2 Yr", 100_00, 400, "2024-02-29 10:00:00"),
+            ]
+        )
+        self.assertEqual(
+            book.maturity_dates.astype(str).tolist(),
+            ["2025-06-13", "2025-06-27", "2035-05-16", "2025-02-27", "2026-02-28"],
+        )
+
+    def test_payoff_and_accrued_value(self):
+        book = valuation.OrderBook()
+        book.append([Order("2 Yr", 1_000_00, 500, "2025-01-01 10:00:00")])
+        # 730 days at 5%, actual/365
+        self.assertEqual(book.payoff_cents().tolist(), [1_100_00])
+        self.assertEqual(book.value_cents(np.datetime64("2024-06-01")).tolist(), [1_000_00])
+        self.assertEqual(book.value_cents(np.datetime64("2026-01-01")).tolist(), [1_050_00])
+        self.assertEqual(book.value_cents(np.datetime64("2040-01-01")).tolist(), [1_100_00])
+
+    def test_book_grows_past_initial_capacity(self):
+        book = valuation.OrderBook()
+        for _ in range(3):
+            book.append([Order("3 Mo", 1, 400, "2025-05-16 10:00:00")] * 1000)
+        self.assertEqual(book.size, 3000)
+        self.assertEqual(book.summary(np.datetime64("2025-05-16"))["principal_cents"], 3000)
+
+    def test_load_new_orders_is_incremental(self):
+        with tempfile.TemporaryDirectory() as tmp, patch("db.DB_NAME", os.path.join(tmp, "orders.db")):
+            db.init_db()
+            book = valuation.OrderBook()
+            with sqlite3.connect(db.DB_NAME) as conn:
+                db.insert_orders(conn, [Order("1 Yr", 100, 413, "2025-05-16 10:00:00")] * 2)
+                self.assertEqual(book.load_new_orders(conn), 2)
+                db.insert_orders(conn, [Order("30 Yr", 500, None, "2025-05-16 11:00:00")])
+                self.assertEqual(book.load_new_orders(conn), 1)
+                self.assertEqual(book.load_new_orders(conn), 0)
+            self.assertEqual(book.cents.tolist(), [100, 100, 500])
+            self.assertEqual(book.yields.tolist(), [413, 413, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+import yield_cache as yc
+from data_model import HistoricalCurve, YieldHistory
+from terms import MATURITY_TERMS
+
+CSV_ROWS = [
+    ["Date", "1 Mo", "1.5 Month", "4 Mo", "10 Yr"],
+    ["05/16/2025", "4.37", "4.36", "4.42", "4.43"],
+    ["05/15/2025", "4.37", "", "4.43", "4.45"],
+]
+
+
+class TestParseYearCsv(unittest.TestCase):
+
+    def test_parse_year_csv_orders_dates_ascending(self):
+        block = yc.parse_year_csv(CSV_ROWS)
+        self.assertEqual(
+            block.dates.tolist(),
+            np.array(["2025-05-15", "2025-05-16"], dtype="datetime64[D]").tolist(),
+        )
+        self.assertEqual(block.terms, MATURITY_TERMS)
+
+    def test_parse_year_csv_maps_columns_and_validity(self):
+        block = yc.parse_year_csv(CSV_ROWS)
+        self.assertEqual(block.term_yields("10 Yr").tolist(), [445, 443])
+        self.assertEqual(block.term_valid("1.5 Mo").tolist(), [False, True])
+        self.assertFalse(block.term_valid("30 Yr").any())
+
+    def test_historical_curve_drops_invalid_dates(self):
+        curve = yc.parse_year_csv(CSV_ROWS).historical_curve("1.5 Mo")
+        self.assertEqual(len(curve.dates), 1)
+        self.assertEqual(curve.yields.tolist(), [436])
+
+    def test_term_views_are_zero_copy(self):
+        block = yc.parse_year_csv(CSV_ROWS)
+        view = block.term_yields("4 Mo")
+        self.assertTrue(np.shares_memory(view, block.yields))
+        self.assertTrue(view.flags["C_CONTIGUOUS"])
+
+    def test_concatenate_keeps_term_axis(self):
+        block = yc.parse_year_csv(CSV_ROWS)
+        joined = YieldHistory.concatenate([block, block])
+        self.assertEqual(len(joined), 4)
+        self.assertEqual(joined.yields.shape, (4, len(MATURITY_TERMS)))
+
+    def test_rows_for_dates_resolves_nearest_business_day(self):
+        history = yc.parse_year_csv(
+            [["Date", "10 Yr"], ["05/13/2025", "4.47"], ["05/12/2025", "4.46"], ["05/09/2025", "4.38"]]
+        )
+        rows = history.rows_for_dates(["2025-05-12", "2025-05-10", "2025-05-11", "1990-01-01", "2030-01-01"])
+        self.assertEqual(rows.tolist(), [1, 0, 1, 0, 2])
+
+    def test_yield_curves_on_dates(self):
+        curves = yc.parse_year_csv(CSV_ROWS).yield_curves_on(["2025-05-17", "2025-05-15"])
+        self.assertEqual([curve.date for curve in curves], ["05/16/2025", "05/15/2025"])
+        self.assertEqual(curves[1].terms, ["1 Mo", "4 Mo", "10 Yr"])
+
+    def test_historical_curve_dict_round_trip(self):
+        curve = yc.parse_year_csv(CSV_ROWS).historical_curve("1 Mo")
+        restored = HistoricalCurve.from_dict(curve.to_dict())
+        self.assertTrue((restored.dates == curve.dates).all())
+        self.assertEqual(restored.yields.tolist(), curve.yields.tolist())
+
+
+class TestYieldCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.data_dir = root / "data"
+        self.data_dir.mkdir()
+        for year in (1990, 1991):
+            self.write_csv(year, "4.37")
+        for target, value in (
+            ("load_csv_data.DATA_DIR", self.data_dir),
+            ("yield_cache.DATA_DIR", self.data_dir),
+            ("yield_cache.CACHE_DIR", root / "cache"),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_csv(self, year, value):
+        with open(self.data_dir / f"{year}.csv", "w") as f:
+            f.write(f'Date,"1 Mo","10 Yr"\n01/02/{year},{value},5.00\n')
+
+    def test_cold_load_parses_and_warm_load_mmaps(self):
+        with patch("yield_cache.ingest_year_csv", wraps=yc.ingest_year_csv) as parse:
+            cold = yc.load_yield_history(last_year=1991)
+            self.assertEqual(parse.call_count, 2)
+            warm = yc.load_yield_history(last_year=1991)
+            self.assertEqual(parse.call_count, 2)
+        self.assertEqual(cold.yields.tolist(), warm.yields.tolist())
+        self.assertEqual(warm.term_yields("1 Mo").tolist(), [437, 437])
+
+    def test_only_changed_year_is_rebuilt(self):
+        yc.load_yield_history(last_year=1991)
+        self.write_csv(1991, "4.99")
+        os.utime(self.data_dir / "1991.csv", ns=(1, 1))
+        with patch("yield_cache.ingest_year_csv", wraps=yc.ingest_year_csv) as parse:
+            history = yc.load_yield_history(last_year=1991)
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(history.term_yields("1 Mo").tolist(), [437, 499])
+
+    def test_touched_but_identical_csv_is_not_rebuilt(self):
+        yc.load_yield_history(last_year=1991)
+        os.utime(self.data_dir / "1990.csv", ns=(1, 1))
+        with patch("yield_cache.ingest_year_csv") as parse:
+            yc.load_yield_history(last_year=1991)
+        parse.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import io
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from flask import Flask
+
+import columnar
+import yields_api
+from yield_cache import parse_year_csv
+
+CSV_ROWS = [
+    ["Date", "1 Mo", "10 Yr"],
+    ["05/16/2025", "4.37", "4.43"],
+    ["05/15/2025", "", "4.45"],
+    ["05/14/2025", "4.36", "4.50"],
+    ["05/12/2025", "4.35", "4.47"],
+]
+
+
+class TestYieldsApi(unittest.TestCase):
+
+    def setUp(self):
+        self.yield_history = parse_year_csv(CSV_ROWS)
+        patcher = patch("yields_api.prepare_yield_history", return_value=self.yield_history)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server = Flask(__name__)
+        yields_api.register_yields_api(server)
+        self.client = server.test_client()
+
+    def test_rows_between_bisects_inclusive_dates(self):
+        self.assertEqual(self.yield_history.rows_between("2025-05-13", "2025-05-15"), slice(1, 3))
+        self.assertEqual(self.yield_history.rows_between("2025-05-14"), slice(1, 4))
+        self.assertEqual(self.yield_history.rows_between(end="2025-05-01"), slice(0, 0))
+
+    def test_csv_is_the_fallback(self):
+        response = self.client.get(
+            yields_api.YIELDS_API_ROUTE,
+            query_string={"terms": "1 Mo,10 Yr", "start": "2025-05-14", "end": "2025-05-15"},
+        )
+        self.assertEqual(response.mimetype, yields_api.CSV_MEDIA_TYPE)
+        self.assertEqual(
+            response.get_data(as_text=True).splitlines(),
+            ["date,1 Mo,10 Yr", "2025-05-14,436,450", "2025-05-15,,445"],
+        )
+
+    def test_columnar_stream_round_trips(self):
+        response = self.client.get(
+            yields_api.YIELDS_API_ROUTE,
+            query_string={"terms": "1 Mo"},
+            headers={"Accept": columnar.MEDIA_TYPE},
+        )
+        self.assertEqual(response.mimetype, columnar.MEDIA_TYPE)
+        f = io.BytesIO(response.get_data())
+        columns, metadata = columnar.read_header(f)
+        self.assertEqual([name for name, _ in columns], ["date", "1 Mo"])
+        (chunk,) = columnar.read_chunks(f, columns)
+        np.testing.assert_array_equal(
+            chunk["date"].astype("datetime64[D]"), self.yield_history.dates
+        )
+        self.assertEqual(chunk["1 Mo"].tolist(), [435, 436, metadata["null"], 437])
+
+    def test_large_ranges_stream_in_chunks(self):
+        with patch("yields_api.CHUNK_ROWS", 1):
+            response = self.client.get(yields_api.YIELDS_API_ROUTE, query_string={"format": "columnar"})
+            f = io.BytesIO(response.get_data())
+            columns, _ = columnar.read_header(f)
+            self.assertEqual(len(list(columnar.read_chunks(f, columns))), 4)
+
+    def test_bad_queries(self):
+        for query, status in (
+            ({"terms": "11 Yr"}, 400),
+            ({"start": "yesterday"}, 400),
+            ({"format": "xml"}, 406),
+        ):
+            response = self.client.get(yields_api.YIELDS_API_ROUTE, query_string=query)
+            self.assertEqual(response.status_code, status, query)
+
+    def test_etag_revalidation(self):
+        response = self.client.get(yields_api.YIELDS_API_ROUTE)
+        etag = response.headers["ETag"]
+        response = self.client.get(yields_api.YIELDS_API_ROUTE, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    @unittest.skipIf(yields_api.pyarrow is None, "pyarrow is not installed")
+    def test_arrow_stream(self):
+        response = self.client.get(yields_api.YIELDS_API_ROUTE, query_string={"format": "arrow"})
+        table = yields_api.pyarrow.ipc.open_stream(response.get_data()).read_all()
+        self.assertEqual(table.column("1 Mo").to_pylist(), [435, 436, None, 437])
+
+
+if __name__ == "__main__":
+    unittest.main()
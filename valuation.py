@@ -0,0 +1,200 @@
+"""
+- Projected value of the user's orders
+- Orders are held column-wise in an OrderBook, and every valuation is one vectorized pass over the book
+- Interest is simple interest on an actual/365 basis at the order's yield:
+- - bills pay it all at maturity
+- - notes and bonds pay it as semiannual coupons, plus the principal back at maturity
+- - either way, the total paid over the life of an order is principal * (1 + yield * days / 365)
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import db
+from data_model import Order
+from terms import MATURITY_TERMS, TERM_WEEKS, TERM_YEARS, Term
+
+DAYS_PER_YEAR = 365
+LOAD_CHUNK_SIZE = 50_000
+
+TERM_INDICES: Dict[Term, int] = {term: index for index, term in enumerate(MATURITY_TERMS)}
+# per term index: weeks for bills, 0 for notes/bonds; and years for notes/bonds, 0 for bills
+_TERM_WEEKS = np.array([TERM_WEEKS.get(term, 0) for term in MATURITY_TERMS], dtype=np.int64)
+_TERM_YEARS = np.array([TERM_YEARS.get(term, 0) for term in MATURITY_TERMS], dtype=np.int64)
+
+
+def local_utc_offset_seconds() -> int:
+    offset = datetime.now().astimezone().utcoffset()
+    return int(offset.total_seconds()) if offset else 0
+
+
+def epochs_to_local_dates(epochs: np.ndarray) -> np.ndarray:
+    """Order timestamps are local time, so the order's date is the local calendar date"""
+    return ((epochs + local_utc_offset_seconds()) // 86_400).astype("datetime64[D]")
+
+
+def add_years(dates: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """Same day of the month, years later; Feb 29 becomes Feb 28 in non-leap years"""
+    months = dates.astype("datetime64[M]")
+    day_of_month = dates - months.astype("datetime64[D]")
+    target_months = months + 12 * years
+    last_day = (target_months + 1).astype("datetime64[D]") - 1
+    return np.minimum(target_months.astype("datetime64[D]") + day_of_month, last_day)
+
+
+def maturity_dates(term_indices: np.ndarray, placed_dates: np.ndarray) -> np.ndarray:
+    by_weeks = placed_dates + 7 * _TERM_WEEKS[term_indices]
+    by_years = add_years(placed_dates, _TERM_YEARS[term_indices])
+    return np.where(_TERM_WEEKS[term_indices] > 0, by_weeks, by_years)
+
+
+class OrderBook:
+    """
+    - Every order, as parallel numpy arrays (term index, principal, yield, placed date, maturity date)
+    - Maturity dates are computed once per order when it is appended
+    - Arrays grow by doubling, so appending new orders is amortized O(new orders)
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.last_id = 0  # the highest orders.id loaded so far, see load_new_orders
+        self._term_indices = np.zeros(0, dtype=np.int8)
+        self._cents = np.zeros(0, dtype=np.int64)
+        self._yields = np.zeros(0, dtype=np.int32)  # basis points, 0 when unknown
+        self._placed = np.zeros(0, dtype="datetime64[D]")
+        self._maturity = np.zeros(0, dtype="datetime64[D]")
+
+    @property
+    def term_indices(self) -> np.ndarray:
+        return self._term_indices[: self.size]
+
+    @property
+    def cents(self) -> np.ndarray:
+        return self._cents[: self.size]
+
+    @property
+    def yields(self) -> np.ndarray:
+        return self._yields[: self.size]
+
+    @property
+    def placed_dates(self) -> np.ndarray:
+        return self._placed[: self.size]
+
+    @property
+    def maturity_dates(self) -> np.ndarray:
+        return self._maturity[: self.size]
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.size + extra
+        if needed <= len(self._cents):
+            return
+        capacity = max(needed, 2 * len(self._cents), 1024)
+        for name in ("_term_indices", "_cents", "_yields", "_placed", "_maturity"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def append_columns(
+        self,
+        term_indices: np.ndarray,
+        cents: np.ndarray,
+        yields: np.ndarray,
+        placed_dates: np.ndarray,
+    ) -> None:
+        count = len(cents)
+        self._reserve(count)
+        new = slice(self.size, self.size + count)
+        self._term_indices[new] = term_indices
+        self._cents[new] = cents
+        self._yields[new] = yields
+        self._placed[new] = placed_dates
+        self._maturity[new] = maturity_dates(term_indices.astype(np.int64), placed_dates)
+        self.size += count
+
+    def append(self, orders: List[Order]) -> None:
+        if not orders:
+            return
+        epochs = np.array([db.timestamp_to_epoch(order.timestamp) for order in orders], dtype=np.int64)
+        self.append_columns(
+            np.array([TERM_INDICES[order.term] for order in orders], dtype=np.int8),
+            np.array([order.amount_cents for order in orders], dtype=np.int64),
+            np.array([order.yield_basis_points or 0 for order in orders], dtype=np.int32),
+            epochs_to_local_dates(epochs),
+        )
+
+    def load_new_orders(self, conn: sqlite3.Connection) -> int:
+        """
+        - Appends orders with an id above last_id, in chunks, and returns how many were added
+        - Calling it after every write keeps the book current without rereading old orders
+        """
+        added = 0
+        cur = conn.execute(
+            "SELECT id, term, cents, IFNULL(yield_basis_points, 0), created_at "
+            "FROM orders WHERE id > ? ORDER BY id",
+            (self.last_id,),
+        )
+        while True:
+            rows = cur.fetchmany(LOAD_CHUNK_SIZE)
+            if not rows:
+                return added
+            ids, terms, cents, yields, created_at = zip(*rows)
+            self.append_columns(
+                np.array([TERM_INDICES[term] for term in terms], dtype=np.int8),
+                np.array(cents, dtype=np.int64),
+                np.array(yields, dtype=np.int32),
+                epochs_to_local_dates(np.array(created_at, dtype=np.int64)),
+            )
+            self.last_id = ids[-1]
+            added += len(rows)
+
+    def term_days(self) -> np.ndarray:
+        return (self.maturity_dates - self.placed_dates).astype(np.int64)
+
+    def payoff_cents(self) -> np.ndarray:
+        """Everything each order pays back over its life: principal plus all interest"""
+        interest = self.cents * self.yields * self.term_days() / (10_000 * DAYS_PER_YEAR)
+        return self.cents + np.rint(interest).astype(np.int64)
+
+    def accrued_interest_cents(self, as_of: np.datetime64) -> np.ndarray:
+        """Interest earned by as_of, whether already paid as coupons or not; 0 before the order was placed"""
+        elapsed_days = np.clip(
+            (np.datetime64(as_of, "D") - self.placed_dates).astype(np.int64), 0, self.term_days()
+        )
+        interest = self.cents * self.yields * elapsed_days / (10_000 * DAYS_PER_YEAR)
+        return np.rint(interest).astype(np.int64)
+
+    def value_cents(self, as_of: np.datetime64) -> np.ndarray:
+        """Principal plus interest earned by as_of"""
+        return self.cents + self.accrued_interest_cents(as_of)
+
+    def summary(self, as_of: Optional[np.datetime64] = None) -> Dict[str, int]:
+        """Book-wide totals in cents"""
+        if as_of is None:
+            as_of = np.datetime64(datetime.now().date(), "D")
+        return {
+            "orders": self.size,
+            "principal_cents": int(self.cents.sum()),
+            "value_cents": int(self.value_cents(as_of).sum()),
+            "payoff_cents": int(self.payoff_cents().sum()),
+            "matured_orders": int((self.maturity_dates <= as_of).sum()),
+        }
+
+
+_order_book: Optional[OrderBook] = None
+_order_book_lock = threading.Lock()
+
+
+def order_book_summary(as_of: Optional[np.datetime64] = None) -> Dict[str, int]:
+    """Totals for the process-wide book, topped up with any orders written since the last call"""
+    global _order_book
+    with _order_book_lock:
+        if _order_book is None:
+            _order_book = OrderBook()
+        with sqlite3.connect(db.DB_NAME) as conn:
+            _order_book.load_new_orders(conn)
+        return _order_book.summary(as_of)
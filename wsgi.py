@@ -0,0 +1,8 @@
+"""
+- WSGI entry point for the production server: gunicorn -c gunicorn.conf.py wsgi:server
+- Every worker imports the app, and attaches to the shared yield store rather than loading data/ itself
+"""
+
+from app import app
+
+server = app.server
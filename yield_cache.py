@@ -0,0 +1,158 @@
+"""
+- Compiled, per-year binary cache of the treasury csv files in data/
+- Each year is parsed once into .npy files (dates, yields, validity mask)
+- A year is only rebuilt when its csv's mtime/size change AND its content hash changes
+- Otherwise the .npy files are memory-mapped, so startup cost tracks the newest year only
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from data_model import YieldHistory
+from metrics import CACHE_REQUESTS
+from ingest import ingest_lines, ingest_year_csv
+from load_csv_data import DATA_DIR, FIRST_YEAR, csv_downloaded_for_year
+from terms import MATURITY_TERMS
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+CACHE_DIR = Path("./cache")
+MANIFEST_NAME = "manifest.json"
+CACHE_FORMAT = 2  # bump when the on-disk layout, or how csvs are parsed into it, changes
+
+ARRAY_NAMES = ("dates", "yields", "valid")
+
+
+def parse_year_csv(csv_rows: List[List[str]]) -> YieldHistory:
+    """
+    - Converts one year's already-read csv rows into a YieldHistory block on the MATURITY_TERMS axis
+    - Rows in the csv are newest first, the block is in ascending date order
+    - Files are read with ingest.ingest_year_csv instead, which streams them
+    """
+    return ingest_lines(csv_rows[0], (",".join(row) for row in csv_rows[1:]), len(csv_rows) - 1)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def array_path(year: int, name: str) -> Path:
+    return CACHE_DIR / f"{year}.{name}.npy"
+
+
+def read_manifest() -> Dict[str, Any]:
+    """Returns an empty manifest if there is none, or if it was written for other terms/format"""
+    empty: Dict[str, Any] = {"format": CACHE_FORMAT, "terms": MATURITY_TERMS, "years": {}}
+    try:
+        with open(CACHE_DIR / MANIFEST_NAME, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if manifest.get("format") != CACHE_FORMAT or manifest.get("terms") != MATURITY_TERMS:
+        logger.info("Yield cache manifest is out of date, rebuilding every year")
+        return empty
+    return manifest
+
+
+def write_manifest(manifest: Dict[str, Any]) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f"{MANIFEST_NAME}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, CACHE_DIR / MANIFEST_NAME)
+
+
+def write_year_block(year: int, block: YieldHistory) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for name in ARRAY_NAMES:
+        tmp_path = CACHE_DIR / f"{year}.{name}.tmp.npy"
+        # the matrices are column-major in memory, save them that way so mmap keeps the layout
+        np.save(tmp_path, getattr(block, name))
+        os.replace(tmp_path, array_path(year, name))
+
+
+def mmap_year_block(year: int) -> YieldHistory:
+    dates, yields, valid = (
+        np.load(array_path(year, name), mmap_mode="r") for name in ARRAY_NAMES
+    )
+    return YieldHistory(dates, MATURITY_TERMS, yields, valid)
+
+
+def is_entry_fresh(entry: Optional[Dict[str, Any]], csv_path: Path) -> bool:
+    """
+    - Cheap check first: same mtime and size means the csv is unchanged
+    - Otherwise fall back to the content hash, e.g. after a git checkout touched the file
+    """
+    if entry is None:
+        return False
+    if not all(array_path(entry["year"], name).exists() for name in ARRAY_NAMES):
+        return False
+    stat = csv_path.stat()
+    if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return True
+    if entry["sha256"] == file_sha256(csv_path):
+        entry["mtime_ns"] = stat.st_mtime_ns
+        entry["size"] = stat.st_size
+        return True
+    return False
+
+
+def load_year_block(year: int, manifest: Dict[str, Any]) -> YieldHistory:
+    """Loads one year from the cache, rebuilding it from the csv if stale. Updates manifest in place"""
+    csv_path = DATA_DIR / f"{year}.csv"
+    entry: Optional[Dict[str, Any]] = manifest["years"].get(str(year))
+    if is_entry_fresh(entry, csv_path):
+        try:
+            block = mmap_year_block(year)
+            CACHE_REQUESTS.inc(cache="yield_year_block", result="hit")
+            return block
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable yield cache for {year}, rebuilding: {e}")
+
+    CACHE_REQUESTS.inc(cache="yield_year_block", result="miss")
+    logger.info(f"Compiling yield cache for {year}")
+    stat = csv_path.stat()
+    block = ingest_year_csv(csv_path)
+    write_year_block(year, block)
+    manifest["years"][str(year)] = {
+        "year": year,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": file_sha256(csv_path),
+        "rows": len(block),
+    }
+    return block
+
+
+def load_yield_history(last_year: Optional[int] = None) -> YieldHistory:
+    """
+    - Every term's yield timeseries from FIRST_YEAR to last_year (default: this year)
+    - Served from the compiled cache, only stale years are re-parsed
+    """
+    if last_year is None:
+        last_year = datetime.now().year
+    manifest = read_manifest()
+    manifest_before = json.dumps(manifest, sort_keys=True)
+
+    blocks: List[YieldHistory] = []
+    for year in range(FIRST_YEAR, last_year + 1):
+        if not csv_downloaded_for_year(year):
+            logger.warning(f"No data for {year}")
+            continue
+        blocks.append(load_year_block(year, manifest))
+
+    if json.dumps(manifest, sort_keys=True) != manifest_before:
+        write_manifest(manifest)
+    return YieldHistory.concatenate(blocks)
@@ -0,0 +1,186 @@
+"""
+- GET /api/yields: a slice of the yield history for analytics jobs, instead of the page's dcc.Stores
+- ?terms=1 Yr,10 Yr picks terms (default: every term), ?start= and ?end= (YYYY-MM-DD, inclusive) pick dates
+- The date range is found by bisecting the sorted date axis, and each term's column is a zero-copy view,
+  so a request only ever touches the rows it returns
+- Formats, by ?format= or else the Accept header:
+- - columnar: columnar.py's packed little-endian stream, a date column of days since 1970-01-01 then one
+    int16 column of basis points per term, NULL_YIELD where a term has no value that day
+- - arrow: an Arrow IPC stream with the same columns, nullable, when pyarrow is installed
+- - csv: the fallback, date then basis points per term, empty where a term has no value that day
+- Every format is streamed CHUNK_ROWS rows at a time, so a response of any size is built in constant memory
+"""
+
+import csv
+import io
+import json
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from flask import Flask, Response, request
+
+import columnar
+from data_model import YieldHistory
+from metrics import CACHE_REQUESTS
+from prepare_graph_data import prepare_yield_history
+from terms import Term
+
+try:
+    import pyarrow
+except ImportError:  # optional, only needed for ?format=arrow
+    pyarrow = None
+
+YIELDS_API_ROUTE = "/api/yields"
+YIELDS_MAX_AGE_SECONDS = 300  # data changes at most once per business day
+CHUNK_ROWS = 4096
+
+CSV_MEDIA_TYPE = "text/csv"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MEDIA_TYPES = {"columnar": columnar.MEDIA_TYPE, "arrow": ARROW_MEDIA_TYPE, "csv": CSV_MEDIA_TYPE}
+
+YIELD_DTYPE = np.dtype(YieldHistory.YIELD_DTYPE).newbyteorder("<").str
+NULL_YIELD = int(np.iinfo(YieldHistory.YIELD_DTYPE).min)  # stands for a missing yield in columnar responses
+
+
+class YieldsQueryError(ValueError):
+    pass
+
+
+class YieldsQuery(NamedTuple):
+    terms: List[Term]
+    rows: slice
+
+    @staticmethod
+    def parse(yield_history: YieldHistory, args: Dict[str, str]) -> "YieldsQuery":
+        terms = [term.strip() for term in args["terms"].split(",")] if args.get("terms") else yield_history.terms
+        unknown = [term for term in terms if term not in yield_history.terms]
+        if unknown:
+            raise YieldsQueryError(f"unknown terms {unknown}")
+        try:
+            rows = yield_history.rows_between(args.get("start") or None, args.get("end") or None)
+        except ValueError:
+            raise YieldsQueryError("start and end must be dates formatted YYYY-MM-DD") from None
+        return YieldsQuery(list(dict.fromkeys(terms)), rows)
+
+
+class YieldsChunk(NamedTuple):
+    days: np.ndarray  # days since 1970-01-01
+    yields: Dict[Term, np.ndarray]  # basis points
+    valid: Dict[Term, np.ndarray]
+
+
+def iter_chunks(yield_history: YieldHistory, query: YieldsQuery) -> Iterator[YieldsChunk]:
+    for first in range(query.rows.start, query.rows.stop, CHUNK_ROWS):
+        rows = slice(first, min(first + CHUNK_ROWS, query.rows.stop))
+        yield YieldsChunk(
+            days=yield_history.dates[rows].astype(np.int64),
+            yields={term: yield_history.term_yields(term)[rows] for term in query.terms},
+            valid={term: yield_history.term_valid(term)[rows] for term in query.terms},
+        )
+
+
+def stream_columnar(yield_history: YieldHistory, query: YieldsQuery) -> Iterator[bytes]:
+    columns: columnar.Columns = [("date", "<i4"), *((term, YIELD_DTYPE) for term in query.terms)]
+    yield columnar.encode_header(
+        columns,
+        {"version": yield_history.version, "date": "days since 1970-01-01", "null": NULL_YIELD},
+    )
+    for chunk in iter_chunks(yield_history, query):
+        values = {
+            term: np.where(chunk.valid[term], chunk.yields[term], NULL_YIELD) for term in query.terms
+        }
+        yield columnar.encode_chunk(columns, {"date": chunk.days, **values})
+    yield columnar.encode_end()
+
+
+def stream_arrow(yield_history: YieldHistory, query: YieldsQuery) -> Iterator[bytes]:
+    schema = pyarrow.schema(
+        [("date", pyarrow.date32()), *((term, pyarrow.int16()) for term in query.terms)],
+        metadata={"version": yield_history.version},
+    )
+    sink = io.BytesIO()
+
+    def take() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for chunk in iter_chunks(yield_history, query):
+            arrays = [pyarrow.array(chunk.days.astype(np.int32), pyarrow.date32())]
+            arrays += [
+                pyarrow.array(chunk.yields[term], mask=~chunk.valid[term]) for term in query.terms
+            ]
+            writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+            yield take()
+    yield take()
+
+
+def stream_csv(yield_history: YieldHistory, query: YieldsQuery) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["date", *query.terms])
+    for chunk in iter_chunks(yield_history, query):
+        dates = np.datetime_as_string(chunk.days.astype("datetime64[D]"), unit="D")
+        # one string column per term, "" wherever the term has no value that day
+        values = [
+            np.where(chunk.valid[term], chunk.yields[term].astype(str), "").tolist() for term in query.terms
+        ]
+        writer.writerows(zip(dates.tolist(), *values))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+STREAMS: Dict[str, Callable[[YieldHistory, YieldsQuery], Iterator]] = {
+    "columnar": stream_columnar,
+    "arrow": stream_arrow,
+    "csv": stream_csv,
+}
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in STREAMS if fmt != "arrow" or pyarrow is not None]
+
+
+def negotiate_format() -> Optional[str]:
+    """?format= if given, else the best available match for the Accept header, falling back to csv"""
+    if "format" in request.args:
+        fmt = request.args["format"]
+        return fmt if fmt in available_formats() else None
+    formats = available_formats()
+    best = request.accept_mimetypes.best_match([MEDIA_TYPES[fmt] for fmt in formats])
+    return next((fmt for fmt in formats if MEDIA_TYPES[fmt] == best), "csv")
+
+
+def json_error(message: str, status: int) -> Response:
+    return Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+
+
+def register_yields_api(server: Flask) -> None:
+    @server.route(YIELDS_API_ROUTE)
+    def yields():
+        fmt = negotiate_format()
+        if fmt is None:
+            return json_error(f"format must be one of {available_formats()}", 406)
+        yield_history = prepare_yield_history()
+        try:
+            query = YieldsQuery.parse(yield_history, request.args)
+        except YieldsQueryError as e:
+            return json_error(str(e), 400)
+
+        term_indices = ".".join(str(yield_history.term_index(term)) for term in query.terms)
+        etag = f"{yield_history.version}-{fmt}-{query.rows.start}-{query.rows.stop}-{term_indices}"
+        if request.if_none_match.contains(etag):
+            CACHE_REQUESTS.inc(cache="yields_api_etag", result="hit")
+            response = Response(status=304)
+        else:
+            CACHE_REQUESTS.inc(cache="yields_api_etag", result="miss")
+            response = Response(STREAMS[fmt](yield_history, query), mimetype=MEDIA_TYPES[fmt])
+        response.vary.add("Accept")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = YIELDS_MAX_AGE_SECONDS
+        return response